@@ -21,34 +21,42 @@
 from . import lobbyists
 import time
 import sys
+import os
+import re
 
 
-def _timed_func(func):
+def _timed_func(func, clock=time.clock):
     def timer(*args):
-        start = time.clock()
+        start = clock()
         result = func(*args)
-        finish = time.clock()
+        finish = clock()
         return result, finish - start
     return timer
 
 
-def _parse_all(doc):
-    return list(lobbyists.parse_filings(doc))
+def _parse_all(doc, backend=None, mapped=True):
+    if not mapped and os.path.isfile(doc):
+        # File objects aren't memory-mapped.
+        f = open(doc, 'rb')
+        try:
+            return list(lobbyists.parse_filings(f, backend))
+        finally:
+            f.close()
+    return list(lobbyists.parse_filings(doc, backend))
 
 
-def _skip_import_list(record, con):
-    return list()
-
+def time_parse(doc, backend=None, mapped=True):
+    """Parse all filing records in a lobbyist database and time it.
 
-def _skip_import(record, con):
-    return None
+    doc - The database to parse. Can be a filename, a URL or a
+    file-like object.
 
+    backend - The parser backend to use (see
+    lobbyists.parser_backends), or None for the default backend.
 
-def time_parse(doc):
-    """Parse all filing records in a lobbyist database and time it.
-
-    doc - The database to parse. Can be a filename, a URL or anything
-    else that xml.dom.pulldom.parse takes as an argument.
+    mapped - If True (the default), local files are memory-mapped, as
+    parse_filings normally does. If False, they're read through an
+    ordinary buffered file object instead, for comparison.
 
     Returns a tuple. The first item is the time (in seconds) taken to
     parse the entire document, and the second is the list of all
@@ -56,18 +64,611 @@ def time_parse(doc):
 
     """
     timed_parser = _timed_func(_parse_all)
-    return timed_parser(doc)
+    return timed_parser(doc, backend, mapped)
+
+
+def time_parse_mapped(doc):
+    """Compare memory-mapped and buffered input for a local document.
+
+    doc - The filename of the database to parse.
+
+    Returns a list of tuples, one per available parser backend. Each
+    tuple contains the backend name, the parse time in seconds with
+    buffered input, the parse time with memory-mapped input and the
+    throughput gain of the latter (the ratio of the two times).
+
+    """
+    result = list()
+    for backend in lobbyists.parser_backends():
+        buffered_time = time_parse(doc, backend, False)[1]
+        mapped_time = time_parse(doc, backend, True)[1]
+        result.append((backend, buffered_time, mapped_time,
+                       buffered_time / max(mapped_time, 1e-6)))
+    return result
+
+
+def _count_all_parallel(doc, workers):
+    count = 0
+    for filing in lobbyists.parse_filings_parallel(doc, workers):
+        count += 1
+    return count
+
+
+def time_parse_parallel(doc, workers=(1, 2, 4, 8)):
+    """Parse a lobbyist database in parallel and time it.
+
+    The document is parsed once serially with parse_filings, then
+    once with parse_filings_parallel for each worker count. Wall-clock
+    time is measured, since most of the work happens in child
+    processes.
+
+    doc - The filename of the database to parse.
+
+    workers - A sequence of worker counts.
+
+    Returns a list of (workers, time, speedup) tuples, one per worker
+    count, where time is the wall-clock time in seconds and speedup is
+    the serial parse time divided by time.
+
+    """
+    serial, serial_time = _timed_func(_count_all, time.time)(doc)
+    parallel = _timed_func(_count_all_parallel, time.time)
+    result = list()
+    for n in workers:
+        count, parse_time = parallel(doc, n)
+        assert count == serial
+        result.append((n, parse_time, serial_time / max(parse_time, 1e-6)))
+    return result
+
+
+def time_parse_backends(doc):
+    """Parse a lobbyist database with every parser backend and time it.
+
+    doc - The database to parse. Must be a filename or a URL, since
+    it's read once per backend.
+
+    Returns a list of tuples, one per available parser backend, in
+    the order given by lobbyists.parser_backends. Each tuple contains
+    the backend name, the number of filings per second it parsed and
+    its peak memory use (in kilobytes, see parse_memory).
+
+    """
+    result = list()
+    for backend in lobbyists.parser_backends():
+        filings, parse_time = time_parse(doc, backend)
+        rate = len(filings) / max(parse_time, 1e-6)
+        result.append((backend, rate, parse_memory(doc, backend)))
+    return result
+
+
+def _count_all(doc, backend=None):
+    count = 0
+    for filing in lobbyists.parse_filings(doc, backend):
+        count += 1
+    return count
+
+
+def _peak_rss():
+    """The peak resident set size of this process, in kilobytes."""
+    # On Linux, ru_maxrss survives exec, so a freshly-started process
+    # would report its parent's peak. VmHWM doesn't have that problem.
+    try:
+        for line in open('/proc/self/status'):
+            if line.startswith('VmHWM:'):
+                return int(line.split()[1])
+    except IOError:
+        pass
+    import resource
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+
+
+def _peak_memory(funcname, *args):
+    """Run a function in a fresh Python process and return its peak RSS.
+
+    A fresh interpreter is used for each measurement so that neither
+    this process's memory nor the peak of a previous measurement is
+    counted.
+
+    funcname - The name of a function in this module.
+
+    args - The function's arguments. Each argument's repr must be a
+    valid Python expression.
+
+    """
+    import subprocess
+    script = 'from lobbyists import benchmark; ' \
+        'benchmark.%s(*%r); ' \
+        'print benchmark._peak_rss()' % (funcname, args)
+    topdir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    env = dict(os.environ)
+    env['PYTHONPATH'] = os.pathsep.join([topdir, env.get('PYTHONPATH', '')])
+    proc = subprocess.Popen([sys.executable, '-c', script],
+                            stdout=subprocess.PIPE, env=env)
+    out = proc.communicate()[0]
+    return int(out)
+
+
+def parse_memory(doc, backend=None):
+    """Parse all filing records in a lobbyist database and measure memory.
+
+    The parsed filings are discarded as they're parsed, so the
+    measurement reflects the parser's own memory use.
+
+    doc - The database to parse. Must be a filename or a URL, since
+    it's parsed in a separate process.
+
+    backend - The parser backend to use (see
+    lobbyists.parser_backends), or None for the default backend.
+
+    Returns the peak resident set size (in kilobytes) of a process
+    that parses the entire document.
+
+    """
+    return _peak_memory('_count_all', doc, backend)
+
+
+def _sizeof(obj, seen):
+    """The total size in bytes of a parsed filing and everything in it.
+
+    Objects whose ids are in seen (e.g., strings shared between
+    filings) aren't counted again.
+
+    """
+    if id(obj) in seen:
+        return 0
+    seen.add(id(obj))
+    size = sys.getsizeof(obj)
+    if isinstance(obj, dict):
+        for key, value in obj.iteritems():
+            size += _sizeof(key, seen) + _sizeof(value, seen)
+    elif isinstance(obj, list):
+        for value in obj:
+            size += _sizeof(value, seen)
+    elif isinstance(obj, lobbyists._Record):
+        for key in obj.keys():
+            size += _sizeof(getattr(obj, key), seen)
+    return size
+
+
+def record_memory(doc, backend=None):
+    """Compare the memory used by each parsed filing representation.
+
+    doc - The database to parse. Must be a filename or a URL, since
+    it's parsed twice.
+
+    backend - The parser backend to use (see
+    lobbyists.parser_backends), or None for the default backend.
+
+    Returns a tuple of 3 items: the average size in bytes of a parsed
+    filing dictionary (including everything it contains), the average
+    size of a parsed filing dictionary with flat lists, and the
+    average size of a Filing record.
+
+    """
+    sizes = list()
+    for records, flat in ((False, False), (False, True), (True, False)):
+        filings = list(lobbyists.parse_filings(doc, backend, records, flat))
+        seen = set()
+        total = sum([_sizeof(x, seen) for x in filings])
+        sizes.append(float(total) / max(len(filings), 1))
+    return tuple(sizes)
+
+
+def _columnar_all(doc, backend=None):
+    return list(lobbyists.parse_filings_columnar(doc, backend=backend))
+
+
+def time_parse_columnar(doc, backend=None):
+    """Compare parsing into dictionaries and parsing into columns.
+
+    doc - The database to parse.
+
+    backend - The parser backend to use (see
+    lobbyists.parser_backends), or None for the default backend.
+
+    Returns a tuple of 3 items: the time taken to parse doc into a
+    list of filing dictionaries, the time taken to parse it into
+    batches of columns, and the speedup of the latter.
+
+    """
+    _, dict_time = time_parse(doc, backend)
+    _, columnar_time = _timed_func(_columnar_all)(doc, backend)
+    return dict_time, columnar_time, dict_time / columnar_time
+
+
+def _count_where(doc, backend, where):
+    count = 0
+    for filing in lobbyists.parse_filings(doc, backend, where=where):
+        count += 1
+    return count
+
+
+def time_parse_where(doc, where, backend=None):
+    """Compare parsing all filings with parsing only some of them.
+
+    doc - The database to parse.
+
+    where - The where dictionary that selects filings (see
+    lobbyists.parse_filings).
+
+    backend - The parser backend to use (see
+    lobbyists.parser_backends), or None for the default backend.
+
+    Returns a tuple of 4 items: the number of filings selected, the
+    time taken to parse all filings, the time taken to parse only the
+    selected filings, and the speedup of the latter.
+
+    """
+    _, all_time = _timed_func(_count_all)(doc, backend)
+    count, where_time = _timed_func(_count_where)(doc, backend, where)
+    return count, all_time, where_time, all_time / where_time
+
+
+def _count_projection(doc, backend, include):
+    count = 0
+    for filing in lobbyists.parse_filings(doc, backend, include=include):
+        count += 1
+    return count
+
+
+def time_parse_projection(doc, include, backend=None):
+    """Compare parsing whole filings with parsing only some sections.
+
+    doc - The database to parse.
+
+    include - The list of sections to parse (see
+    lobbyists.parse_filings).
 
+    backend - The parser backend to use (see
+    lobbyists.parser_backends), or None for the default backend.
 
-_skippers = {'registrant': _skip_import,
-             'client': _skip_import,
-             'lobbyists': _skip_import_list,
-             'govt_entities': _skip_import_list,
-             'issues': _skip_import_list,
-             'affiliated_orgs': _skip_import_list}
+    Returns a tuple of 3 items: the time taken to parse whole filings,
+    the time taken to parse only the included sections, and the
+    speedup of the latter.
 
+    """
+    _, all_time = _timed_func(_count_all)(doc, backend)
+    _, include_time = _timed_func(_count_projection)(doc, backend, include)
+    return all_time, include_time, all_time / include_time
+
+
+def _count_file(f, backend=None):
+    try:
+        return _count_all(f, backend)
+    finally:
+        f.close()
+
+
+def time_parse_compressed(doc, backend=None):
+    """Time parsing compressed copies of a document.
+
+    doc - The filename of an uncompressed database. It's compressed
+    with gzip and bzip2 into a temporary directory.
+
+    backend - The parser backend to use (see
+    lobbyists.parser_backends), or None for the default backend.
+
+    Returns a list of (ext, size, inline, threaded) tuples, one per
+    compression format, where ext is the format's filename extension,
+    size is the compressed size in bytes, inline is the time taken to
+    parse the compressed document while decompressing it in the
+    parsing thread, and threaded is the time taken to parse it while
+    decompressing it in a background thread, as parse_filings does.
+
+    """
+    import tempfile
+    import shutil
+    import gzip
+    import bz2
+    tmpdir = tempfile.mkdtemp()
+    result = list()
+    try:
+        for ext, opener in (('.gz', gzip.GzipFile), ('.bz2', bz2.BZ2File)):
+            filename = os.path.join(tmpdir, os.path.basename(doc) + ext)
+            out = opener(filename, 'wb')
+            f = open(doc, 'rb')
+            try:
+                shutil.copyfileobj(f, out)
+            finally:
+                f.close()
+                out.close()
+            _, inline = _timed_func(_count_file, time.time)(
+                opener(filename, 'rb'), backend)
+            _, threaded = _timed_func(_count_all, time.time)(filename,
+                                                             backend)
+            result.append((ext, os.path.getsize(filename), inline, threaded))
+    finally:
+        shutil.rmtree(tmpdir)
+    return result
+
+
+def _count_transcoded(doc, backend=None):
+    count = 0
+    for filing in lobbyists.parse_filings(doc, backend, transcode=True):
+        count += 1
+    return count
+
+
+def time_parse_transcoded(doc):
+    """Compare parsing a UTF-16 document with and without transcoding.
+
+    doc - The filename of a UTF-8 database. It's re-encoded as UTF-16,
+    like the Senate's documents, into a temporary file.
+
+    Returns a list of (backend, plain, transcoded) tuples, one per
+    available parser backend, where plain is the rate (in filings per
+    second) at which the backend parses the UTF-16 document directly,
+    and transcoded is the rate at which it parses the document
+    transcoded to UTF-8 in a background thread.
+
+    """
+    import tempfile
+    f = open(doc, 'rb')
+    try:
+        text = f.read().decode('utf-8')
+    finally:
+        f.close()
+    text = lobbyists._xml_encoding_re.sub(r'\1\2UTF-16\2', text, 1)
+    fd, utf16 = tempfile.mkstemp('.xml')
+    try:
+        f = os.fdopen(fd, 'wb')
+        try:
+            f.write(text.encode('utf-16'))
+        finally:
+            f.close()
+        del text
+        result = list()
+        for backend in lobbyists.parser_backends():
+            count, plain = _timed_func(_count_all, time.time)(utf16, backend)
+            count, transcoded = _timed_func(_count_transcoded, time.time)(
+                utf16, backend)
+            result.append((backend, count / plain, count / transcoded))
+        return result
+    finally:
+        os.remove(utf16)
+
+
+def _count_cached(doc, cache, backend=None):
+    count = 0
+    for filing in cache.filings(doc, backend=backend):
+        count += 1
+    return count
+
+
+def time_parse_cached(doc, backend=None):
+    """Compare parsing a document with replaying it from a FilingCache.
+
+    doc - The filename of the database to parse.
+
+    backend - The parser backend (see lobbyists.parse_filings).
+
+    Returns a tuple of the time to parse the document and fill an
+    empty cache, the time to replay it from the cache, the size of the
+    cache entry in bytes, and the speedup of replaying over parsing.
+
+    """
+    import tempfile
+    import shutil
+    tmpdir = tempfile.mkdtemp()
+    try:
+        cache = lobbyists.FilingCache(tmpdir)
+        count, miss = _timed_func(_count_cached, time.time)(doc, cache,
+                                                             backend)
+        count, hit = _timed_func(_count_cached, time.time)(doc, cache,
+                                                            backend)
+        return miss, hit, cache.size(), miss / hit
+    finally:
+        shutil.rmtree(tmpdir)
+
+
+def time_get_filing(doc, count=100):
+    """Time random access to filings through a document's index.
+
+    doc - The filename of the database. Its sidecar index is rebuilt
+    from scratch and removed afterwards.
+
+    count - The number of filings to look up, spread evenly through
+    the document.
+
+    Returns a tuple of the time to build the index, the average time
+    to parse one filing with lobbyists.get_filing, the time to find
+    the last filing by scanning the document with
+    lobbyists.parse_filings, and the speedup of a lookup over a scan.
+
+    """
+    index_path = doc + '.index'
+    if os.path.exists(index_path):
+        os.remove(index_path)
+    lobbyists._loaded_indexes.pop(doc, None)
+    try:
+        ids, build = _timed_func(lobbyists.filing_index, time.time)(doc)
+        ids = sorted(ids.items(), key=lambda x: x[1][0])
+        ids = [x[0] for x in ids[::max(1, len(ids) // count)]]
+        start = time.time()
+        for filing_id in ids:
+            lobbyists.get_filing(doc, filing_id)
+        lookup = (time.time() - start) / len(ids)
+        count, scan = _timed_func(_count_all, time.time)(doc)
+        return build, lookup, scan, scan / lookup
+    finally:
+        if os.path.exists(index_path):
+            os.remove(index_path)
+
+
+def _sum_amounts(doc, backend, lazy):
+    total = 0
+    for filing in lobbyists.parse_filings(doc, backend, lazy=lazy):
+        total += filing['filing']['amount'] or 0
+    return total
+
+
+def time_parse_lazy(doc, backend=None):
+    """Compare eager and lazy parsing for a consumer that only reads
+    the filing section of each filing (the sum of all amounts).
+
+    doc - The database to parse.
+
+    backend - The parser backend, or None for the fastest one that
+    supports lazy parsing.
+
+    Returns a tuple of the eager time, the lazy time and the speedup.
+
+    """
+    if backend is None:
+        backend = [x for x in lobbyists.parser_backends()
+                   if x in lobbyists._lazy_backends][0]
+    total, eager = _timed_func(_sum_amounts, time.time)(doc, backend, False)
+    total, lazy = _timed_func(_sum_amounts, time.time)(doc, backend, True)
+    return eager, lazy, eager / lazy
+
+
+def _element_sets(doc):
+    """Collect every element in a lobbyist database that has an attribute
+    table, grouped by element id (e.g. 'filing', 'client', 'lobbyist').
 
-def time_import(cur, parsed_filings, skiplist=None):
+    """
+    elts = dict([(id, list()) for id in lobbyists._attr_tables])
+    for filing in lobbyists._filing_elements(doc):
+        elts['filing'].append(filing)
+        for subelt in filing:
+            id, item_id, attrs = lobbyists._sax_subelts[subelt.tag]
+            if item_id is None:
+                elts[id].append(subelt)
+            else:
+                elts[item_id].extend(subelt)
+    return elts
+
+
+def _decode_generic(elts, attrs):
+    for elt in elts:
+        dict(lobbyists._parse_attrs(elt, attrs))
+
+
+def _decode_compiled(elts, decoder):
+    for elt in elts:
+        decoder(elt)
+
+
+def time_decoders(doc, repeat=5):
+    """Compare the generic and compiled attribute decoders.
+
+    doc - The database whose elements are decoded.
+
+    repeat - The number of times to decode each element.
+
+    Returns a list of (id, count, generic, compiled, speedup) tuples,
+    one per element type, where count is the number of elements of
+    that type in doc, generic and compiled are the times taken to
+    decode them all repeat times with _parse_attrs and the compiled
+    decoder, respectively, and speedup is generic / compiled.
+
+    """
+    result = list()
+    for id, elts in sorted(_element_sets(doc).iteritems()):
+        if not elts:
+            continue
+        elts = elts * repeat
+        attrs = lobbyists._attr_tables[id]
+        decoder = lobbyists._dict_decoders[id]
+        _, generic = _timed_func(_decode_generic)(elts, attrs)
+        _, compiled = _timed_func(_decode_compiled)(elts, decoder)
+        result.append((id, len(elts) / repeat, generic, compiled,
+                       generic / compiled))
+    return result
+
+
+def intern_stats(doc, backend=None):
+    """Measure the hit rate of the intern table while parsing.
+
+    doc - The database to parse.
+
+    backend - The parser backend to use (see
+    lobbyists.parser_backends), or None for the default backend.
+
+    Returns a tuple of 4 items: the number of intern table hits, the
+    number of misses, the number of times the table was emptied
+    because it was full, and the hit rate (hits / lookups).
+
+    """
+    table = lobbyists._intern_table
+    table.reset()
+    _count_all(doc, backend)
+    lookups = table.hits + table.misses
+    result = (table.hits, table.misses, table.resets,
+              float(table.hits) / max(lookups, 1))
+    table.reset()
+    return result
+
+
+_filing_re = re.compile(r'<Filing\b(?:[^>]*/>|.*?</Filing>)', re.S)
+_filing_id_re = re.compile(r'(<Filing\b[^>]*?\bID=")([^"]*)"')
+
+
+def synthesize_doc(template, copies, outname):
+    """Create a large lobbyist database by repeating a smaller one.
+
+    template - The filename of the lobbyist database to repeat.
+
+    copies - The number of times to repeat each Filing element in
+    template. Each copy after the first gets a unique filing ID, so
+    the result can be imported into a database.
+
+    outname - The filename of the database to create.
+
+    Returns outname.
+
+    """
+    text = open(template, 'rb').read()
+    filings = _filing_re.findall(text)
+    head = text[:text.index(filings[0])]
+    tail = text[text.rindex(filings[-1]) + len(filings[-1]):]
+    out = open(outname, 'wb')
+    try:
+        out.write(head)
+        for i in xrange(copies):
+            for filing in filings:
+                if i:
+                    filing = _filing_id_re.sub(r'\g<1>\g<2>-%d"' % i,
+                                               filing, 1)
+                out.write(filing)
+                out.write('\n')
+        out.write(tail)
+    finally:
+        out.close()
+    return outname
+
+
+def parse_memory_scaling(template, factors=(1, 10, 100)):
+    """Measure how the parser's memory use scales with document size.
+
+    template - The filename of the lobbyist database to use as a
+    template. A database is synthesized for each scaling factor by
+    repeating the template's filings (see synthesize_doc).
+
+    factors - The sequence of scaling factors to measure.
+
+    Returns a list of (factor, size, peak) tuples, where size is the
+    size in bytes of the synthesized database and peak is the peak
+    resident set size (in kilobytes) of a process that parses it.
+    With a streaming parser, peak should be roughly constant.
+
+    """
+    import tempfile
+    import shutil
+    tmpdir = tempfile.mkdtemp()
+    result = list()
+    try:
+        for factor in factors:
+            doc = synthesize_doc(template, factor,
+                                 os.path.join(tmpdir, '%d.xml' % factor))
+            result.append((factor, os.path.getsize(doc), parse_memory(doc)))
+            os.remove(doc)
+    finally:
+        shutil.rmtree(tmpdir)
+    return result
+
+
+def time_import(cur, parsed_filings, skiplist=None, batch_size=None):
     """Import parsed filings into a database and time it.
 
     cur - The DB API 2.0-compliant database cursor.
@@ -76,20 +677,114 @@ def time_import(cur, parsed_filings, skiplist=None):
 
     skiplist - Either None (the default), or a list of filing element
     names ('registrant', 'client', etc.). Any filing element name that
-    appears in the list is skipped at import time. This feature is
-    useful for stubbing out specific import functions when you don't
-    want them to impact the benchmark.
+    appears in the list is skipped at import time (see the exclude
+    option of lobbyists.import_filings). This feature is useful for
+    stubbing out specific import functions when you don't want them to
+    impact the benchmark.
+
+    batch_size - The number of filings whose rows are inserted
+    together, or None to insert each row as its filing is imported
+    (see lobbyists.import_filings).
+
+    Returns a tuple. The first item is the return value of
+    lobbyist.import_filings, and the second is the time (in seconds)
+    taken by the import.
+
+    """
+    def importer(cur, parsed_filings):
+        return lobbyists.import_filings(cur, parsed_filings,
+                                        exclude=skiplist,
+                                        batch_size=batch_size)
+    return _timed_func(importer)(cur, parsed_filings)
+
+
+def _import_new_db(parsed_filings, keys=None, batch_size=None):
+    import sqlite3
+    con = lobbyists.create_db(sqlite3.connect(':memory:'))
+    try:
+        lobbyists.import_filings(con.cursor(), parsed_filings, keys=keys,
+                                 batch_size=batch_size)
+    finally:
+        con.close()
+
+
+def time_import_keys(parsed_filings, max_size=None):
+    """Compare importing filings with and without a DimensionCache.
+
+    parsed_filings - A list of parsed filings. They're imported into
+    a new in-memory database, once looking up each entity with a
+    SELECT statement and once with a DimensionCache.
+
+    max_size - The DimensionCache's size limit (see
+    lobbyists.DimensionCache).
+
+    Returns a tuple of the import time without the cache, the import
+    time with it, the speedup, and a list of (table, hits, misses,
+    evictions) tuples, one per table in the cache.
+
+    """
+    # Rows are inserted one at a time, because looking up entities
+    # with SELECT statements defeats batches.
+    uncached = _timed_func(_import_new_db, time.time)(parsed_filings,
+                                                        False, None)[1]
+    keys = lobbyists.DimensionCache(max_size)
+    cached = _timed_func(_import_new_db, time.time)(parsed_filings,
+                                                      keys, None)[1]
+    stats = [(table, keys.hits[table], keys.misses[table],
+              keys.evictions[table])
+             for table in sorted(keys.hits)]
+    return uncached, cached, uncached / cached, stats
+
+
+def time_import_batched(parsed_filings, batch_sizes=(100, 1000, 10000)):
+    """Compare importing filings row by row and in batches.
+
+    parsed_filings - A list of parsed filings. They're imported into a
+    new in-memory database once per row and once per batch size.
+
+    batch_sizes - The batch sizes to measure (see
+    lobbyists.import_filings).
+
+    Returns a tuple of the import time row by row and a list of
+    (batch_size, time, speedup) tuples, one per batch size.
+
+    """
+    timed_import = _timed_func(_import_new_db)
+    per_row = timed_import(parsed_filings, None, None)[1]
+    result = list()
+    for batch_size in batch_sizes:
+        batched = timed_import(parsed_filings, None, batch_size)[1]
+        result.append((batch_size, batched, per_row / batched))
+    return per_row, result
+
+
+def _load_new_db(docs, dbname, bulk):
+    from . import util
+    util.load_db(docs, dbname, clobber=True, bulk=bulk).close()
+
+
+def time_load_bulk(docs):
+    """Compare a normal load of documents into a new database with a
+    bulk load (see the bulk option of lobbyists.util.load_db).
+
+    docs - A list of the filenames of the documents to load.
 
-    Returns a tuple. The first item is the time (in seconds) taken by
-    the import, and the second is the return value of
-    lobbyist.import_filings.
+    Returns a tuple of the wall-clock time of the normal load, that of
+    the bulk load, and the speedup.
 
     """
-    if skiplist:
-        for key in skiplist:
-            lobbyists._entity_importers[key] = _skippers[key]
-    timed_importer = _timed_func(lobbyists.import_filings)
-    return timed_importer(cur, parsed_filings)
+    import tempfile
+    import shutil
+    tmpdir = tempfile.mkdtemp()
+    try:
+        dbname = os.path.join(tmpdir, 'load.db')
+        timed_load = _timed_func(_load_new_db, time.time)
+        normal = timed_load(docs, dbname, False)[1]
+        os.remove(dbname)
+        bulk = timed_load(docs, dbname, True)[1]
+        return normal, bulk, normal / bulk
+    finally:
+        shutil.rmtree(tmpdir)
 
 
 def main(argv=None):
@@ -128,6 +823,80 @@ document."""
                       dest='skip_import',
                       help='skip importing a particular entity, e.g., ' \
                           '"registrant"')
+    parser.add_option('-b', '--backend', dest='backend',
+                      help='parse the document with the named parser ' \
+                          'backend (default is the fastest available)')
+    parser.add_option('-a', '--all-backends', action='store_true',
+                      dest='all_backends',
+                      help='also report the parse rate and peak memory ' \
+                          'of every available parser backend')
+    parser.add_option('-i', '--input-mapping', action='store_true',
+                      dest='mapped',
+                      help='also compare memory-mapped and buffered ' \
+                          'input with every parser backend')
+    parser.add_option('-p', '--parallel', action='store_true',
+                      dest='parallel',
+                      help='also report the speedup of parallel parsing ' \
+                          'with 1, 2, 4 and 8 worker processes')
+    parser.add_option('-r', '--records', action='store_true',
+                      dest='records',
+                      help='also report the memory used per filing by ' \
+                          'dictionaries, flat dictionaries and records')
+    parser.add_option('-d', '--decoders', action='store_true',
+                      dest='decoders',
+                      help='also report the speedup of the compiled ' \
+                          'attribute decoders for each element type')
+    parser.add_option('-n', '--intern-stats', action='store_true',
+                      dest='intern',
+                      help='also report the hit rate of the intern table ' \
+                          'for repeated attribute values')
+    parser.add_option('-l', '--columnar', action='store_true',
+                      dest='columnar',
+                      help='also report the speedup of parsing into ' \
+                          'columns instead of dictionaries')
+    parser.add_option('-y', '--year', type='int', dest='year',
+                      help='also report the speedup of parsing only ' \
+                          'the filings for the given year')
+    parser.add_option('-j', '--include', action='append', dest='include',
+                      metavar='SECTION',
+                      help='also report the speedup of parsing only ' \
+                          'the given filing section (can be repeated)')
+    parser.add_option('-z', '--compressed', action='store_true',
+                      dest='compressed',
+                      help='also report the time to parse the document ' \
+                          'compressed with gzip and bzip2')
+    parser.add_option('-u', '--utf16', action='store_true', dest='utf16',
+                      help='also report the parse rate of the document ' \
+                          'encoded as UTF-16, with and without transcoding')
+    parser.add_option('-k', '--cached', action='store_true', dest='cached',
+                      help='also report the time to replay the document ' \
+                          'from a parsed-filing cache')
+    parser.add_option('-x', '--index', action='store_true', dest='index',
+                      help='also report the time to build the document\'s ' \
+                          'filing index and look up filings with it')
+    parser.add_option('-e', '--lazy', action='store_true', dest='lazy',
+                      help='also report the speedup of lazy parsing for ' \
+                          'a consumer that only reads filing attributes')
+    parser.add_option('-g', '--key-cache', action='store_true',
+                      dest='key_cache',
+                      help='also compare importing with and without the ' \
+                          'dimension key cache, and report its hit rates')
+    parser.add_option('--key-cache-size', type='int', dest='key_cache_size',
+                      metavar='N',
+                      help='limit the dimension key cache to N rows per ' \
+                          'table (default unlimited)')
+    parser.add_option('-t', '--batches', action='store_true',
+                      dest='batches',
+                      help='also compare importing row by row and in ' \
+                          'batches of 100, 1000 and 10000 filings')
+    parser.add_option('-L', '--bulk-load', action='store_true',
+                      dest='bulk',
+                      help='also compare loading the document into a new ' \
+                          'database normally and in bulk')
+    parser.add_option('-m', '--memory-scaling', action='store_true',
+                      dest='memory',
+                      help='also report the peak memory used to parse ' \
+                          'the document repeated 1, 10 and 100 times')
     (options, args) = parser.parse_args(argv[1:])
     if len(args) != 2:
         parser.error('specify one sqlite3 database and one XML document')
@@ -136,10 +905,94 @@ document."""
     con = sqlite3.connect(dbname)
     if create_db:
         lobbyists.create_db(con)
-    filings, parse_time = time_parse(doc)
+    if options.all_backends:
+        for backend, rate, peak in time_parse_backends(doc):
+            print 'Parse (%s): %.1f filings/sec, peak memory %d kB' % \
+                (backend, rate, peak)
+    if options.records:
+        dict_size, flat_size, record_size = record_memory(doc,
+                                                          options.backend)
+        print 'Bytes per filing: dictionary %d, flat %d, record %d' % \
+            (dict_size, flat_size, record_size)
+    if options.decoders:
+        for id, count, generic, compiled, speedup in time_decoders(doc):
+            print 'Decode %s (%d): generic %f, compiled %f (%.2fx)' % \
+                (id, count, generic, compiled, speedup)
+    if options.intern:
+        hits, misses, resets, rate = intern_stats(doc, options.backend)
+        print 'Intern table: %d hits, %d misses, %d resets (%.1f%% hits)' % \
+            (hits, misses, resets, rate * 100)
+    if options.columnar:
+        dict_time, columnar_time, speedup = time_parse_columnar(
+            doc, options.backend)
+        print 'Parse time: dictionaries %f, columns %f (%.2fx)' % \
+            (dict_time, columnar_time, speedup)
+    if options.year is not None:
+        count, all_time, where_time, speedup = time_parse_where(
+            doc, {'year': options.year}, options.backend)
+        print 'Parse time: all %f, year %d only (%d filings) %f (%.2fx)' % \
+            (all_time, options.year, count, where_time, speedup)
+    if options.include:
+        all_time, include_time, speedup = time_parse_projection(
+            doc, options.include, options.backend)
+        print 'Parse time: all %f, %s only %f (%.2fx)' % \
+            (all_time, ', '.join(options.include), include_time, speedup)
+    if options.compressed:
+        for ext, size, inline, threaded in time_parse_compressed(
+                doc, options.backend):
+            print 'Parse time (%s, %d bytes): inline %f, threaded %f ' \
+                '(%.2fx)' % (ext, size, inline, threaded, inline / threaded)
+    if options.utf16:
+        for backend, plain, transcoded in time_parse_transcoded(doc):
+            print 'Parse UTF-16 (%s): %.1f filings/sec, transcoded ' \
+                '%.1f filings/sec' % (backend, plain, transcoded)
+    if options.cached:
+        miss, hit, size, speedup = time_parse_cached(doc, options.backend)
+        print 'Parse time: uncached %f, cached %f (%d bytes, %.2fx)' % \
+            (miss, hit, size, speedup)
+    if options.index:
+        build, lookup, scan, speedup = time_get_filing(doc)
+        print 'Filing index: build %f, lookup %f, scan %f (%.0fx)' % \
+            (build, lookup, scan, speedup)
+    if options.lazy:
+        eager, lazy, speedup = time_parse_lazy(doc, options.backend)
+        print 'Parse time (amounts only): eager %f, lazy %f (%.2fx)' % \
+            (eager, lazy, speedup)
+    if options.mapped:
+        for backend, buffered, mapped, gain in time_parse_mapped(doc):
+            print 'Parse time (%s): buffered %f, mapped %f (%.2fx)' % \
+                (backend, buffered, mapped, gain)
+    if options.parallel:
+        for workers, parse_time, speedup in time_parse_parallel(doc):
+            print 'Parallel parse time (%d workers): %f (%.2fx)' % \
+                (workers, parse_time, speedup)
+    filings, parse_time = time_parse(doc, options.backend)
     print 'Parse time:', parse_time
     _, import_time = time_import(con.cursor(), filings, options.skip_import)
     print 'Import time:', import_time
+    if options.batches:
+        per_row, batches = time_import_batched(filings)
+        print 'Import time (row by row): %f' % per_row
+        for batch_size, batched, speedup in batches:
+            print 'Import time (batches of %d): %f (%.2fx)' % \
+                (batch_size, batched, speedup)
+    if options.key_cache:
+        uncached, cached, speedup, stats = time_import_keys(
+            filings, options.key_cache_size)
+        print 'Import time: SELECT %f, key cache %f (%.2fx)' % \
+            (uncached, cached, speedup)
+        for table, hits, misses, evictions in stats:
+            print 'Key cache (%s): %d hits, %d misses, %d evictions ' \
+                '(%.1f%% hits)' % (table, hits, misses, evictions,
+                                   100.0 * hits / max(hits + misses, 1))
+    if options.bulk:
+        normal, bulk, speedup = time_load_bulk([doc])
+        print 'Load time: normal %f, bulk %f (%.2fx)' % \
+            (normal, bulk, speedup)
+    if options.memory:
+        for factor, size, peak in parse_memory_scaling(doc):
+            print 'Parse peak memory (%dx, %d bytes): %d kB' % \
+                (factor, size, peak)
     if options.commit:
         con.commit()
     con.close()
@@ -17,7 +17,48 @@
 
 """Parse and import U.S. Senate LD-1/LD-2 XML documents."""
 
+import os
+import sys
+import re
+import marshal
+import mmap
+import cStringIO
+import xml.dom
 import xml.dom.pulldom
+import xml.sax
+import xml.sax.handler
+import xml.sax.saxutils
+import array
+import gzip
+import bz2
+import zipfile
+import threading
+import Queue
+import codecs
+import hashlib
+import tempfile
+import itertools
+try:
+    import xml.etree.cElementTree as ElementTree
+    _fast_etree = True
+except ImportError:
+    import xml.etree.ElementTree as ElementTree
+    _fast_etree = False
+try:
+    import lxml.etree
+except ImportError:
+    lxml = None
+try:
+    import numpy
+except ImportError:
+    numpy = None
+try:
+    import lzma
+except ImportError:
+    try:
+        from backports import lzma
+    except ImportError:
+        lzma = None
 
 
 VERSION = '0.12'
@@ -76,66 +117,517 @@ def _lobbyist_indicator(x):
     return indicator[int(x)]
 
 
-# xml.dom.pulldom-specific code
+# Interned attribute values.
+#
+# Some attribute values, e.g., countries, states, issue codes and
+# government entity names, repeat many times in a document. Each
+# occurrence is parsed into a new string. Attributes whose parsers are
+# wrapped with _interned share one string object per distinct value
+# instead, which saves memory when parsed filings are kept around and
+# speeds up dictionary lookups on those values.
+
+class _InternTable(object):
+    """A bounded table of canonical strings.
+
+    Calling the table with a string returns the canonical string equal
+    to it, adding it to the table if necessary. The table is emptied
+    whenever it grows to maxsize values, so it never holds more than
+    maxsize strings.
+
+    """
+    def __init__(self, maxsize):
+        self.maxsize = maxsize
+        self.reset()
+
+    def reset(self):
+        """Empty the table and zero its statistics."""
+        self._values = dict()
+        self.hits = 0
+        self.misses = 0
+        self.resets = 0
+
+    def __call__(self, value):
+        values = self._values
+        try:
+            result = values[value]
+        except KeyError:
+            self.misses += 1
+            if len(values) >= self.maxsize:
+                values.clear()
+                self.resets += 1
+            values[value] = value
+            return value
+        self.hits += 1
+        return result
+
+
+_intern_table = _InternTable(4096)
+
+
+_nan = float('nan')
+
+
+def _interned(parse):
+    """Return an attribute parser that interns the values returned by
+    the parser parse."""
+    def parse_interned(x):
+        return _intern_table(parse(x))
+    parse_interned.parse = parse
+    return parse_interned
+
+
+# Document input.
+
+class _MappedFile(object):
+    """A read-only, memory-mapped local file.
+
+    The read method returns buffer objects that refer directly to the
+    mapping, so the document's bytes are handed to the XML parser
+    without being copied. The mapping itself is available as the map
+    attribute, for random access.
+
+    filename - The name of the file to map.
+
+    Raises EnvironmentError if the file can't be opened or mapped, or
+    ValueError if it's empty.
+
+    """
+    def __init__(self, filename):
+        self._file = open(filename, 'rb')
+        try:
+            self.map = mmap.mmap(self._file.fileno(), 0,
+                                 access=mmap.ACCESS_READ)
+        except:
+            self._file.close()
+            raise
+        self.name = filename
+        self._pos = 0
+
+    def read(self, size=-1):
+        start = self._pos
+        if size < 0:
+            self._pos = len(self.map)
+        else:
+            self._pos = min(start + size, len(self.map))
+        return buffer(self.map, start, self._pos - start)
+
+    def seek(self, offset, whence=0):
+        if whence == 1:
+            offset += self._pos
+        elif whence == 2:
+            offset += len(self.map)
+        self._pos = max(0, offset)
+
+    def tell(self):
+        return self._pos
+
+    def close(self):
+        self.map.close()
+        self._file.close()
+
+
+class _ThreadedReader(object):
+    """A file-like object that reads another one in a background thread.
+
+    The background thread reads the stream ahead of the consumer, a
+    chunk at a time, so that reading (e.g., decompressing) the stream
+    overlaps with parsing it. zlib and bz2 release the global
+    interpreter lock while they decompress. Errors raised by the
+    stream are re-raised by read.
+
+    stream - The binary file-like object to read. It's closed when
+    the reader is closed.
+
+    """
+    def __init__(self, stream, chunk_size=256 * 1024, depth=8):
+        self._stream = stream
+        self._chunk_size = chunk_size
+        self._queue = Queue.Queue(depth)
+        self._data = ''
+        self._pos = 0
+        self._eof = False
+        self._closing = False
+        self._thread = threading.Thread(target=self._read_ahead)
+        self._thread.setDaemon(True)
+        self._thread.start()
+
+    def _put(self, item):
+        while not self._closing:
+            try:
+                self._queue.put(item, True, 0.1)
+                return True
+            except Queue.Full:
+                pass
+        return False
+
+    def _read_ahead(self):
+        try:
+            while True:
+                data = self._stream.read(self._chunk_size)
+                if not self._put(data) or not data:
+                    return
+        except:
+            self._put(sys.exc_info())
+
+    def _fill(self):
+        item = self._queue.get()
+        if isinstance(item, tuple):
+            self._eof = True
+            raise item[0], item[1], item[2]
+        if not item:
+            self._eof = True
+        self._data = item
+        self._pos = 0
+
+    def read(self, size=-1):
+        if self._pos == len(self._data) and not self._eof:
+            self._fill()
+        if size < 0:
+            chunks = [self._data[self._pos:]]
+            while not self._eof:
+                self._fill()
+                chunks.append(self._data)
+            self._pos = len(self._data)
+            return ''.join(chunks)
+        start = self._pos
+        self._pos = min(start + size, len(self._data))
+        return self._data[start:self._pos]
+
+    def close(self):
+        self._closing = True
+        self._thread.join()
+        self._stream.close()
+
+
+# Matches the encoding declaration in an XML declaration.
+
+_xml_encoding_re = re.compile(r'^(<\?xml[^>]*?\bencoding\s*=\s*)(["\'])'
+                              r'[^"\']*\2')
+
+
+class _Utf8Transcoder(object):
+    """A file-like object that reads a UTF-16 document as UTF-8.
+
+    Documents with a UTF-16 byte order mark are decoded and re-encoded
+    as UTF-8 a large chunk at a time, and the encoding in their XML
+    declaration, if any, is rewritten to match. Other documents are
+    read unchanged. read ignores its size argument and returns about
+    chunk_size bytes of input's worth of output at a time; it's meant
+    to be wrapped in a _ThreadedReader, so that transcoding overlaps
+    with parsing.
+
+    stream - The binary file-like object to read.
+
+    opened - If True, stream is closed when the transcoder is closed.
+
+    """
+    def __init__(self, stream, opened, chunk_size=256 * 1024):
+        self._stream = stream
+        self._opened = opened
+        self._chunk_size = chunk_size
+        head = str(stream.read(2))
+        codec = _doc_codec(head)
+        if codec == 'utf-8':
+            self._decoder = None
+            self._head = head
+        else:
+            # The byte order mark is dropped.
+            self._decoder = codecs.getincrementaldecoder(codec)()
+            self._head = None
+
+    def read(self, size=-1):
+        if self._decoder is None:
+            data = str(self._stream.read(self._chunk_size))
+            if self._head is not None:
+                data, self._head = self._head + data, None
+            return data
+        while True:
+            data = str(self._stream.read(self._chunk_size))
+            result = self._decoder.decode(data, not data).encode('utf-8')
+            if result or not data:
+                break
+        if self._head is None:
+            self._head = ''
+            result = _xml_encoding_re.sub(r'\1\2UTF-8\2', result, 1)
+        return result
+
+    def close(self):
+        if self._opened:
+            self._stream.close()
+
+
+def _open_xz(filename):
+    if lzma is None:
+        raise ImportError('reading .xz documents requires the lzma module')
+    return lzma.LZMAFile(filename, 'rb')
+
+
+# Local files with these extensions are decompressed as they're read.
+# Each decompressor is a function of one argument, the filename, that
+# returns a file-like object which reads the decompressed document.
+
+_decompressors = {'.gz': lambda filename: gzip.GzipFile(filename, 'rb'),
+                  '.bz2': lambda filename: bz2.BZ2File(filename, 'r'),
+                  '.xz': _open_xz}
+
+
+def _decompressor(doc):
+    """Return the decompressor for the document doc, or None if doc
+    isn't a compressed local file."""
+    if isinstance(doc, basestring) and os.path.isfile(doc):
+        return _decompressors.get(os.path.splitext(doc)[1].lower())
+    return None
+
+
+def _is_archive(doc):
+    """Return True if doc is a local zip archive of documents."""
+    return isinstance(doc, basestring) and \
+        doc.lower().endswith('.zip') and os.path.isfile(doc)
+
+
+def _archive_members(filename):
+    """The names of the XML documents in a zip archive, in archive
+    order."""
+    archive = zipfile.ZipFile(filename)
+    try:
+        return [x.filename for x in archive.infolist()
+                if x.filename.lower().endswith('.xml')]
+    finally:
+        archive.close()
+
+
+def _archive_docs(filename, members=None):
+    """The XML documents in a zip archive.
+
+    filename - The zip archive's filename.
 
-def _filing_elements(doc):
+    members - The names of the documents to open, or None to open all
+    of them, in archive order.
+
+    Yields a sequence of file-like objects, one per document, which
+    decompress the document in a background thread. Each one is
+    closed as soon as the next one is requested.
+
+    """
+    if members is None:
+        members = _archive_members(filename)
+    archive = zipfile.ZipFile(filename)
+    try:
+        for member in members:
+            stream = _ThreadedReader(archive.open(member))
+            try:
+                yield stream
+            finally:
+                stream.close()
+    finally:
+        archive.close()
+
+
+def _open_doc(doc):
+    """Open an LD-1/LD-2 document for reading.
+
+    doc - The XML document. Can be a filename, a URL or a file-like
+    object. Local files are memory-mapped, except for files with a
+    .gz, .bz2 or .xz extension, which are decompressed in a
+    background thread.
+
+    Returns a pair whose first item is a binary file-like object
+    positioned at the start of the document, and whose second item is
+    True if the caller is responsible for closing it (i.e., the file
+    was opened here rather than passed in by the caller).
+
+    """
+    decompressor = _decompressor(doc)
+    if decompressor is not None:
+        return _ThreadedReader(decompressor(doc)), True
+    if isinstance(doc, basestring) and os.path.isfile(doc):
+        try:
+            return _MappedFile(doc), True
+        except (EnvironmentError, ValueError):
+            # Fall back to ordinary reads, e.g. for empty files.
+            pass
+    stream = xml.sax.saxutils.prepare_input_source(doc).getByteStream()
+    return stream, stream is not doc
+
+
+# xml.etree-specific code
+
+def _filing_elements(doc, iterparse=ElementTree.iterparse, where=None,
+                     quarantine=None):
     """The sequence of all Filing elements in a lobbyist database.
 
-    doc - The XML document. Can be a filename, a URL or anything else
-    that xml.dom.pulldom.parse takes as an argument.
+    doc - The XML document. Can be a filename, a URL or a file-like
+    object.
+
+    iterparse - The iterparse function to use. It's called with two
+    arguments, the file-like object to parse and a sequence of
+    events, and must be compatible with xml.etree's iterparse.
 
-    Yields a sequence of expanded DOM Filing elements.
+    where - A _FilingFilter, or None. If given, only Filing elements
+    that pass the filter are yielded. The Filing element's attributes
+    are checked as soon as it starts, and none of the sub-elements of
+    a Filing that fails that check are parsed.
+
+    quarantine - None, or a function of two arguments, a filing ID and
+    an exception (see _parse_filing_elements). If given, a Filing
+    element whose attributes can't be checked against where is passed
+    to quarantine and skipped.
+
+    Yields a sequence of Filing elements. Each element is discarded,
+    along with all of its sub-elements, as soon as the next one is
+    requested, so memory use stays flat regardless of the size of the
+    document. Callers must not hold on to a yielded element.
 
     """
-    dom = xml.dom.pulldom.parse(doc)
-    for event, node in dom:
-        if event == 'START_ELEMENT' and node.nodeName == 'Filing':
-            dom.expandNode(node)
-            yield node
+    stream, opened = _open_doc(doc)
+    try:
+        context = iter(iterparse(stream, ('start', 'end')))
+        event, root = context.next()
+        if where is None:
+            for event, elt in context:
+                if event == 'end' and elt.tag == 'Filing':
+                    yield elt
+                    root.clear()
+        else:
+            for event, elt in context:
+                if elt.tag != 'Filing':
+                    continue
+                if event == 'start':
+                    wanted = _passes(where.filing, elt, quarantine)
+                else:
+                    if wanted and _passes(where.subelts, elt, quarantine):
+                        yield elt
+                    root.clear()
+    finally:
+        if opened:
+            stream.close()
 
 
 def _child_elements(elt):
-    """Yield a sequence of child elements of the given DOM element."""
-    for child in elt.childNodes:
-        if child.nodeType == xml.dom.Node.ELEMENT_NODE:
-            yield child
+    """Yield a sequence of child elements of the given element."""
+    return iter(elt)
 
 
+# Note that in Python 2, ElementTree returns plain str objects for
+# pure-ASCII attribute values. They're converted to unicode here so
+# that parsed filings are the same regardless of their content.
+
 def _attr_of(elt, attrname):
     """Get the value of an attribute of an element.
 
-    Returns the value of an attribute of the specified DOM element, or
-    None if no such attribute exists in the element.
+    Returns the value of an attribute of the specified element, or
+    None if no such attribute exists in the element (or its value is
+    the empty string).
 
-    elt - The DOM element.
+    elt - The element.
 
     attrname - The name of the attribute to retrieve.
 
     """
-    val = elt.getAttribute(attrname)
-    if val == '':
+    val = elt.get(attrname)
+    if not val:
         return None
     else:
-        return val
+        return unicode(val)
 
 
 def _element_name(elt):
     """The name of the given element."""
-    return elt.tagName
+    return elt.tag
+
+
+# lxml-specific code
+
+def _lxml_iterparse(source, events):
+    """An xml.etree-compatible iterparse function built on lxml.
+
+    Unlike xml.etree, lxml keeps comments and processing instructions
+    in the element tree by default. Those would otherwise show up as
+    sub-elements of Filing elements, so they're dropped here.
+
+    lxml can't read the buffer objects returned by a _MappedFile, but
+    it reads local files efficiently by itself, so it's given the
+    filename instead.
+
+    """
+    if isinstance(source, _MappedFile):
+        source = source.name
+    return lxml.etree.iterparse(source, events,
+                                remove_comments=True, remove_pis=True)
+
+
+# xml.dom.pulldom-specific code
+
+class _DOMElement(object):
+    """A DOM element wrapped in the subset of the xml.etree element API
+    used by the element parsers.
+
+    """
+    __slots__ = ['_node']
+
+    def __init__(self, node):
+        self._node = node
 
+    def get(self, name, default=None):
+        # getAttribute returns '' for missing attributes.
+        return self._node.getAttribute(name) or default
 
-# Parsers for DOM elements and their child elements.
+    def __iter__(self):
+        for child in self._node.childNodes:
+            if child.nodeType == xml.dom.Node.ELEMENT_NODE:
+                yield _DOMElement(child)
+
+    tag = property(lambda self: self._node.tagName)
+
+
+def _pulldom_filing_elements(doc, where=None, quarantine=None):
+    """The sequence of all Filing elements in a lobbyist database,
+    parsed with xml.dom.pulldom.
+
+    doc - The XML document. Can be a filename, a URL or a file-like
+    object.
+
+    where - A _FilingFilter, or None. If given, only Filing elements
+    that pass the filter are yielded. Filing elements that fail the
+    check of their attributes aren't expanded.
+
+    quarantine - None, or a function of two arguments, a filing ID and
+    an exception (see _filing_elements).
+
+    Yields a sequence of expanded Filing elements, wrapped in
+    _DOMElement objects.
+
+    """
+    stream, opened = _open_doc(doc)
+    try:
+        dom = xml.dom.pulldom.parse(stream)
+        for event, node in dom:
+            if event == 'START_ELEMENT' and node.nodeName == 'Filing':
+                elt = _DOMElement(node)
+                if where is None:
+                    dom.expandNode(node)
+                    yield elt
+                elif _passes(where.filing, elt, quarantine):
+                    dom.expandNode(node)
+                    if _passes(where.subelts, elt, quarantine):
+                        yield elt
+    finally:
+        if opened:
+            stream.close()
+
+
+# Parsers for elements and their child elements.
 
 def _parse_attrs(elt, attrs):
-    """Parse the attributes of a DOM element into a sequence of pairs.
+    """Parse the attributes of a element into a sequence of pairs.
 
-    elt - The DOM element.
+    elt - The element.
 
     attrs - A sequence of tuples of 3 items each. The first item is
     the attribute name (a string). The second is the identifier
     associated with the parsed attribute value in the yielded
     pair. The third is the parsing function. It's applied to the
-    attribute's DOM value, and its output is stored with the
+    attribute's value, and its output is stored with the
     identifier in the yielded pair.
 
     Note that the value of an attribute which doesn't appear in the
@@ -148,59 +640,74 @@ def _parse_attrs(elt, attrs):
         yield (id, parse(_attr_of(elt, name)))
 
 
-def _parse_element(elt, id, attrs):
-    return (id, dict(_parse_attrs(elt, attrs)))
+def _attr_values(elt, attrs):
+    """Parse the attributes of an element into a list of values.
+
+    Like _parse_attrs, but returns a list of parsed values, in the
+    order given by attrs, without their identifiers.
+
+    """
+    return [parse(_attr_of(elt, name)) for name, id, parse in attrs]
+
+
+def _parse_element(elt, id, attrs, builder):
+    return (id, builder.element(id, elt, attrs))
 
 
-def _parse_list(list_elt, id, subelt_parser):
+def _parse_list(list_elt, id, subelt_parser, builder):
     lst = list()
     for subelt in _child_elements(list_elt):
-        lst.append(dict([subelt_parser(subelt)]))
+        lst.append(subelt_parser(subelt, builder))
     return (id, lst)
 
 
-_client_attrs = [('ClientCountry', 'country', _optional),
+_client_attrs = [('ClientCountry', 'country', _interned(_optional)),
                  ('ClientID', 'senate_id', int),
                  ('ClientName', 'name', _identity),
-                 ('ClientPPBCountry', 'ppb_country', _identity),
-                 ('ClientPPBState', 'ppb_state', _optional),
-                 ('ClientState', 'state', _optional),
+                 ('ClientPPBCountry', 'ppb_country', _interned(_identity)),
+                 ('ClientPPBState', 'ppb_state', _interned(_optional)),
+                 ('ClientState', 'state', _interned(_optional)),
                  ('ClientStatus', 'status', _status),
                  ('ContactFullname', 'contact_name', _optional),
                  ('GeneralDescription', 'description', _optional),
                  ('IsStateOrLocalGov', 'state_or_local_gov', _is_gov)]
 
 
-def _parse_client(elt):
-    """Parse a Client DOM element.
+def _parse_client(elt, builder):
+    """Parse a Client element.
 
-    elt - The Client DOM element.
+    elt - The Client element.
+
+    builder - The builder for parsed filings (see _DictBuilder).
 
     Returns a pair whose first item is the string 'client' and whose
-    second item is the dictionary of parsed attributes.
+    second item is the parsed client.
 
     """
-    return _parse_element(elt, 'client', _client_attrs)
+    return _parse_element(elt, 'client', _client_attrs, builder)
 
 
 _registrant_attrs = [('Address', 'address', _optional),
                      ('GeneralDescription', 'description', _optional),
-                     ('RegistrantCountry', 'country', _identity),
+                     ('RegistrantCountry', 'country', _interned(_identity)),
                      ('RegistrantID', 'senate_id', int),
                      ('RegistrantName', 'name', _identity),
-                     ('RegistrantPPBCountry', 'ppb_country', _identity)]
+                     ('RegistrantPPBCountry', 'ppb_country',
+                      _interned(_identity))]
+
 
+def _parse_registrant(elt, builder):
+    """Parse a Registrant element.
 
-def _parse_registrant(elt):
-    """Parse a Registrant DOM element.
+    elt - The Registrant element.
 
-    elt - The Registrant DOM element.
+    builder - The builder for parsed filings (see _DictBuilder).
 
     Returns a pair whose first item is the string 'registrant' and
-    whose second item is the dictionary of parsed attributes.
+    whose second item is the parsed registrant.
 
     """
-    return _parse_element(elt, 'registrant', _registrant_attrs)
+    return _parse_element(elt, 'registrant', _registrant_attrs, builder)
 
 
 # LobbyistName uses the '_optional' parser. This is intentional; there
@@ -213,155 +720,177 @@ _lobbyist_attrs = [('LobbyistName', 'name', _optional),
                    ('OfficialPosition', 'official_position', _optional)]
 
 
-def _parse_lobbyist(elt):
-    """Parse a Lobbyist DOM element.
+def _parse_lobbyist(elt, builder):
+    """Parse a Lobbyist element.
 
-    elt - The Lobbyist DOM element.
+    elt - The Lobbyist element.
 
-    Returns a pair whose first item is the string 'lobbyist' and whose
-    second item is the dictionary of parsed attributes.
+    builder - The builder for parsed filings (see _DictBuilder).
+
+    Returns the parsed Lobbyist element, as an item of its
+    parent's list.
 
     """
-    return _parse_element(elt, 'lobbyist', _lobbyist_attrs)
+    return builder.item('lobbyist', elt, _lobbyist_attrs)
+
 
+def _parse_lobbyists(elt, builder):
+    """Parse a Lobbyists element.
 
-def _parse_lobbyists(elt):
-    """Parse a Lobbyists DOM element.
+    elt - The Lobbyists element.
 
-    elt - The Lobbyists DOM element.
+    builder - The builder for parsed filings (see _DictBuilder).
 
     Returns a pair whose first item is the string 'lobbyists' and
-    whose second item is a list of parsed Lobbyist DOM elements, one
+    whose second item is a list of parsed Lobbyist elements, one
     for each Lobbyist sub-element of this Lobbyists element.
 
     """
-    return _parse_list(elt, 'lobbyists', _parse_lobbyist)
+    return _parse_list(elt, 'lobbyists', _parse_lobbyist, builder)
 
 
-_govt_entity_attrs = [('GovEntityName', 'name', _identity)]
+_govt_entity_attrs = [('GovEntityName', 'name', _interned(_identity))]
 
 
-def _parse_govt_entity(elt):
-    """Parse a GovernmentEntity DOM element.
+def _parse_govt_entity(elt, builder):
+    """Parse a GovernmentEntity element.
 
-    elt - The GovernmentEntity DOM element.
+    elt - The GovernmentEntity element.
 
-    Returns a pair whose first item is the string 'govt_entity' and
-    whose second item is the dictionary of parsed attributes.
+    builder - The builder for parsed filings (see _DictBuilder).
+
+    Returns the parsed GovernmentEntity element, as an item of its
+    parent's list.
 
     """
-    return _parse_element(elt, 'govt_entity', _govt_entity_attrs)
+    return builder.item('govt_entity', elt, _govt_entity_attrs)
+
 
+def _parse_govt_entities(elt, builder):
+    """Parse a GovernmentEntities element.
 
-def _parse_govt_entities(elt):
-    """Parse a GovernmentEntities DOM element.
+    elt - The GovernmentEntities element.
 
-    elt - The GovernmentEntities DOM element.
+    builder - The builder for parsed filings (see _DictBuilder).
 
     Returns a pair whose first item is the string 'govt_entities' and
-    whose second item is a list of parsed GovernmentEntity DOM
-    elements, one for each GovernmentEntity sub-element of this
+    whose second item is a list of parsed GovernmentEntity elements,
+    one for each GovernmentEntity sub-element of this
     GovernmentEntities element.
 
     """
-    return _parse_list(elt, 'govt_entities', _parse_govt_entity)
+    return _parse_list(elt, 'govt_entities', _parse_govt_entity, builder)
 
 
-_issue_attrs = [('Code', 'code', _identity),
+_issue_attrs = [('Code', 'code', _interned(_identity)),
                 ('SpecificIssue', 'specific_issue', _optional)]
 
 
-def _parse_issue(elt):
-    """Parse an Issue DOM element.
+def _parse_issue(elt, builder):
+    """Parse an Issue element.
 
-    elt - The Issue DOM element.
+    elt - The Issue element.
 
-    Returns a pair whose first item is the string 'issue' and whose
-    second item is the dictionary of parsed attributes.
+    builder - The builder for parsed filings (see _DictBuilder).
+
+    Returns the parsed Issue element, as an item of its parent's list.
 
     """
-    return _parse_element(elt, 'issue', _issue_attrs)
+    return builder.item('issue', elt, _issue_attrs)
+
 
+def _parse_issues(elt, builder):
+    """Parse an Issues element.
 
-def _parse_issues(elt):
-    """Parse an Issues DOM element.
+    elt - The Issues element.
 
-    elt - The Issues DOM element.
+    builder - The builder for parsed filings (see _DictBuilder).
 
     Returns a pair whose first item is the string 'issues' and whose
-    second item is a list of parsed Issue DOM elements, one for each
+    second item is a list of parsed Issue elements, one for each
     Issue sub-element of this Issues element.
 
     """
-    return _parse_list(elt, 'issues', _parse_issue)
+    return _parse_list(elt, 'issues', _parse_issue, builder)
 
 
 _foreign_entity_attrs = [('ForeignEntityContribution', 'contribution', _amount),
-                         ('ForeignEntityCountry', 'country', _optional),
+                         ('ForeignEntityCountry', 'country',
+                              _interned(_optional)),
                          ('ForeignEntityName', 'name', _identity),
                          ('ForeignEntityOwnershipPercentage',
                               'ownership_percentage', _amount),
-                         ('ForeignEntityPPBcountry', 'ppb_country', _optional),
+                         ('ForeignEntityPPBcountry', 'ppb_country',
+                              _interned(_optional)),
                          ('ForeignEntityStatus', 'status', _status)]
 
 
-def _parse_foreign_entity(elt):
-    """Parse a (foreign) Entity DOM element.
+def _parse_foreign_entity(elt, builder):
+    """Parse a (foreign) Entity element.
 
-    elt - The (foreign) Entity DOM element.
+    elt - The (foreign) Entity element.
 
-    Returns a pair whose first item is the string 'foreign_entity' and
-    whose second item is the dictionary of parsed attributes.
+    builder - The builder for parsed filings (see _DictBuilder).
+
+    Returns the parsed (foreign) Entity element, as an item of its
+    parent's list.
 
     """
-    return _parse_element(elt, 'foreign_entity', _foreign_entity_attrs)
+    return builder.item('foreign_entity', elt, _foreign_entity_attrs)
+
 
+def _parse_foreign_entities(elt, builder):
+    """Parse a ForeignEntities element.
 
-def _parse_foreign_entities(elt):
-    """Parse a ForeignEntities DOM element.
+    elt - The ForeignEntities element.
 
-    elt - The ForeignEntities DOM element.
+    builder - The builder for parsed filings (see _DictBuilder).
 
     Returns a pair whose first item is the string 'foreign_entities'
-    and whose second item is a list of parsed (foreign) Entity DOM
+    and whose second item is a list of parsed (foreign) Entity
     elements, one for each Entity sub-element of this ForeignEntities
     element.
 
     """
-    return _parse_list(elt, 'foreign_entities', _parse_foreign_entity)
+    return _parse_list(elt, 'foreign_entities', _parse_foreign_entity,
+                       builder)
 
 
 # The affiliated org PPB country attribute name is spelled,
 # "AffiliatedOrgPPBCcountry" (sic).
 
-_org_attrs = [('AffiliatedOrgCountry', 'country', _optional),
+_org_attrs = [('AffiliatedOrgCountry', 'country', _interned(_optional)),
               ('AffiliatedOrgName', 'name', _identity),
-              ('AffiliatedOrgPPBCcountry', 'ppb_country', _identity)]
+              ('AffiliatedOrgPPBCcountry', 'ppb_country',
+               _interned(_identity))]
 
 
-def _parse_org(elt):
-    """Parse an Org DOM element.
+def _parse_org(elt, builder):
+    """Parse an Org element.
 
-    elt - The Org DOM element.
+    elt - The Org element.
 
-    Returns a pair whose first item is the string 'org' and whose
-    second item is the dictionary of parsed attributes.
+    builder - The builder for parsed filings (see _DictBuilder).
+
+    Returns the parsed Org element, as an item of its parent's list.
 
     """
-    return _parse_element(elt, 'org', _org_attrs)
+    return builder.item('org', elt, _org_attrs)
+
 
+def _parse_affiliated_orgs(elt, builder):
+    """Parse an AffiliatedOrgs element.
 
-def _parse_affiliated_orgs(elt):
-    """Parse an AffiliatedOrgs DOM element.
+    elt - The AffiliatedOrgs element.
 
-    elt - The AffiliatedOrgs DOM element.
+    builder - The builder for parsed filings (see _DictBuilder).
 
     Returns a pair whose first item is the string 'affiliated_orgs'
-    and whose second item is a list of parsed Org DOM elements, one
+    and whose second item is a list of parsed Org elements, one
     for each Org sub-element of this AffiliatedOrgs element.
 
     """
-    return _parse_list(elt, 'affiliated_orgs', _parse_org)
+    return _parse_list(elt, 'affiliated_orgs', _parse_org, builder)
 
 
 # AffiliatedOrgsURL parser ideally would be a URL parser, but
@@ -372,28 +901,167 @@ _filing_attrs = [('ID', 'id', _identity),
                  ('Year', 'year', int),
                  ('Received', 'filing_date', _identity),
                  ('Amount', 'amount', _amount),
-                 ('Type', 'type', _identity),
+                 ('Type', 'type', _interned(_identity)),
                  ('Period', 'period', _period),
                  ('AffiliatedOrgsURL', 'affiliated_orgs_url', _optional)]
 
 
-def _parse_filing(elt):
-    """Parse a Filing DOM element.
+def _parse_filing(elt, builder):
+    """Parse a Filing element.
 
-    elt - The Filing DOM element.
+    elt - The Filing element.
 
-    Returns a pair whose first item is the string 'filing' and whose
-    second item is the dictionary of parsed attributes.
+    builder - The builder for parsed filings (see _DictBuilder).
+
+    Returns a new parsed filing, which contains the Filing element's
+    parsed attributes but none of its sub-elements.
 
     """
-    return _parse_element(elt, 'filing', _filing_attrs)
+    return builder.filing(elt)
+
+
+# Filing filters.
+#
+# parse_filings(doc, where={...}) only yields the filings that match
+# the where dictionary. The parser backends check each Filing element's
+# attributes before any of its sub-elements are parsed (or, where the
+# underlying parser allows it, built), so filings that don't match cost
+# very little.
+
+def _filter_values(value):
+    """The set of values allowed by a value in a where dictionary."""
+    if isinstance(value, (list, tuple, set, frozenset)):
+        return frozenset(value)
+    return frozenset([value])
+
+
+class _FilingFilter(object):
+    """A compiled where dictionary (see parse_filings).
+
+    where - The where dictionary.
+
+    """
+    def __init__(self, where):
+        parsers = dict([(id, (name, parse))
+                        for name, id, parse in _filing_attrs])
+        self._attrs = list()
+        self.registrant_ids = None
+        for key, value in where.iteritems():
+            if key == 'registrant':
+                self.registrant_ids = _filter_values(value)
+            else:
+                name, parse = parsers[key]
+                self._attrs.append((name, parse, _filter_values(value)))
+
+    def filing(self, elt):
+        """Return True if the attributes of the Filing element elt
+        match the filter."""
+        for name, parse, allowed in self._attrs:
+            if parse(_attr_of(elt, name)) not in allowed:
+                return False
+        return True
+
+    def registrant(self, elt):
+        """Return True if the Registrant element elt matches the filter.
+
+        elt may be None if the filing has no Registrant element.
+
+        """
+        if self.registrant_ids is None:
+            return True
+        return elt is not None and \
+            int(elt.get('RegistrantID')) in self.registrant_ids
+
+    def subelts(self, elt):
+        """Return True if the sub-elements of the Filing element elt
+        match the filter."""
+        if self.registrant_ids is None:
+            return True
+        # The Registrant element, if any, is always the first
+        # sub-element of a Filing element.
+        for subelt in _child_elements(elt):
+            if _element_name(subelt) == 'Registrant':
+                return self.registrant(subelt)
+            break
+        return False
+
+
+def _passes(check, elt, quarantine):
+    """Check a Filing element against a _FilingFilter.
+
+    check - The _FilingFilter method to call with elt.
+
+    elt - The Filing element.
+
+    quarantine - None, or a function of two arguments, a filing ID and
+    an exception. If given, an exception raised by check (e.g., for an
+    unknown Period attribute) is passed to quarantine along with the
+    filing's ID, and the element fails the check.
+
+    """
+    if quarantine is None:
+        return check(elt)
+    try:
+        return check(elt)
+    except Exception, e:
+        quarantine(_attr_of(elt, 'ID'), e)
+        return False
+
+
+def _filing_filter(where):
+    """Return a _FilingFilter for the where dictionary where, or None
+    if where is None."""
+    if where is None:
+        return None
+    return _FilingFilter(where)
+
+
+# Projections.
+#
+# parse_filings(doc, include=[...], exclude=[...]) only parses the
+# selected sections of each filing, and import_filings accepts the
+# same arguments to import only the selected sections. A section is
+# 'filing' (the Filing element's own attributes) or one of the keys of
+# a filing's sub-elements, e.g., 'issues'.
+
+def _projection(include, exclude):
+    """Return the set of sections selected by include and exclude.
+
+    include - A sequence of section names, or None for all sections.
+
+    exclude - A sequence of section names to remove from include, or
+    None.
+
+    Returns a frozenset of section names, or None if include and
+    exclude are both None. Raises KeyError for an unknown section.
+
+    """
+    if include is None and exclude is None:
+        return None
+    sections = ['filing'] + _filing_subelts
+    include = sections if include is None else list(include)
+    exclude = list(exclude or ())
+    for key in include + exclude:
+        if key not in sections:
+            raise KeyError(key)
+    return frozenset(include) - frozenset(exclude)
+
+
+def _projected_subelts(include, exclude):
+    """Return the set of names of the sub-elements selected by include
+    and exclude (see _projection), or None if all are selected."""
+    sections = _projection(include, exclude)
+    if sections is None:
+        return None
+    return frozenset([name for name, (id, item_id, attrs) in
+                      _sax_subelts.iteritems() if id in sections])
 
 
 # These parsers are used by parse_filings to parse sub-elements of
-# Filing DOM elements. The parser is applied to a single argument, the
-# DOM element to parse. The parser must return a key-value pair
-# ('thing_name': thing_value), which will be inserted into the
-# dictionary representing the parsed Filing element.
+# Filing elements. The parser is applied to two arguments, the element
+# to parse and the builder for parsed filings. The parser must return
+# a key-value pair ('thing_name': thing_value), which will be added
+# to the parsed filing.
 
 _subelt_parsers = {'Registrant': _parse_registrant,
                    'Client': _parse_client,
@@ -404,54 +1072,2219 @@ _subelt_parsers = {'Registrant': _parse_registrant,
                    'AffiliatedOrgs': _parse_affiliated_orgs}
 
 
-def parse_filings(doc):
-    """Parse all filing records in a lobbyist database.
+# Compact records.
+#
+# With parse_filings(doc, records=True), each parsed filing is a
+# Filing object rather than a dictionary. The record classes use
+# __slots__, so a record costs a small fraction of the memory of the
+# equivalent dictionary. Records support the read-only subset of the
+# dictionary interface that import_filings uses, so a sequence of
+# Filing records can be imported just like a sequence of dictionaries.
+
+def _record_fields(attrs):
+    """The field names of a record class, given its attribute table."""
+    return [id for name, id, parse in attrs]
+
+
+class _Record(object):
+    """The base class for parsed records.
+
+    The positional arguments to the constructor are the values of the
+    record's fields, in the order given by its attribute table.
+
+    """
+    __slots__ = []
+    _fields = frozenset()
+
+    def __init__(self, *values):
+        for name, value in zip(self.__slots__, values):
+            setattr(self, name, value)
+
+    def __getitem__(self, key):
+        if key in self._fields:
+            try:
+                return getattr(self, key)
+            except AttributeError:
+                pass
+        raise KeyError(key)
+
+    def __contains__(self, key):
+        return key in self._fields and hasattr(self, key)
+
+    def get(self, key, default=None):
+        if key in self:
+            return self[key]
+        return default
+
+    def keys(self):
+        return [x for x in self.__slots__ if hasattr(self, x)]
+
+    def asdict(self):
+        """Return the record as a parsed element dictionary."""
+        return dict([(x, getattr(self, x)) for x in self.keys()])
+
+    def __eq__(self, other):
+        return type(self) is type(other) and self.asdict() == other.asdict()
+
+    def __ne__(self, other):
+        return not self == other
+
+    def __repr__(self):
+        return '%s(%s)' % (self.__class__.__name__,
+                           ', '.join(['%s=%r' % (x, getattr(self, x))
+                                      for x in self.keys()]))
+
+
+class Registrant(_Record):
+    """A parsed Registrant element."""
+    __slots__ = _record_fields(_registrant_attrs)
+    _fields = frozenset(__slots__)
+    _kind = 'registrant'
+
+
+class Client(_Record):
+    """A parsed Client element."""
+    __slots__ = _record_fields(_client_attrs)
+    _fields = frozenset(__slots__)
+    _kind = 'client'
+
+
+class Lobbyist(_Record):
+    """A parsed Lobbyist element."""
+    __slots__ = _record_fields(_lobbyist_attrs)
+    _fields = frozenset(__slots__)
+    _kind = 'lobbyist'
+
+
+class GovtEntity(_Record):
+    """A parsed GovernmentEntity element."""
+    __slots__ = _record_fields(_govt_entity_attrs)
+    _fields = frozenset(__slots__)
+    _kind = 'govt_entity'
+
+
+class Issue(_Record):
+    """A parsed Issue element."""
+    __slots__ = _record_fields(_issue_attrs)
+    _fields = frozenset(__slots__)
+    _kind = 'issue'
+
+
+class ForeignEntity(_Record):
+    """A parsed (foreign) Entity element."""
+    __slots__ = _record_fields(_foreign_entity_attrs)
+    _fields = frozenset(__slots__)
+    _kind = 'foreign_entity'
+
+
+class AffiliatedOrg(_Record):
+    """A parsed (affiliated) Org element."""
+    __slots__ = _record_fields(_org_attrs)
+    _fields = frozenset(__slots__)
+    _kind = 'org'
+
+
+# The keys of a Filing record's sub-elements.
+
+_filing_subelts = ['registrant', 'client', 'lobbyists', 'govt_entities',
+                   'issues', 'foreign_entities', 'affiliated_orgs']
+
+
+class Filing(_Record):
+    """A parsed Filing element.
+
+    A Filing record holds both the Filing element's attributes and its
+    sub-elements. Fields for sub-elements that don't appear in the
+    Filing element are unset. To mimic the dictionaries yielded by
+    parse_filings, filing['filing'] is the record itself.
+
+    """
+    __slots__ = _record_fields(_filing_attrs) + _filing_subelts
+    _fields = frozenset(__slots__)
+
+    def __getitem__(self, key):
+        if key == 'filing':
+            return self
+        return _Record.__getitem__(self, key)
+
+    def __contains__(self, key):
+        return key == 'filing' or _Record.__contains__(self, key)
+
+    def asdict(self):
+        """Return the record as a parsed filing dictionary.
+
+        The result is identical to the dictionary that parse_filings
+        yields when records is False.
+
+        """
+        result = {'filing': dict([(x, getattr(self, x))
+                                  for x in _record_fields(_filing_attrs)])}
+        for key in _filing_subelts:
+            if key in self:
+                value = getattr(self, key)
+                if isinstance(value, list):
+                    result[key] = [{x._kind: x.asdict()} for x in value]
+                else:
+                    result[key] = value.asdict()
+        return result
+
+
+_record_classes = {'registrant': Registrant,
+                   'client': Client,
+                   'lobbyist': Lobbyist,
+                   'govt_entity': GovtEntity,
+                   'issue': Issue,
+                   'foreign_entity': ForeignEntity,
+                   'org': AffiliatedOrg}
+
+
+# Compiled attribute decoders.
+#
+# _parse_attrs and _attr_values interpret an attribute table for every
+# element they parse, which costs a generator step, an _attr_of call
+# and a parser call per attribute. The builders instead use decoders
+# compiled once per attribute table at import time. A decoder is a
+# function of one argument, the element, which returns the element's
+# parsed attributes, either as a dictionary literal or as a record
+# whose fields are set directly. The _identity and _optional parsers
+# are inlined, as is the interning of _interned parsers; the other
+# parsers are called by name. Compiled decoders
+# produce exactly the same values as _parse_attrs.
+
+_attr_tables = {'filing': _filing_attrs,
+                'registrant': _registrant_attrs,
+                'client': _client_attrs,
+                'lobbyist': _lobbyist_attrs,
+                'govt_entity': _govt_entity_attrs,
+                'issue': _issue_attrs,
+                'foreign_entity': _foreign_entity_attrs,
+                'org': _org_attrs}
+
+
+def _column_kind(parse):
+    """The kind of column that holds values parsed by the parser parse:
+    'int', 'amount' or 'string'."""
+    if parse is int:
+        return 'int'
+    elif parse is _amount:
+        return 'amount'
+    else:
+        return 'string'
+
+
+def _decoder_source(fname, attrs, record=None, columns=False,
+                    parser_name=None):
+    """Return the source code of a decoder function.
+
+    fname - The name of the decoder function.
+
+    attrs - The attribute table (see _parse_attrs).
+
+    record - If None, the decoder returns a dictionary. Otherwise, the
+    global name of a record class; the decoder returns a new instance
+    of it, without calling its constructor.
+
+    columns - If True, the decoder takes a second argument, the
+    sequence of column bindings for attrs (see _column_bindings), and
+    appends each parsed value to its column instead of returning
+    anything.
+
+    parser_name - A function of two arguments, the index of an
+    attribute in attrs and its parser, which returns the global name
+    by which the decoder calls the parser. By default, the parser of
+    attribute i is called p<i>.
+
+    Besides the parsers and the record class, the decoder uses the
+    globals unicode, new (object.__new__), intern (_intern_table), nan
+    (_nan) and len.
+
+    """
+    if parser_name is None:
+        parser_name = lambda i, parse: 'p%d' % i
+    lines = ['def %s(elt):' % fname, '    get = elt.get']
+    values = list()
+    for i, (name, id, parse) in enumerate(attrs):
+        lines.append('    v%d = get(%r)' % (i, name))
+        interned = hasattr(parse, 'parse')
+        if interned:
+            parse = parse.parse
+        if parse is _identity:
+            expr = '(v%d and unicode(v%d) or None)' % (i, i)
+        elif parse is _optional:
+            expr = "(v%d and unicode(v%d) or 'unspecified')" % (i, i)
+        else:
+            expr = '%s(v%d and unicode(v%d) or None)' % \
+                (parser_name(i, parse), i, i)
+        if interned:
+            expr = 'intern(%s)' % expr
+        values.append((id, expr))
+    if columns:
+        lines[0] = 'def %s(elt, bindings):' % fname
+        names = list()
+        for i, (name, id, parse) in enumerate(attrs):
+            kind = _column_kind(parse)
+            expr = values[i][1]
+            if kind == 'int':
+                names.append('a%d' % i)
+                lines.append('    a%d(%s)' % (i, expr))
+            elif kind == 'amount':
+                names.append('a%d' % i)
+                lines.append('    x = %s' % expr)
+                lines.append('    a%d(nan if x is None else x)' % i)
+            else:
+                names.extend(['a%d' % i, 's%d' % i, 'd%d' % i])
+                lines.append('    a%d(s%d(%s, len(d%d)))' % (i, i, expr, i))
+        lines.insert(1, '    (%s,) = bindings' % ', '.join(names))
+    elif record is None:
+        lines.append('    return {%s}' % ',\n            '.join(
+                ['%r: %s' % x for x in values]))
+    else:
+        lines.append('    r = new(%s)' % record)
+        lines.extend(['    r.%s = %s' % x for x in values])
+        lines.append('    return r')
+    return '\n'.join(lines) + '\n'
+
+
+def _compile_decoder(attrs, cls=None, columns=False):
+    """Compile an attribute table into a decoder function.
+
+    attrs - The attribute table (see _parse_attrs).
+
+    cls - If None, the decoder returns a dictionary. Otherwise, it
+    returns a new instance of the record class cls, without calling
+    its constructor.
+
+    columns - If True, the decoder takes a second argument, the
+    sequence of column bindings for attrs (see _column_bindings), and
+    appends each parsed value to its column instead of returning
+    anything.
+
+    Returns the decoder function.
+
+    """
+    env = {'unicode': unicode, 'new': object.__new__, 'cls': cls,
+           'intern': _intern_table, 'nan': _nan, 'len': len}
+    for i, (name, id, parse) in enumerate(attrs):
+        env['p%d' % i] = getattr(parse, 'parse', parse)
+    exec _decoder_source('decode', attrs, cls and 'cls', columns) in env
+    return env['decode']
+
+
+# The decoders can also be generated ahead of time, from the RELAX NG
+# schema in doc/lobbyists.rng, into the _decoders module (see
+# lobbyists.schema, which setup.py runs when building the package). The
+# generated module is only used if it was generated from the current
+# attribute tables; otherwise, the decoders are compiled here.
+
+def _parser_ref(parse):
+    """The name of an attribute parser, as used in generated code."""
+    if hasattr(parse, 'parse'):
+        return 'intern:' + parse.parse.__name__
+    return parse.__name__
+
+
+def _tables_digest():
+    """Return a digest of the attribute tables."""
+    h = hashlib.sha256()
+    for id in sorted(_attr_tables):
+        for name, key, parse in _attr_tables[id]:
+            h.update('%s %s %s %s\n' % (id, name, key, _parser_ref(parse)))
+    return h.hexdigest()
+
+
+def _generated_decoders():
+    """Return the generated _decoders module, or None if it hasn't been
+    generated or doesn't match the attribute tables."""
+    try:
+        from . import _decoders
+        if _decoders.TABLES_DIGEST == _tables_digest():
+            return _decoders
+    except (ImportError, AttributeError):
+        pass
+    return None
+
+
+_generated = _generated_decoders()
+if _generated is not None:
+    _dict_decoders = dict(_generated.DICT_DECODERS)
+    _record_decoders = dict(_generated.RECORD_DECODERS)
+    _column_decoders = dict(_generated.COLUMN_DECODERS)
+else:
+    _dict_decoders = dict([(id, _compile_decoder(attrs))
+                           for id, attrs in _attr_tables.iteritems()])
+    _record_decoders = dict([(id, _compile_decoder(attrs,
+                                                   _record_classes[id]))
+                             for id, attrs in _attr_tables.iteritems()
+                             if id != 'filing'])
+    _record_decoders['filing'] = _compile_decoder(_filing_attrs, Filing)
+    _column_decoders = dict([(id, _compile_decoder(attrs, columns=True))
+                             for id, attrs in _attr_tables.iteritems()])
+
+
+# Builders for parsed filings.
+#
+# A builder determines how parsed filings are represented. The parser
+# backends hand each element (or, for the SAX backend, each element's
+# attributes) to the builder, which returns its parsed
+# representation. Builders have four methods:
+#
+# filing(elt) - Return a new parsed filing for the Filing element elt.
+#
+# element(id, elt, attrs) - Return the parsed representation of elt,
+# a sub-element of a Filing element, using the attribute table attrs.
+# (The builders below use the compiled decoder for id, which is
+# equivalent.)
+#
+# item(id, elt, attrs) - Likewise, for an element that's an item in a
+# list sub-element (e.g., a Lobbyist element in a Lobbyists element).
+#
+# add(filing, id, value) - Add a parsed sub-element to a parsed filing.
+
+class _DictBuilder(object):
+    """Build parsed filings as dictionaries (the default)."""
+    def filing(self, elt):
+        return {'filing': _dict_decoders['filing'](elt)}
+
+    def element(self, id, elt, attrs):
+        return _dict_decoders[id](elt)
+
+    def item(self, id, elt, attrs):
+        return {id: _dict_decoders[id](elt)}
+
+    def add(self, filing, id, value):
+        filing[id] = value
+
+
+class _FlatDictBuilder(_DictBuilder):
+    """Build parsed filings as dictionaries, with flat lists.
+
+    Items in list sub-elements are plain dictionaries of parsed
+    attributes, rather than dictionaries wrapped in single-key
+    dictionaries.
+
+    """
+    def item(self, id, elt, attrs):
+        return _dict_decoders[id](elt)
+
+
+class _RecordBuilder(object):
+    """Build parsed filings as compact records."""
+    def filing(self, elt):
+        return _record_decoders['filing'](elt)
+
+    def element(self, id, elt, attrs):
+        return _record_decoders[id](elt)
+
+    item = element
+
+    def add(self, filing, id, value):
+        setattr(filing, id, value)
+
+
+_dicts = _DictBuilder()
+_flat_dicts = _FlatDictBuilder()
+_records = _RecordBuilder()
+
+
+def _parse_filing_element(filing_elt, builder, subelts):
+    filing = _parse_filing(filing_elt, builder)
+    for elt in _child_elements(filing_elt):
+        name = _element_name(elt)
+        if subelts is None or name in subelts:
+            builder.add(filing, *_subelt_parsers[name](elt, builder))
+    return filing
+
+
+def _parse_filing_elements(filing_elts, builder, subelts=None,
+                           quarantine=None,
+                           parse_element=_parse_filing_element):
+    """Parse a sequence of Filing elements.
+
+    filing_elts - The sequence of Filing elements.
+
+    builder - The builder for parsed filings.
+
+    subelts - The set of names of the sub-elements to parse, or None
+    to parse all of them.
+
+    quarantine - None, or a function of two arguments, a filing ID and
+    an exception. If given, an exception raised while parsing a
+    Filing element is passed to quarantine along with the filing's
+    ID, and the filing is skipped.
+
+    parse_element - The function that parses each Filing element,
+    given the element, the builder and subelts.
+
+    Yields a sequence of parsed filings, one per filing record.
+
+    """
+    if quarantine is None:
+        for filing_elt in filing_elts:
+            yield parse_element(filing_elt, builder, subelts)
+        return
+    for filing_elt in filing_elts:
+        try:
+            filing = parse_element(filing_elt, builder, subelts)
+        except Exception, e:
+            quarantine(_attr_of(filing_elt, 'ID'), e)
+            continue
+        yield filing
+
+
+def _iterparse_filings(doc, builder, where=None, subelts=None,
+                       quarantine=None):
+    """Parse all filing records in a lobbyist database with xml.etree."""
+    return _parse_filing_elements(_filing_elements(doc, where=where,
+                                                   quarantine=quarantine),
+                                  builder, subelts, quarantine)
+
+
+def _lxml_filings(doc, builder, where=None, subelts=None, quarantine=None):
+    """Parse all filing records in a lobbyist database with lxml."""
+    return _parse_filing_elements(_filing_elements(doc, _lxml_iterparse,
+                                                   where, quarantine),
+                                  builder, subelts, quarantine)
+
+
+def _pulldom_filings(doc, builder, where=None, subelts=None,
+                     quarantine=None):
+    """Parse all filing records in a lobbyist database with
+    xml.dom.pulldom.
+
+    """
+    return _parse_filing_elements(_pulldom_filing_elements(doc, where,
+                                                           quarantine),
+                                  builder, subelts, quarantine)
+
+
+# xml.sax-specific code
+
+# The SAX backend builds each parsed filing directly from the
+# attributes passed to the handler's startElement method, without
+# building an element tree first. SAX attribute objects have the same
+# get method as elements, so the attribute tables and builders are
+# shared with the other backends.
+#
+# For each sub-element of a Filing element, this table gives the
+# filing dictionary key, the key of each list item (or None if the
+# sub-element is not a list) and the attribute table for the
+# sub-element (or for its list items).
+
+_sax_subelts = {'Registrant': ('registrant', None, _registrant_attrs),
+                'Client': ('client', None, _client_attrs),
+                'Lobbyists': ('lobbyists', 'lobbyist', _lobbyist_attrs),
+                'GovernmentEntities': ('govt_entities', 'govt_entity',
+                                       _govt_entity_attrs),
+                'Issues': ('issues', 'issue', _issue_attrs),
+                'ForeignEntities': ('foreign_entities', 'foreign_entity',
+                                    _foreign_entity_attrs),
+                'AffiliatedOrgs': ('affiliated_orgs', 'org', _org_attrs)}
+
+
+class _FilingHandler(xml.sax.handler.ContentHandler):
+    """A SAX content handler that builds parsed filings.
+
+    Completed filings are appended to the handler's filings list. The
+    consumer is expected to empty the list periodically.
+
+    builder - The builder for parsed filings.
+
+    """
+    def __init__(self, builder):
+        xml.sax.handler.ContentHandler.__init__(self)
+        self.filings = list()
+        self._builder = builder
+        self._filing = None
+        self._list = None
+        self._list_name = None
+        self._item_id = None
+        self._item_attrs = None
+
+    def startElement(self, name, attrs):
+        if self._list is not None:
+            self._list.append(self._builder.item(self._item_id, attrs,
+                                                 self._item_attrs))
+        elif self._filing is not None:
+            id, item_id, subelt_attrs = _sax_subelts[name]
+            if item_id is None:
+                self._builder.add(self._filing, id,
+                                  self._builder.element(id, attrs,
+                                                        subelt_attrs))
+            else:
+                self._list = list()
+                self._builder.add(self._filing, id, self._list)
+                self._list_name = name
+                self._item_id = item_id
+                self._item_attrs = subelt_attrs
+        elif name == 'Filing':
+            self._filing = _parse_filing(attrs, self._builder)
+
+    def endElement(self, name):
+        if self._list is not None:
+            if name == self._list_name:
+                self._list = None
+        elif name == 'Filing':
+            self.filings.append(self._filing)
+            self._filing = None
+
+
+class _FilteringHandler(_FilingHandler):
+    """A _FilingHandler that only builds filings that pass a filter, and
+    only the selected sub-elements of those filings, and that can
+    quarantine filings that fail to parse.
+
+    The attributes of each Filing element are checked when it starts.
+    The events inside filings that fail the check are ignored, as are
+    the events inside sub-elements that aren't selected. When the
+    filter also checks the registrant, building the filing is put off
+    until its first sub-element, which is the Registrant element if
+    there is one.
+
+    builder - The builder for parsed filings.
+
+    where - The _FilingFilter, or None.
+
+    subelts - The set of names of the sub-elements to build, or None
+    to build all of them.
+
+    quarantine - None, or a function of two arguments, a filing ID and
+    an exception. If given, an exception raised while building a
+    filing is passed to quarantine along with the filing's ID, and
+    the rest of the filing is ignored.
+
+    """
+    def __init__(self, builder, where, subelts, quarantine=None):
+        _FilingHandler.__init__(self, builder)
+        self._where = where
+        self._subelts = subelts
+        self._quarantine = quarantine
+        self._skipping = False
+        self._pending = None
+        self._skipped_subelt = None
+        self._filing_id = None
+
+    def startElement(self, name, attrs):
+        if self._quarantine is None:
+            self._start(name, attrs)
+            return
+        try:
+            self._start(name, attrs)
+        except Exception, e:
+            self._quarantine(self._filing_id, e)
+            self._filing = None
+            self._list = None
+            self._pending = None
+            self._skipped_subelt = None
+            self._skipping = True
+
+    def _start(self, name, attrs):
+        if self._skipping or self._skipped_subelt is not None:
+            return
+        if self._pending is not None:
+            pending, self._pending = self._pending, None
+            if name != 'Registrant' or not self._where.registrant(attrs):
+                self._skipping = True
+                return
+            self._filing = _parse_filing(pending, self._builder)
+        elif self._filing is None:
+            if name == 'Filing':
+                self._filing_id = attrs.get('ID')
+            if name == 'Filing' and self._where is not None:
+                if not self._where.filing(attrs):
+                    self._skipping = True
+                    return
+                if self._where.registrant_ids is not None:
+                    self._pending = attrs
+                    return
+            _FilingHandler.startElement(self, name, attrs)
+            return
+        if self._list is None and self._subelts is not None and \
+                name not in self._subelts:
+            self._skipped_subelt = name
+            return
+        _FilingHandler.startElement(self, name, attrs)
+
+    def endElement(self, name):
+        if self._skipped_subelt is not None:
+            if name == self._skipped_subelt:
+                self._skipped_subelt = None
+            return
+        if self._skipping or self._pending is not None:
+            if name == 'Filing':
+                self._skipping = False
+                self._pending = None
+            return
+        _FilingHandler.endElement(self, name)
+
+
+# The size of the chunks read from the document and fed to the SAX
+# parser.
+
+_read_size = 64 * 1024
+
+
+def _sax_filings(doc, builder, where=None, subelts=None, quarantine=None):
+    """Parse all filing records in a lobbyist database with xml.sax.
+
+    doc - The database to parse. Can be a filename, a URL or a
+    file-like object.
+
+    builder - The builder for parsed filings.
+
+    where - A _FilingFilter, or None.
+
+    subelts - The set of names of the sub-elements to parse, or None
+    to parse all of them.
+
+    quarantine - None, or a function that's passed the ID of each
+    filing that fails to parse and the exception raised.
+
+    Yields a sequence of parsed filings, one per filing record.
+
+    """
+    stream, opened = _open_doc(doc)
+    if where is None and subelts is None and quarantine is None:
+        handler = _FilingHandler(builder)
+    else:
+        handler = _FilteringHandler(builder, where, subelts, quarantine)
+    parser = xml.sax.make_parser()
+    parser.setContentHandler(handler)
+    filings = handler.filings
+    try:
+        data = stream.read(_read_size)
+        while data:
+            parser.feed(data)
+            for filing in filings:
+                yield filing
+            del filings[:]
+            data = stream.read(_read_size)
+        parser.close()
+        for filing in filings:
+            yield filing
+    finally:
+        if opened:
+            stream.close()
+
+
+# Lazy filings.
+#
+# With parse_filings(doc, lazy=True), each parsed filing is a
+# LazyFiling. The Filing element's attributes are parsed right away,
+# but its sub-elements are kept as elements and only parsed when
+# they're first accessed. Lazy parsing needs an element tree, so it's
+# only supported by the element-based backends.
+
+class LazyFiling(object):
+    """A parsed filing whose sub-elements are parsed on first access.
+
+    A LazyFiling supports the read-only subset of the dictionary
+    interface that import_filings uses, so it can be used wherever a
+    parsed filing dictionary is read. filing['filing'] is parsed along
+    with the filing itself; each other key (e.g., 'lobbyists') is
+    parsed the first time it's looked up, and the result is kept.
+    Exceptions raised while parsing a sub-element are raised by the
+    lookup.
+
+    """
+    __slots__ = ['_values', '_pending', '_builder']
+
+    def __init__(self, values, builder):
+        self._values = values
+        self._pending = dict()
+        self._builder = builder
+
+    def __getitem__(self, key):
+        try:
+            return self._values[key]
+        except KeyError:
+            elt = self._pending[key]
+            id, value = _subelt_parsers[_element_name(elt)](elt,
+                                                            self._builder)
+            self._builder.add(self._values, id, value)
+            del self._pending[key]
+            return value
+
+    def __contains__(self, key):
+        return key in self._values or key in self._pending
+
+    def get(self, key, default=None):
+        # Not try/except KeyError: that would hide parsing errors.
+        if key in self:
+            return self[key]
+        return default
+
+    def keys(self):
+        return self._values.keys() + self._pending.keys()
+
+    def __iter__(self):
+        return iter(self.keys())
+
+    def __len__(self):
+        return len(self._values) + len(self._pending)
+
+    def asdict(self):
+        """Parse all of the filing's sub-elements and return the filing
+        as a parsed filing dictionary."""
+        for key in self._pending.keys():
+            self[key]
+        return dict(self._values)
+
+    def __eq__(self, other):
+        if isinstance(other, LazyFiling):
+            other = other.asdict()
+        return self.asdict() == other
+
+    def __ne__(self, other):
+        return not self == other
+
+    def __repr__(self):
+        return 'LazyFiling(%r, pending=%r)' % (self._values,
+                                               sorted(self._pending))
+
+
+def _lazy_filing_element(filing_elt, builder, subelts):
+    filing = LazyFiling(_parse_filing(filing_elt, builder), builder)
+    pending = filing._pending
+    for elt in _child_elements(filing_elt):
+        name = _element_name(elt)
+        if subelts is None or name in subelts:
+            pending[_sax_subelts[name][0]] = elt
+    return filing
+
+
+def _lazy_iterparse_filings(doc, builder, where=None, subelts=None,
+                            quarantine=None):
+    """Lazily parse all filing records in a lobbyist database with
+    xml.etree."""
+    return _parse_filing_elements(_filing_elements(doc, where=where,
+                                                   quarantine=quarantine),
+                                  builder, subelts, quarantine,
+                                  _lazy_filing_element)
+
+
+def _lazy_lxml_filings(doc, builder, where=None, subelts=None,
+                       quarantine=None):
+    """Lazily parse all filing records in a lobbyist database with
+    lxml."""
+    return _parse_filing_elements(_filing_elements(doc, _lxml_iterparse,
+                                                   where, quarantine),
+                                  builder, subelts, quarantine,
+                                  _lazy_filing_element)
+
+
+def _lazy_pulldom_filings(doc, builder, where=None, subelts=None,
+                          quarantine=None):
+    """Lazily parse all filing records in a lobbyist database with
+    xml.dom.pulldom."""
+    return _parse_filing_elements(_pulldom_filing_elements(doc, where,
+                                                           quarantine),
+                                  builder, subelts, quarantine,
+                                  _lazy_filing_element)
+
+
+# The available parser backends. Each backend is a function of five
+# arguments, the document to parse, the builder for parsed filings, an
+# optional _FilingFilter, an optional set of the names of the
+# sub-elements to parse (see _projection) and an optional quarantine
+# function (see _quarantine_reporter), which yields a sequence of
+# parsed filings. All backends yield identical filings. The lxml backend is
+# only available when lxml is installed.
+
+_parser_backends = {'iterparse': _iterparse_filings,
+                    'sax': _sax_filings,
+                    'pulldom': _pulldom_filings}
+if lxml is not None:
+    _parser_backends['lxml'] = _lxml_filings
+
+
+# The backends that support lazy parsing, by backend name.
+
+_lazy_backends = {'iterparse': _lazy_iterparse_filings,
+                  'pulldom': _lazy_pulldom_filings}
+if lxml is not None:
+    _lazy_backends['lxml'] = _lazy_lxml_filings
+
+
+# Backend names, fastest first. The first available backend is the
+# default. Without cElementTree, iterparse runs in pure Python and is
+# slower than the SAX backend.
+
+if _fast_etree:
+    _backend_preference = ['lxml', 'iterparse', 'sax', 'pulldom']
+else:
+    _backend_preference = ['lxml', 'sax', 'iterparse', 'pulldom']
+
+
+def _builder(records, flat):
+    """Return the builder for the given parse_filings options."""
+    if records:
+        return _records
+    elif flat:
+        return _flat_dicts
+    else:
+        return _dicts
+
+
+def _transcoded(parse):
+    """Return a parser backend that parses documents with the backend
+    parse after transcoding them to UTF-8 (see _Utf8Transcoder)."""
+    def parse_transcoded(doc, builder, where=None, subelts=None,
+                         quarantine=None):
+        stream, opened = _open_doc(doc)
+        reader = _ThreadedReader(_Utf8Transcoder(stream, opened))
+        try:
+            for filing in parse(reader, builder, where, subelts,
+                                quarantine):
+                yield filing
+        finally:
+            reader.close()
+    return parse_transcoded
+
+
+def _parse_doc(doc, backend, builder, where, subelts, transcode=False,
+               quarantine=None, resume_from=None, lazy=False):
+    """Parse a document, or each document in a zip archive, with the
+    given backend name, builder, _FilingFilter and sub-element
+    names, optionally transcoding it to UTF-8 first, optionally
+    quarantining filings that fail to parse in the given sink,
+    optionally resuming from a byte offset or filing ID, and
+    optionally yielding LazyFilings (see parse_filings)."""
+    if lazy:
+        parse = _lazy_backends[backend]
+    else:
+        parse = _parser_backends[backend]
+    if transcode:
+        parse = _transcoded(parse)
+    if resume_from is not None:
+        return _parse_resumed(doc, parse, builder, where, subelts,
+                              quarantine, resume_from)
+    return _parse_all(doc, parse, builder, where, subelts, quarantine)
+
+
+def _parse_all(doc, parse, builder, where, subelts, quarantine):
+    if not _is_archive(doc):
+        return parse(doc, builder, where, subelts,
+                     _quarantine_reporter(quarantine, doc))
+    return _parse_archive(doc, parse, builder, where, subelts, quarantine)
 
-    doc - The database to parse. Can be a filename, a URL or anything
-    else that xml.dom.pulldom.parse takes as an argument.
 
-    Yields a sequence of dictionaries, one per filing record.
+def _parse_archive(filename, parse, builder, where, subelts, quarantine):
+    for doc in _archive_docs(filename):
+        for filing in parse(doc, builder, where, subelts,
+                            _quarantine_reporter(quarantine, doc)):
+            yield filing
+
+
+# Quarantined filings.
+
+def _filing_offset(doc, filing_id, start=0):
+    """Find the byte offset of a filing in a document.
+
+    doc - The document. Only uncompressed local files are searched.
+
+    filing_id - The filing's ID.
+
+    start - The offset from which to search. If the filing isn't found
+    after it, the whole document is searched.
+
+    Returns the offset of the first Filing element (after start, if
+    there is one) whose ID attribute is filing_id, or None if it can't
+    be found.
 
     """
-    for filing_elt in _filing_elements(doc):
-        filing = dict([_parse_filing(filing_elt)])
-        for elt in _child_elements(filing_elt):
-            parser = _subelt_parsers[_element_name(elt)]
-            filing.update([parser(elt)])
+    if filing_id is None or \
+            not (isinstance(doc, basestring) and os.path.isfile(doc)) or \
+            _decompressor(doc) is not None or _is_archive(doc):
+        return None
+    try:
+        f = _MappedFile(doc)
+    except (EnvironmentError, ValueError):
+        return None
+    try:
+        m = f.map
+        codec = _doc_codec(m[:2])
+        for begin in sorted(set([start, 0]), reverse=True):
+            for quote in u'"\'':
+                attr = u'ID=%s%s%s' % (quote, filing_id, quote)
+                pos = m.find(attr.encode(codec), begin)
+                if pos >= 0:
+                    filing = m.rfind(u'<Filing'.encode(codec), 0, pos)
+                    if filing >= 0:
+                        return filing
+        return None
+    finally:
+        f.close()
+
+
+def _quarantine_reporter(sink, doc):
+    """Return the quarantine function that the parser backends use to
+    report filings that fail to parse.
+
+    sink - The quarantine sink (see parse_filings), or None.
+
+    doc - The document being parsed.
+
+    Returns a function of two arguments, a filing ID and an exception,
+    which passes them to sink along with the filing's byte offset in
+    doc, or None if sink is None.
+
+    Filings are reported in document order, so each filing's offset is
+    searched for from the previous one's, and finding the offsets of
+    all the quarantined filings reads the document once, however many
+    there are.
+
+    """
+    if sink is None:
+        return None
+    last = [0]
+    def report(filing_id, exception):
+        offset = _filing_offset(doc, filing_id, last[0])
+        if offset is not None:
+            last[0] = offset + 1
+        sink((filing_id, offset, exception))
+    return report
+
+
+# Resumable parsing.
+#
+# Parsing an uncompressed local file can resume at any Filing element
+# without reading the bytes before it: the parser is given the
+# document's header (everything up to its first Filing element)
+# followed by the rest of the document from the resume point. Other
+# documents can only resume after a given filing ID, by parsing and
+# discarding the filings up to it.
+
+class _ResumedFile(object):
+    """A read-only view of a local document with the Filing elements
+    before a given offset left out.
+
+    filename - The name of the document file.
+
+    headlen - The length of the document's header, i.e., the offset of
+    its first Filing element.
+
+    offset - The offset of the Filing element at which to resume, or
+    of the document's tail.
+
+    """
+    def __init__(self, filename, headlen, offset):
+        self._file = _MappedFile(filename)
+        self._ranges = [(0, headlen), (offset, len(self._file.map))]
+
+    def read(self, size=-1):
+        ranges = self._ranges
+        while ranges and ranges[0][0] >= ranges[0][1]:
+            del ranges[0]
+        if not ranges:
+            return ''
+        start, end = ranges[0]
+        if size >= 0:
+            end = min(end, start + size)
+        ranges[0] = (end, ranges[0][1])
+        return self._file.map[start:end]
+
+    def close(self):
+        self._file.close()
+
+
+def _resume_point(doc, resume_from):
+    """Find the point at which to resume parsing a document.
+
+    doc - The document.
+
+    resume_from - A byte offset or a filing ID (see parse_filings).
+
+    Returns a pair of the length of the document's header and the
+    offset at which to resume, or None if doc isn't an uncompressed
+    local file and resume_from is a filing ID.
+
+    Raises ValueError if resume_from is a byte offset and doc isn't an
+    uncompressed local file, if there's no Filing element at the
+    offset, or if doc has no filing with the given ID.
+
+    """
+    by_id = isinstance(resume_from, basestring)
+    if not (isinstance(doc, basestring) and os.path.isfile(doc)) or \
+            _decompressor(doc) is not None or _is_archive(doc):
+        if by_id:
+            return None
+        raise ValueError('parsing can only resume from a byte offset in '
+                         'an uncompressed local file')
+    if by_id:
+        filing = _filing_offset(doc, resume_from)
+        if filing is None:
+            raise ValueError('filing %s not found in %s' % (resume_from,
+                                                             doc))
+    f = _MappedFile(doc)
+    try:
+        m = f.map
+        codec = _doc_codec(m[:4])
+        align = len(u' '.encode(codec))
+        pattern = _filing_start_re(codec)
+        first = _find_filing(m, pattern, align, 0, len(m))
+        if by_id:
+            tail = m.rfind(u'</'.encode(codec), filing)
+            offset = _find_filing(m, pattern, align, filing + 1, tail)
+            if offset is None:
+                offset = tail
+        else:
+            offset = resume_from
+            if first is None or offset < first or offset % align or \
+                    not pattern.match(m, offset):
+                raise ValueError('no Filing element at offset %d of %s' %
+                                 (offset, doc))
+        return first, offset
+    finally:
+        f.close()
+
+
+def _filings_after(filings, filing_id):
+    """Yield the filings in a sequence of parsed filings that follow
+    the one with the given ID.
+
+    Raises ValueError if there's no filing with that ID.
+
+    """
+    filings = iter(filings)
+    for filing in filings:
+        if filing['filing']['id'] == filing_id:
+            break
+    else:
+        raise ValueError('filing %s not found' % filing_id)
+    for filing in filings:
         yield filing
 
 
+def _parse_resumed(doc, parse, builder, where, subelts, quarantine,
+                   resume_from):
+    point = _resume_point(doc, resume_from)
+    if point is None:
+        return _filings_after(_parse_all(doc, parse, builder, where,
+                                         subelts, quarantine),
+                              resume_from)
+    headlen, offset = point
+    return _parse_from(doc, headlen, offset, parse, builder, where, subelts,
+                       quarantine)
+
+
+def _parse_from(doc, headlen, offset, parse, builder, where, subelts,
+                quarantine):
+    stream = _ResumedFile(doc, headlen, offset)
+    try:
+        for filing in parse(stream, builder, where, subelts,
+                            _quarantine_reporter(quarantine, doc)):
+            yield filing
+    finally:
+        stream.close()
+
+
+def parser_backends():
+    """The names of the available parser backends.
+
+    Returns a list of backend names, fastest first. The first name in
+    the list is the backend parse_filings uses by default.
+
+    """
+    return [x for x in _backend_preference if x in _parser_backends]
+
+
+def parse_filings(doc, backend=None, records=False, flat=False,
+                  where=None, include=None, exclude=None, transcode=False,
+                  quarantine=None, resume_from=None, lazy=False):
+    """Parse all filing records in a lobbyist database.
+
+    doc - The database to parse. Can be a filename, a URL or a
+    file-like object. Files whose names end in .gz, .bz2 or .xz are
+    decompressed as they're parsed (.xz requires the lzma module). A
+    file whose name ends in .zip is a zip archive of documents, which
+    are parsed in archive order as if they were one document.
+
+    backend - The name of the parser backend to use (see
+    parser_backends), or None (the default) to use the fastest
+    available backend. The backends are 'lxml' (only if lxml is
+    installed), 'iterparse', which builds a small xml.etree element
+    tree for each filing, 'sax', which builds the parsed filings
+    directly from xml.sax events, and 'pulldom', which builds a small
+    DOM tree for each filing. All backends yield the same filings.
+
+    records - If False (the default), each parsed filing is a
+    dictionary. If True, each parsed filing is a compact Filing
+    record instead (see the Filing class), which uses much less
+    memory. Filing records can be passed to import_filings just like
+    dictionaries.
+
+    flat - If False (the default), each item in a list of parsed
+    sub-elements (lobbyists, issues, etc.) is wrapped in a single-key
+    dictionary, e.g., {'lobbyist': {'name': ...}}. If True, each item
+    is just the dictionary of parsed attributes, e.g., {'name': ...},
+    which saves a dictionary per item. Flat filings can be passed to
+    import_filings, too. Filing records are always flat.
+
+    where - If None (the default), all filings are yielded. Otherwise,
+    a dictionary that selects the filings to yield. Its keys are keys
+    of the parsed 'filing' dictionary ('year', 'type', 'period', etc.)
+    or 'registrant', which stands for the registrant's senate_id. Each
+    value is either a single value or a list, tuple or set of values,
+    compared with the parsed values; e.g., {'year': 2008, 'period':
+    ['Q1', 'Q2']}. A filing is yielded only if all of its values are
+    allowed. Filings that don't match are skipped before their
+    sub-elements are parsed. Filings without a Registrant element
+    never match a 'registrant' filter.
+
+    include - If None (the default), every sub-element of a filing is
+    parsed. Otherwise, a list of the keys of the sub-elements to parse,
+    e.g., ['lobbyists', 'issues']. The others are skipped and don't
+    appear in the parsed filings. The 'filing' key is always present.
+
+    exclude - If not None, a list of the keys of sub-elements not to
+    parse. It's applied after include.
+
+    transcode - If True, documents encoded in UTF-16 (as the Senate's
+    documents are) are transcoded to UTF-8 in a background thread
+    before they're parsed, which halves the number of bytes the XML
+    parser has to read. Documents in other encodings are unaffected.
+    The parsed filings are the same either way.
+
+    quarantine - If None (the default), an exception raised while
+    parsing a filing (e.g., a KeyError for an unknown Period value or
+    sub-element) propagates to the caller, which ends the parse. If
+    not None, a quarantine sink: a function of one argument, which is
+    called with a tuple of 3 items for each filing that fails to
+    parse, the filing's ID, its byte offset in the document and the
+    exception raised, after which parsing continues with the next
+    filing. The ID is None if the Filing element has no ID; the byte
+    offset is None if doc isn't an uncompressed local file. The
+    append method of a list makes a simple sink. Note that errors in
+    the XML itself (i.e., documents that aren't well-formed) can't be
+    recovered from and are always raised.
+
+    resume_from - If None (the default), the whole document is parsed.
+    Otherwise, a checkpoint from which to resume an interrupted parse:
+    either the byte offset of a Filing element, at which parsing
+    resumes, or a filing ID (a string), in which case parsing resumes
+    with the filing that follows it. An uncompressed local file is
+    parsed directly from the resume point, without reading the bytes
+    before it. Byte offsets can only be used with such files; with
+    any other document, the filings up to the given ID are parsed and
+    discarded. Raises ValueError if there's no Filing element at the
+    given offset, or no filing with the given ID (in which case, for
+    documents that aren't uncompressed local files, it's raised only
+    once the whole document has been parsed).
+
+    lazy - If True, each parsed filing is a LazyFiling, which parses
+    the filing's sub-elements only when they're first accessed, so
+    consumers that only read filing['filing'] don't pay for parsing
+    lobbyists, issues, etc. (Sub-elements that are never accessed are
+    still read and kept, unparsed, until the filing is discarded;
+    include and exclude avoid even that.) Errors in sub-elements are
+    raised when they're accessed rather than quarantined. Lazy
+    parsing requires an element-based backend ('lxml', 'iterparse' or
+    'pulldom'; by default, the fastest available) and can't be
+    combined with records. Raises ValueError otherwise.
+
+    Yields a sequence of parsed filings, one per filing record. The
+    document is parsed incrementally.
+
+    """
+    if lazy:
+        if records:
+            raise ValueError('lazy parsing produces dictionaries, not '
+                             'records')
+        if backend is None:
+            backend = [x for x in parser_backends()
+                       if x in _lazy_backends][0]
+        elif backend not in _lazy_backends:
+            raise ValueError("the '%s' backend doesn't support lazy "
+                             "parsing" % backend)
+    elif backend is None:
+        backend = parser_backends()[0]
+    return _parse_doc(doc, backend, _builder(records, flat),
+                      _filing_filter(where),
+                      _projected_subelts(include, exclude), transcode,
+                      quarantine, resume_from, lazy)
+
+
+# Columnar parsing.
+#
+# parse_filings_columnar yields batches of filings as columns rather
+# than as one object per filing. Each attribute in the attribute tables
+# becomes a column. Attributes parsed with int are stored in arrays of
+# C longs; amounts are stored in arrays of doubles, with NaN for
+# missing amounts; all other attributes are strings (or None), stored
+# as StringColumns.
+
+class StringColumn(object):
+    """A dictionary-encoded column of strings.
+
+    values is the list of distinct values in the column, in order of
+    first appearance, and codes is an array of indices into values,
+    one per row. Indexing and iterating a StringColumn yields the
+    decoded strings.
+
+    """
+    __slots__ = ['codes', 'values', '_index']
+
+    def __init__(self):
+        self.codes = array.array('l')
+        self.values = list()
+        self._index = dict()
+
+    def append(self, value):
+        self.codes.append(self._index.setdefault(value, len(self._index)))
+
+    def _finish(self):
+        # While the column is being built, only the index is kept up to
+        # date.
+        self.values = [None] * len(self._index)
+        for value, code in self._index.iteritems():
+            self.values[code] = value
+        self._index = None
+
+    def __len__(self):
+        return len(self.codes)
+
+    def __getitem__(self, i):
+        return self.values[self.codes[i]]
+
+    def __iter__(self):
+        values = self.values
+        for code in self.codes:
+            yield values[code]
+
+
+def _new_column(parse):
+    """Return an empty column for values parsed by the parser parse."""
+    kind = _column_kind(parse)
+    if kind == 'int':
+        return array.array('l')
+    elif kind == 'amount':
+        return array.array('d')
+    else:
+        return StringColumn()
+
+
+def _column_bindings(columns):
+    """The column bindings for a sequence of columns.
+
+    Compiled column decoders take a flat tuple of bindings, the
+    append method of each array column, and the append method of
+    the codes array, the setdefault method of the index and the index
+    of each StringColumn.
+
+    """
+    bindings = list()
+    for column in columns:
+        if isinstance(column, StringColumn):
+            bindings.extend([column.codes.append, column._index.setdefault,
+                             column._index])
+        else:
+            bindings.append(column.append)
+    return tuple(bindings)
+
+
+# The value of each kind of column in rows whose filing doesn't have
+# the column's (non-list) sub-element.
+
+_column_defaults = {'l': 0, 'd': _nan}
+
+
+class _ColumnBuilder(object):
+    """Build batches of filings as columns.
+
+    Unlike the other builders, a _ColumnBuilder has state, so each
+    parse needs its own instance. The parsed filings themselves are
+    just placeholders; the parsed data accumulate in the builder's
+    columns. When a filing starts and the current batch already holds
+    batch_size filings, the batch is finished and appended to the
+    builder's batches list. The consumer is expected to empty the list
+    periodically.
+
+    batch_size - The maximum number of filings per batch.
+
+    arrays - If True, finished batches hold NumPy arrays (see
+    parse_filings_columnar).
+
+    """
+    def __init__(self, batch_size, arrays=False):
+        self.batches = list()
+        self._batch_size = batch_size
+        self._arrays = arrays
+        self._lists = [(id, item_id) for id, item_id, attrs in
+                       _sax_subelts.itervalues() if item_id is not None]
+        self._singletons = [id for id, item_id, attrs in
+                            _sax_subelts.itervalues() if item_id is None]
+        self._new_batch()
+
+    def _new_batch(self):
+        self.rows = 0
+        self._columns = dict()
+        self._element_columns = dict()
+        self._bindings = dict()
+        self._add_columns('filing', 'filing', _filing_attrs)
+        for id, item_id, attrs in _sax_subelts.itervalues():
+            self._add_columns(item_id or id, id, attrs)
+        self._offsets = dict([(id, array.array('l'))
+                              for id, item_id in self._lists])
+        self._present = dict([(id, array.array('b'))
+                              for id in self._singletons])
+
+    def _add_columns(self, id, prefix, attrs):
+        columns = [(prefix + '.' + key, _new_column(parse))
+                   for name, key, parse in attrs]
+        self._columns.update(columns)
+        self._element_columns[id] = tuple([x[1] for x in columns])
+        self._bindings[id] = _column_bindings(self._element_columns[id])
+
+    def _list_len(self, item_id):
+        return len(self._element_columns[item_id][0])
+
+    def _end_filing(self):
+        # Pad the columns of missing singleton sub-elements.
+        for id in self._singletons:
+            present = self._present[id]
+            if len(present) < self.rows:
+                present.append(0)
+                for column in self._element_columns[id]:
+                    if isinstance(column, StringColumn):
+                        column.append(None)
+                    else:
+                        column.append(_column_defaults[column.typecode])
+
+    def filing(self, elt):
+        if self.rows:
+            self._end_filing()
+            if self.rows == self._batch_size:
+                self.batches.append(self.batch())
+        for id, item_id in self._lists:
+            self._offsets[id].append(self._list_len(item_id))
+        self.rows += 1
+        _column_decoders['filing'](elt, self._bindings['filing'])
+        return self.rows
+
+    def element(self, id, elt, attrs):
+        _column_decoders[id](elt, self._bindings[id])
+        self._present[id].append(1)
+
+    def item(self, id, elt, attrs):
+        _column_decoders[id](elt, self._bindings[id])
+
+    def add(self, filing, id, value):
+        pass
+
+    def batch(self):
+        """Finish the current batch and start a new one.
+
+        Returns the finished batch, a dictionary mapping column names
+        to columns (see parse_filings_columnar).
+
+        """
+        if self.rows:
+            self._end_filing()
+        result = dict(self._columns)
+        for id, item_id in self._lists:
+            offsets = self._offsets[id]
+            offsets.append(self._list_len(item_id))
+            result[id] = offsets
+        result.update(self._present)
+        for column in self._columns.itervalues():
+            if isinstance(column, StringColumn):
+                column._finish()
+        if self._arrays:
+            for key, column in result.items():
+                if isinstance(column, StringColumn):
+                    column.codes = numpy.frombuffer(column.codes, 'l')
+                else:
+                    result[key] = numpy.frombuffer(column, column.typecode)
+        self._new_batch()
+        return result
+
+
+def parse_filings_columnar(doc, batch_size=10000, backend=None,
+                           arrays=False, where=None, include=None,
+                           exclude=None, transcode=False):
+    """Parse all filing records in a lobbyist database into columns.
+
+    doc - The database to parse (see parse_filings).
+
+    batch_size - The maximum number of filings in each batch.
+
+    backend - The parser backend to use (see parse_filings).
+
+    arrays - If True, numeric columns, offsets and the codes of
+    StringColumns are NumPy arrays, sharing memory with the arrays
+    they were built in. Requires NumPy. If False (the default),
+    they're array.array objects.
+
+    where - Selects the filings to parse (see parse_filings).
+
+    include, exclude - Select the sub-elements to parse (see
+    parse_filings). The columns of sub-elements that aren't selected
+    are empty (or, for Registrant and Client elements, hold default
+    values).
+
+    transcode - If True, UTF-16 documents are transcoded to UTF-8
+    before they're parsed (see parse_filings).
+
+    Yields a sequence of batches. Each batch is a dictionary mapping
+    column names to columns:
+
+    'filing.<key>', 'registrant.<key>', 'client.<key>' - One row per
+    filing, for each key of the corresponding parsed element (see
+    parse_filings), e.g., 'filing.year' or 'client.senate_id'. If a
+    filing has no Registrant or Client element, its row holds 0, NaN
+    or None.
+
+    'registrant', 'client' - One row per filing, 1 if the filing has a
+    Registrant (Client) element and 0 otherwise.
+
+    'lobbyists.<key>', 'govt_entities.<key>', 'issues.<key>',
+    'foreign_entities.<key>', 'affiliated_orgs.<key>' - One row per
+    item in the corresponding list of parsed sub-elements, for all
+    filings in the batch, in order.
+
+    'lobbyists', 'govt_entities', 'issues', 'foreign_entities',
+    'affiliated_orgs' - Offset arrays with one row per filing, plus
+    one. The items of filing i are rows offsets[i] through
+    offsets[i + 1] - 1 of the list's columns.
+
+    """
+    if arrays and numpy is None:
+        raise ImportError('parse_filings_columnar(arrays=True) '
+                          'requires NumPy')
+    if backend is None:
+        backend = parser_backends()[0]
+    builder = _ColumnBuilder(batch_size, arrays)
+    batches = builder.batches
+    for filing in _parse_doc(doc, backend, builder, _filing_filter(where),
+                             _projected_subelts(include, exclude),
+                             transcode):
+        for batch in batches:
+            yield batch
+        del batches[:]
+    for batch in batches:
+        yield batch
+    if builder.rows:
+        yield builder.batch()
+
+
+# Parallel parsing.
+#
+# A document is split into byte ranges, each of which begins at the
+# start of a Filing element. Each range is parsed in a separate
+# process as a complete document: the original document's header (XML
+# declaration, root start tag, etc.) is prepended to the range, and
+# its tail (the root end tag) is appended. The header, in particular,
+# carries the document's encoding.
+
+def _doc_codec(head):
+    """Guess the codec of a document from its first few bytes.
+
+    Returns the name of a codec that can be used to encode the
+    element names that _split_doc searches for. Documents without a
+    UTF-16 byte order mark are assumed to be in an ASCII-compatible
+    encoding.
+
+    """
+    if head.startswith('\xff\xfe'):
+        return 'utf-16-le'
+    elif head.startswith('\xfe\xff'):
+        return 'utf-16-be'
+    else:
+        return 'utf-8'
+
+
+def _filing_start_re(codec):
+    """A regular expression matching the start of a Filing element."""
+    return re.compile(re.escape(u'<Filing'.encode(codec)) +
+                      '(?:%s)' % '|'.join([re.escape(c.encode(codec))
+                                           for c in u' \t\r\n>/']))
+
+
+def _find_filing(m, pattern, align, pos, limit):
+    """Find the start of the first Filing element at or after pos.
+
+    m - The memory-mapped document.
+
+    pattern - The compiled _filing_start_re for the document's codec.
+
+    align - The size of a code unit in the document's codec. Matches
+    that don't fall on a code unit boundary are ignored.
+
+    pos - The offset at which to start searching.
+
+    limit - The offset at which to stop searching.
+
+    Returns the offset of the Filing element, or None if there isn't
+    one before limit.
+
+    """
+    for match in pattern.finditer(m, pos, limit):
+        if match.start() % align == 0:
+            return match.start()
+    return None
+
+
+def _split_doc(filename, nranges, start=None):
+    """Split a document into byte ranges on Filing element boundaries.
+
+    filename - The name of the document file.
+
+    nranges - The desired number of ranges. Fewer ranges are returned
+    if the document doesn't contain enough Filing elements.
+
+    start - If not None, the offset of the Filing element (or of the
+    tail) at which the first range starts. By default, it starts at
+    the first Filing element.
+
+    Returns a tuple of 3 items: the length of the document's header,
+    the offset of the document's tail, and a list of (start, end)
+    byte ranges between the two, in document order. The list is empty
+    if the document contains no Filing elements.
+
+    Note that the split is purely lexical, so a comment or CDATA
+    section containing something that looks like a Filing start tag
+    will confuse it.
+
+    """
+    f = _MappedFile(filename)
+    try:
+        m = f.map
+        codec = _doc_codec(m[:4])
+        align = len(u' '.encode(codec))
+        pattern = _filing_start_re(codec)
+        first = _find_filing(m, pattern, align, 0, len(m))
+        if first is None:
+            return 0, 0, list()
+        # The tail begins with the root element's end tag.
+        tail = m.rfind(u'</'.encode(codec), first)
+        if start is None:
+            start = first
+        bounds = [start]
+        for i in xrange(1, nranges):
+            target = start + (tail - start) * i // nranges
+            pos = _find_filing(m, pattern, align,
+                               max(target, bounds[-1] + 1), tail)
+            if pos is None:
+                break
+            if pos > bounds[-1]:
+                bounds.append(pos)
+        bounds.append(tail)
+        return first, tail, zip(bounds[:-1], bounds[1:])
+    finally:
+        f.close()
+
+
+def _parse_marshalled(doc, backend, options, quarantine):
+    """Parse a document in a worker process.
+
+    doc, backend - The document and the parser backend.
+
+    options - A dictionary of keyword arguments for parse_filings.
+
+    quarantine - If True, filings that fail to parse are quarantined.
+
+    Returns a pair whose first item is the list of parsed filings,
+    serialized with marshal, which is considerably faster than
+    letting the pool pickle them, and whose second item is a list of
+    (filing ID, exception) pairs, one per quarantined filing.
+
+    """
+    quarantined = list()
+    if quarantine:
+        options = dict(options, quarantine=quarantined.append)
+    filings = marshal.dumps(list(parse_filings(doc, backend, **options)))
+    return filings, [(x[0], x[2]) for x in quarantined]
+
+
+def _parse_range(args):
+    """Parse the filings in one byte range of a document.
+
+    This is the process pool's worker function. args is a tuple of
+    the document's filename, the length of its header, the offset of
+    its tail, the byte range to parse, the parser backend, a
+    dictionary of keyword arguments for parse_filings and the
+    quarantine flag.
+
+    Returns the result of _parse_marshalled.
+
+    """
+    (filename, headlen, tailpos, (start, end), backend, options,
+     quarantine) = args
+    f = _MappedFile(filename)
+    try:
+        m = f.map
+        doc = cStringIO.StringIO(''.join([m[:headlen], m[start:end],
+                                          m[tailpos:]]))
+    finally:
+        f.close()
+    return _parse_marshalled(doc, backend, options, quarantine)
+
+
+def _parse_member(args):
+    """Parse the filings in one document of a zip archive.
+
+    This is the process pool's worker function for zip archives. args
+    is a tuple of the archive's filename, the name of the document in
+    the archive, the parser backend, a dictionary of keyword
+    arguments for parse_filings and the quarantine flag.
+
+    Returns the result of _parse_marshalled.
+
+    """
+    filename, member, backend, options, quarantine = args
+    for doc in _archive_docs(filename, [member]):
+        return _parse_marshalled(doc, backend, options, quarantine)
+
+
+def parse_filings_parallel(doc, workers=None, backend=None, flat=False,
+                           where=None, include=None, exclude=None,
+                           transcode=False, quarantine=None,
+                           resume_from=None, chunk_size=8 * 1024 * 1024):
+    """Parse all filing records in a lobbyist database in parallel.
+
+    The document is split into byte ranges on Filing element
+    boundaries, and the ranges are parsed by a pool of worker
+    processes. The documents in a zip archive are parsed by the pool
+    one document per task instead.
+
+    doc - The database to parse. Only uncompressed local files and zip
+    archives can be split, so this should be a filename. For anything
+    else (a URL, file-like object or compressed file), this function
+    falls back to parse_filings.
+
+    workers - The number of worker processes, or None (the default)
+    to use one per CPU.
+
+    backend - The parser backend each worker uses (see
+    parse_filings).
+
+    flat - If True, lists of parsed sub-elements are flat (see
+    parse_filings).
+
+    where - Selects the filings to parse (see parse_filings).
+
+    include, exclude - Select the sub-elements to parse (see
+    parse_filings).
+
+    transcode - If True, each worker transcodes its part of a UTF-16
+    document to UTF-8 before parsing it (see parse_filings).
+
+    quarantine - A quarantine sink for filings that fail to parse (see
+    parse_filings), or None. The sink is called in this process, after
+    the filings of the byte range (or zip archive document) in which
+    the failure occurred have been yielded. The exceptions raised in
+    the workers must be picklable.
+
+    resume_from - A byte offset or filing ID from which to resume an
+    interrupted parse (see parse_filings). Only the part of an
+    uncompressed local file after the resume point is split.
+
+    chunk_size - The approximate size in bytes of each byte range. The
+    document is split into at least as many ranges as there are
+    workers.
+
+    Yields a sequence of dictionaries, one per filing record, in
+    document order. Note that up to one range's (or, for zip archives,
+    one document's) worth of parsed filings per worker is held in
+    memory at any one time.
+
+    """
+    import multiprocessing
+    options = dict(flat=flat, where=where, include=include, exclude=exclude,
+                   transcode=transcode)
+    archive = _is_archive(doc)
+    if not (archive or isinstance(doc, basestring) and
+            os.path.isfile(doc) and _decompressor(doc) is None):
+        return parse_filings(doc, backend, quarantine=quarantine,
+                             resume_from=resume_from, **options)
+    if workers is None:
+        workers = multiprocessing.cpu_count()
+    tolerant = quarantine is not None
+    if archive:
+        tasks = [(doc, member, backend, options, tolerant)
+                 for member in _archive_members(doc)]
+        filings = _pooled_filings(doc, workers, _parse_member, tasks,
+                                  quarantine)
+        if resume_from is None:
+            return filings
+        return _filings_after(filings, resume_from)
+    start = None
+    if resume_from is not None:
+        start = _resume_point(doc, resume_from)[1]
+    nranges = max(workers, os.path.getsize(doc) // chunk_size)
+    headlen, tailpos, ranges = _split_doc(doc, nranges, start)
+    tasks = [(doc, headlen, tailpos, r, backend, options, tolerant)
+             for r in ranges]
+    return _pooled_filings(doc, workers, _parse_range, tasks, quarantine)
+
+
+def _pooled_filings(doc, workers, worker, tasks, quarantine):
+    """Run parsing tasks on a pool of worker processes.
+
+    doc - The document being parsed.
+
+    workers - The number of worker processes.
+
+    worker - The worker function, _parse_range or _parse_member.
+
+    tasks - The list of arguments for each call to worker.
+
+    quarantine - The quarantine sink, or None.
+
+    Yields the parsed filings, in task order.
+
+    """
+    import multiprocessing
+    report = _quarantine_reporter(quarantine, doc)
+    pool = multiprocessing.Pool(workers)
+    try:
+        for filings, quarantined in pool.imap(worker, tasks):
+            for filing in marshal.loads(filings):
+                yield filing
+            for filing_id, exception in quarantined:
+                report(filing_id, exception)
+        pool.close()
+    finally:
+        pool.terminate()
+        pool.join()
+
+
+# A persistent cache of parsed filings.
+#
+# Each cache entry is a file of marshalled lists of filings, one list
+# per batch, named by the SHA-256 of the document's contents and a
+# digest of the parsing options that affect the result. Entries are
+# written to a temporary file and renamed into place once the whole
+# document has been parsed, so a partly-parsed document is never
+# cached. When the cache grows beyond its maximum size, the least
+# recently used entries are removed.
+
+def _doc_digest(filename):
+    """Return the SHA-256 hex digest of a file's contents."""
+    h = hashlib.sha256()
+    f = open(filename, 'rb')
+    try:
+        while True:
+            data = f.read(1024 * 1024)
+            if not data:
+                break
+            h.update(data)
+    finally:
+        f.close()
+    return h.hexdigest()
+
+
+class FilingCache(object):
+    """An on-disk cache of parsed filings, keyed by document contents.
+
+    A FilingCache stores the parsed filings of each document it's
+    asked to parse in directory, and replays them from disk the next
+    time the same document is parsed with the same options. Documents
+    are identified by the SHA-256 of their contents, so a renamed or
+    copied document still hits the cache and a changed document never
+    does.
+
+    directory - The cache directory. It's created if it doesn't
+    exist.
+
+    max_size - The maximum total size of the cache entries, in
+    bytes. When a new entry makes the cache larger, the least recently
+    used entries are removed until it fits.
+
+    hits and misses count the documents that were replayed from the
+    cache and parsed, respectively.
+
+    """
+    _suffix = '.filings'
+
+    def __init__(self, directory, max_size=1024 * 1024 * 1024,
+                 batch_size=1000):
+        self.directory = directory
+        self.max_size = max_size
+        self.batch_size = batch_size
+        self.hits = 0
+        self.misses = 0
+        if not os.path.isdir(directory):
+            os.makedirs(directory)
+
+    def _path(self, doc, options):
+        # Only local files can be hashed without consuming them, record
+        # objects can't be marshalled, and a resumed parse doesn't
+        # yield the whole document.
+        if not (isinstance(doc, basestring) and os.path.isfile(doc)) or \
+                options.get('records') or options.get('lazy') or \
+                options.get('resume_from') is not None:
+            return None
+        key = [VERSION] + [repr(_cache_option(options.get(x)))
+                           for x in ['flat', 'where', 'include', 'exclude']]
+        options_digest = hashlib.sha256('\0'.join(key)).hexdigest()[:16]
+        return os.path.join(self.directory, '%s-%s%s' % (_doc_digest(doc),
+                                                        options_digest,
+                                                        self._suffix))
+
+    def filings(self, doc, parse=None, **options):
+        """Parse a document, or replay its filings from the cache.
+
+        doc - The document to parse. Only local files are cached;
+        anything else is always parsed.
+
+        parse - The parsing function, parse_filings (the default) or
+        parse_filings_parallel.
+
+        options - Keyword arguments for parse. The flat, where,
+        include and exclude options are part of the cache key. Parsed
+        records (records=True), lazy filings (lazy=True) and resumed
+        parses (see the resume_from option of parse_filings) aren't
+        cached.
+
+        If a quarantine sink is given and any filing is quarantined,
+        the document's filings aren't cached, because the quarantined
+        exceptions can't be replayed.
+
+        Yields a sequence of parsed filings, one per filing record.
+
+        """
+        if parse is None:
+            parse = parse_filings
+        path = self._path(doc, options)
+        if path is None:
+            for filing in parse(doc, **options):
+                yield filing
+            return
+        try:
+            f = open(path, 'rb')
+        except IOError:
+            pass
+        else:
+            self.hits += 1
+            try:
+                os.utime(path, None)
+                while True:
+                    try:
+                        batch = marshal.load(f)
+                    except EOFError:
+                        break
+                    for filing in batch:
+                        yield filing
+            finally:
+                f.close()
+            return
+        self.misses += 1
+        quarantined = list()
+        sink = options.get('quarantine')
+        if sink is not None:
+            def quarantine(item):
+                quarantined.append(item)
+                sink(item)
+            options['quarantine'] = quarantine
+        fd, tmppath = tempfile.mkstemp(suffix='.tmp', dir=self.directory)
+        f = os.fdopen(fd, 'wb')
+        try:
+            batch = list()
+            for filing in parse(doc, **options):
+                batch.append(filing)
+                if len(batch) == self.batch_size:
+                    marshal.dump(batch, f)
+                    del batch[:]
+                yield filing
+            marshal.dump(batch, f)
+            f.close()
+            if not quarantined:
+                os.rename(tmppath, path)
+                self._evict()
+        finally:
+            f.close()
+            if os.path.exists(tmppath):
+                os.remove(tmppath)
+
+    def _entries(self):
+        """Return (mtime, size, path) for each entry, oldest first."""
+        entries = list()
+        for name in os.listdir(self.directory):
+            if name.endswith(self._suffix):
+                path = os.path.join(self.directory, name)
+                try:
+                    st = os.stat(path)
+                except OSError:
+                    continue
+                entries.append((st.st_mtime, st.st_size, path))
+        entries.sort()
+        return entries
+
+    def size(self):
+        """Return the total size of the cache entries, in bytes."""
+        return sum([x[1] for x in self._entries()])
+
+    def _evict(self):
+        entries = self._entries()
+        total = sum([x[1] for x in entries])
+        for mtime, size, path in entries:
+            if total <= self.max_size:
+                break
+            try:
+                os.remove(path)
+            except OSError:
+                pass
+            total -= size
+
+    def clear(self):
+        """Remove all entries from the cache."""
+        for mtime, size, path in self._entries():
+            os.remove(path)
+
+
+def _cache_option(value):
+    """Return a parsing option in a canonical form for a cache key."""
+    if isinstance(value, dict):
+        return sorted([(k, _cache_option(v)) for k, v in value.items()])
+    if isinstance(value, (list, tuple, set, frozenset)):
+        return sorted([_cache_option(x) for x in value])
+    return value
+
+
+# A byte-offset index of the Filing elements in a document.
+#
+# The index of a document is kept in a sidecar file next to it, named
+# after the document with an .index extension. It records the
+# document's size, modification time and SHA-256 along with the
+# offsets of its Filing elements, and is rebuilt when the document
+# changes. An index whose document has a new modification time but the
+# same SHA-256 is just updated with the new time.
+
+_INDEX_VERSION = 1
+
+# Indexes that have been loaded in this process, by document filename.
+
+_loaded_indexes = dict()
+
+
+def _index_path(doc):
+    return doc + '.index'
+
+
+def _build_index(doc):
+    """Scan a document and build its index.
+
+    Returns a dictionary with the document's header length ('head'),
+    the offset of its tail ('tail') and its filings ('filings'), a
+    dictionary mapping each filing ID to a tuple of the Filing
+    element's start and end offsets, its year and its type.
+
+    """
+    import xml.parsers.expat
+    f = _MappedFile(doc)
+    try:
+        m = f.map
+        codec = _doc_codec(m[:4])
+        parser = xml.parsers.expat.ParserCreate()
+        found = list()
+        ends = list()
+        def start(name, attrs):
+            if name == 'Filing':
+                year = attrs.get('Year')
+                found.append((attrs.get('ID'), parser.CurrentByteIndex,
+                              year and int(year), attrs.get('Type')))
+        def end(name):
+            if name == 'Filing':
+                ends.append(parser.CurrentByteIndex)
+        parser.StartElementHandler = start
+        parser.EndElementHandler = end
+        chunk_size = 1024 * 1024
+        for pos in xrange(0, len(m), chunk_size):
+            parser.Parse(m[pos:pos + chunk_size], False)
+        parser.Parse('', True)
+        # An end tag is reported at its start, but an empty Filing
+        # element's end is reported after its tag.
+        end_tag = u'</Filing'.encode(codec)
+        gt = u'>'.encode(codec)
+        filings = dict()
+        for (filing_id, start, year, type), end in zip(found, ends):
+            if m[end:end + len(end_tag)] == end_tag:
+                end = m.find(gt, end) + len(gt)
+            filings.setdefault(filing_id, (start, end, year, type))
+        if found:
+            head = found[0][1]
+            tail = m.rfind(u'</'.encode(codec), max(ends))
+        else:
+            head = tail = 0
+        return dict(head=head, tail=tail, filings=filings)
+    finally:
+        f.close()
+
+
+def filing_index(doc):
+    """Return the byte-offset index of the Filing elements in a
+    document.
+
+    The index is read from the document's sidecar index file (the
+    document's filename with .index appended). If the sidecar doesn't
+    exist, or the document's modification time has changed and so has
+    its SHA-256, the document is scanned and a new sidecar is
+    written. If the sidecar can't be written, the index is still
+    returned. Indexes are also kept in memory, so looking up several
+    filings in a document only reads its sidecar once.
+
+    doc - The filename of an uncompressed local document.
+
+    Returns a dictionary mapping each filing ID to a tuple of 4 items:
+    the byte offsets of the start and end of the Filing element, the
+    filing's year (an integer, or None) and its type (a string, or
+    None). If a document contains more than one filing with the same
+    ID, the first one is indexed.
+
+    """
+    if not (isinstance(doc, basestring) and os.path.isfile(doc)) or \
+            _decompressor(doc) is not None or _is_archive(doc):
+        raise ValueError('only uncompressed local files can be indexed')
+    return _load_index(doc)['filings']
+
+
+def _load_index(doc):
+    st = os.stat(doc)
+    index = _loaded_indexes.get(doc)
+    if index is None:
+        try:
+            f = open(_index_path(doc), 'rb')
+            try:
+                index = marshal.load(f)
+            finally:
+                f.close()
+        except (EnvironmentError, EOFError, ValueError, TypeError):
+            index = None
+        if index is not None and index.get('version') != _INDEX_VERSION:
+            index = None
+    if index is not None and index['size'] == st.st_size and \
+            index['mtime'] == st.st_mtime:
+        _loaded_indexes[doc] = index
+        return index
+    digest = _doc_digest(doc)
+    if index is None or index['sha256'] != digest:
+        index = _build_index(doc)
+        index.update(version=_INDEX_VERSION, sha256=digest)
+    index.update(size=st.st_size, mtime=st.st_mtime)
+    _write_index(doc, index)
+    _loaded_indexes[doc] = index
+    return index
+
+
+def _write_index(doc, index):
+    """Atomically replace a document's sidecar index, if possible."""
+    path = _index_path(doc)
+    try:
+        fd, tmppath = tempfile.mkstemp(suffix='.tmp',
+                                       dir=os.path.dirname(path) or '.')
+    except EnvironmentError:
+        return
+    try:
+        f = os.fdopen(fd, 'wb')
+        try:
+            marshal.dump(index, f)
+        finally:
+            f.close()
+        os.rename(tmppath, path)
+    except EnvironmentError:
+        os.remove(tmppath)
+
+
+def get_filing(doc, filing_id, backend=None, records=False, flat=False):
+    """Parse a single filing by its ID, using the document's index.
+
+    Only the filing's Filing element is read and parsed (along with
+    the document's header), so this is much faster than scanning the
+    document with parse_filings. The index is built first if
+    necessary (see filing_index).
+
+    doc - The filename of an uncompressed local document.
+
+    filing_id - The filing's ID.
+
+    backend, records, flat - See parse_filings.
+
+    Returns the parsed filing. Raises KeyError if the document has no
+    filing with the given ID.
+
+    """
+    filings = filing_index(doc)
+    start, end = filings[filing_id][:2]
+    head = _loaded_indexes[doc]['head']
+    tail = _loaded_indexes[doc]['tail']
+    f = _MappedFile(doc)
+    try:
+        m = f.map
+        stream = cStringIO.StringIO(''.join([m[:head], m[start:end],
+                                             m[tail:]]))
+    finally:
+        f.close()
+    for filing in parse_filings(stream, backend, records, flat):
+        return filing
+    raise KeyError(filing_id)
+
+
 # Code to import parsed records into the database.
 
-_where_stmt = {'client':
-                   'client WHERE '
-                   'country=:country AND '
-                   'name=:name AND '
-                   'ppb_country=:ppb_country AND '
-                   'state=:state AND '
-                   'ppb_state=:ppb_state AND '
-                   'state_or_local_gov=:state_or_local_gov',
-               'registrant':
-                   'registrant WHERE '
-                   'country=:country AND '
-                   'senate_id=:senate_id AND '
-                   'name=:name AND '
-                   'ppb_country=:ppb_country',
-               'lobbyist':
-                   'lobbyist WHERE '
-                   'name=:name AND '
-                   'indicator=:indicator AND '
-                   'official_position=:official_position',
-               'affiliated_org':
-                   'affiliated_org WHERE '
-                   'name=:name AND '
-                   'country=:country AND '
-                   'ppb_country=:ppb_country',
-               'foreign_entity':
-                   'foreign_entity WHERE '
-                   'name=:name AND '
-                   'country=:country AND '
-                   'ppb_country=:ppb_country'}
+# The natural key of each table that's looked up during import, i.e.,
+# the columns that identify a unique row (see the unique indexes in
+# lobbyists.sql). The columns are listed in the order in which they
+# appear in the table, so the natural key of a parsed entity is also
+# the list of values to insert for a new row.
+
+_dimension_keys = {'client': ['country',
+                              'name',
+                              'ppb_country',
+                              'state',
+                              'ppb_state',
+                              'state_or_local_gov'],
+                   'registrant': ['country',
+                                  'senate_id',
+                                  'name',
+                                  'ppb_country'],
+                   'lobbyist': ['name',
+                                'indicator',
+                                'official_position'],
+                   'affiliated_org': ['name',
+                                      'country',
+                                      'ppb_country'],
+                   'foreign_entity': ['name',
+                                      'country',
+                                      'ppb_country']}
+
+
+# The lookup tables into which import inserts values, and their single
+# columns. The same value is usually inserted many times (e.g., each
+# client's country), and the duplicates are ignored by the tables'
+# ON CONFLICT IGNORE clauses.
+
+_lookup_columns = {'country': 'name',
+                   'state': 'name',
+                   'person': 'name',
+                   'org': 'name',
+                   'url': 'url',
+                   'govt_entity': 'name',
+                   'issue_code': 'code'}
+
+
+_lookup_insert_stmt = dict([(table, 'INSERT INTO %s VALUES(?)' % table)
+                            for table in _lookup_columns])
+
+
+_where_stmt = dict([(table, '%s WHERE %s' % (table,
+                                             ' AND '.join(['%s=?' % x
+                                                           for x in keys])))
+                    for table, keys in _dimension_keys.items()])
+
+
+def _dimension_key(table, entity):
+    """Return the natural key of a parsed entity.
+
+    table - The name of the entity's table (a string).
+
+    entity - The parsed entity.
+
+    Returns a list of the entity's values for the table's natural key
+    columns (see _dimension_keys).
+
+    """
+    return [entity[x] for x in _dimension_keys[table]]
 
 
 def _filing_db_key(filing):
@@ -459,7 +3292,7 @@ def _filing_db_key(filing):
     return filing['id']
 
 
-def _rowid(table, tomatch, cur):
+def _rowid(table, tomatch, cur, keys=None):
     """Find a match in a database table and return its rowid.
 
     This function only works for tables with a primary key
@@ -469,16 +3302,22 @@ def _rowid(table, tomatch, cur):
 
     tomatch - A mapping whose key names are identical to the table's
     column names, and whose values are the values to match in the
-    table.
+    table. Only the table's natural key columns are matched (see
+    _dimension_keys).
 
     cur - The DB API 2.0-compliant database cursor.
 
+    keys - A DimensionCache, or None. If given, the match is looked up
+    in the cache rather than the table.
+
     Returns the rowid of the matching row, or None if no match is
     found.
 
     """
+    if keys is not None:
+        return keys.rowid(table, tomatch, cur)
     stmt = 'SELECT id FROM %s' % _where_stmt[table]
-    cur.execute(stmt, tomatch)
+    cur.execute(stmt, _dimension_key(table, tomatch))
     row = cur.fetchone()
     if row:
         return row[0]
@@ -486,7 +3325,226 @@ def _rowid(table, tomatch, cur):
         return None
 
 
-def _client_rowid(client, cur):
+class DimensionCache(object):
+    """An in-memory map of the natural keys of the rows in the
+    client, registrant, lobbyist, affiliated_org and foreign_entity
+    tables to their row IDs, and of the values in the country, state,
+    person, org, url, govt_entity and issue_code lookup tables.
+
+    import_filings looks up each entity it imports in one of these
+    tables, to find the row to which the entity's filing refers. A
+    DimensionCache answers those lookups with a dictionary instead of
+    a SELECT statement. Each table is read into the cache in full the
+    first time it's looked up, and import_filings adds the rows it
+    inserts, so the cache always agrees with the tables; therefore a
+    cache must not be shared across databases, nor used after a
+    rollback of a transaction that inserted rows into its tables.
+
+    Likewise, import_filings inserts a value into a lookup table only
+    if the cache doesn't already have it, rather than inserting every
+    value and letting the table ignore the duplicates.
+
+    Natural keys that contain a NULL never match a row in SQL (NULL
+    is not equal to anything, not even NULL), so entities with such
+    keys are never found in the cache, either; and NULL lookup values
+    are always inserted.
+
+    max_size - If None (the default), the cache is unbounded. A cache
+    whose tables are too big to hold in memory can be limited to
+    max_size rows per table, either an integer for every table or a
+    dictionary mapping table names to integers (tables missing from
+    the dictionary are unbounded). A bounded table isn't read into
+    the cache in advance; instead, a lookup that misses falls back to
+    a SELECT statement, and the row it finds is added to the cache. (A
+    lookup table's value that misses is just inserted again.)
+    When a bounded table is full, the cache evicts rows that haven't
+    been looked up recently, approximating a least-recently-used
+    policy: the table's rows are divided into a current and a
+    previous generation; a row that's looked up is moved to the
+    current generation; rows are evicted from the previous
+    generation; and once it's empty, the current generation becomes
+    the previous one. (This keeps every lookup down to a dictionary
+    operation or two, which a strict LRU list in Python doesn't.)
+
+    The hits, misses and evictions attributes are dictionaries mapping
+    each table name to the number of lookups in that table that were
+    answered by the cache, the number that weren't (because the row
+    isn't in the table, or, for bounded tables, isn't in the cache),
+    and the number of rows dropped from the cache to respect its size
+    limit. For a lookup table, hits are the INSERT statements that
+    were skipped, and misses the ones that were executed.
+
+    """
+    def __init__(self, max_size=None):
+        self.max_size = max_size
+        self._rows = dict()
+        self._previous = dict()
+        self._values = dict()
+        tables = _dimension_keys.keys() + _lookup_columns.keys()
+        self.hits = dict.fromkeys(tables, 0)
+        self.misses = dict.fromkeys(tables, 0)
+        self.evictions = dict.fromkeys(tables, 0)
+
+    def _limit(self, table):
+        if isinstance(self.max_size, dict):
+            return self.max_size.get(table)
+        return self.max_size
+
+    def _table(self, table, cur):
+        if self._limit(table) is None:
+            return self._warm(table, cur)
+        self._previous[table] = dict()
+        rows = self._rows[table] = dict()
+        return rows
+
+    def _warm(self, table, cur):
+        rows = dict()
+        cur.execute('SELECT id, %s FROM %s' %
+                    (', '.join(_dimension_keys[table]), table))
+        for row in cur:
+            key = tuple(row[1:])
+            if None not in key:
+                rows[key] = row[0]
+        self._rows[table] = rows
+        return rows
+
+    def _store(self, table, key, db_key):
+        # Evict before inserting, so the new row can't be the one
+        # that's evicted.
+        rows = self._rows[table]
+        previous = self._previous[table]
+        if len(rows) + len(previous) >= self._limit(table):
+            self.evictions[table] += 1
+            if not previous:
+                if not rows:
+                    return              # max_size is 0
+                self._rows[table], self._previous[table] = previous, rows
+                rows, previous = previous, rows
+            previous.popitem()
+        rows[key] = db_key
+
+    def rowid(self, table, entity, cur):
+        """Return the row ID of the row in table whose natural key
+        matches the parsed entity's, or None if there is no such row.
+
+        cur - The DB API 2.0-compliant database cursor, which is used
+        to read the table into the cache the first time it's looked
+        up, and to look up rows that aren't in a bounded cache.
+
+        """
+        try:
+            rows = self._rows[table]
+        except KeyError:
+            rows = self._table(table, cur)
+        key = tuple(_dimension_key(table, entity))
+        db_key = rows.get(key)
+        if db_key is not None:
+            self.hits[table] += 1
+            return db_key
+        if table not in self._previous:
+            self.misses[table] += 1
+            return None
+        db_key = self._previous[table].pop(key, None)
+        if db_key is not None:
+            rows[key] = db_key
+            self.hits[table] += 1
+            return db_key
+        self.misses[table] += 1
+        if None in key:
+            return None
+        db_key = _rowid(table, entity, cur)
+        if db_key is not None:
+            self._store(table, key, db_key)
+        return db_key
+
+    def add(self, table, entity, db_key):
+        """Record that the parsed entity was inserted into table as
+        row db_key."""
+        key = tuple(_dimension_key(table, entity))
+        if table not in self._rows or None in key:
+            return
+        if table in self._previous:
+            self._store(table, key, db_key)
+        else:
+            self._rows[table][key] = db_key
+
+    def new_value(self, table, value, cur):
+        """Return False if value is known to be in the lookup table,
+        and True (after adding value to the cache) if it should be
+        inserted.
+
+        cur - The DB API 2.0-compliant database cursor, which is used
+        to read an unbounded table into the cache the first time it's
+        looked up.
+
+        """
+        try:
+            values = self._values[table]
+        except KeyError:
+            values = self._values[table] = set()
+            if self._limit(table) is None:
+                cur.execute('SELECT %s FROM %s' %
+                            (_lookup_columns[table], table))
+                values.update([row[0] for row in cur])
+                values.discard(None)
+        if value in values:
+            self.hits[table] += 1
+            return False
+        self.misses[table] += 1
+        if value is not None:
+            limit = self._limit(table)
+            if limit is not None and len(values) >= limit:
+                self.evictions[table] += 1
+                if not values:
+                    return True         # max_size is 0
+                values.pop()
+            values.add(value)
+        return True
+
+    def size(self, table=None):
+        """Return the number of rows or values in the cache for table,
+        or for all tables if table is None."""
+        if table is None:
+            return sum([self.size(x) for x in self.hits])
+        return len(self._rows.get(table, ())) + \
+            len(self._previous.get(table, ())) + \
+            len(self._values.get(table, ()))
+
+    def hit_rate(self, table=None):
+        """Return the fraction of lookups in table (or in all tables,
+        if table is None) that found a row, or 0.0 if there were no
+        lookups."""
+        if table is None:
+            hits = sum(self.hits.values())
+            total = hits + sum(self.misses.values())
+        else:
+            hits = self.hits[table]
+            total = hits + self.misses[table]
+        return total and float(hits) / total or 0.0
+
+
+def _import_value(table, value, cur, keys=None):
+    """Import a value into a lookup table.
+
+    Returns nothing.
+
+    Side-effects: may insert a row into the table.
+
+    table - The name of the lookup table (see _lookup_columns).
+
+    value - The value.
+
+    cur - The DB API 2.0-compliant database cursor.
+
+    keys - A DimensionCache, or None. If given, the value is only
+    inserted if it isn't in the cache.
+
+    """
+    if keys is None or keys.new_value(table, value, cur):
+        cur.execute(_lookup_insert_stmt[table], [value])
+
+
+def _client_rowid(client, cur, keys=None):
     """Find a client the database.
 
     Returns the row ID of the matching client, or None if there is no
@@ -496,11 +3554,13 @@ def _client_rowid(client, cur):
 
     cur - The DB API 2.0-compliant database cursor.
 
+    keys - A DimensionCache, or None.
+
     """
-    return _rowid('client', client, cur)
+    return _rowid('client', client, cur, keys)
 
 
-def _import_client(client, filing, cur):
+def _import_client(client, filing, cur, keys=None):
     """Import a client into the database.
 
     Returns nothing.
@@ -516,20 +3576,20 @@ def _import_client(client, filing, cur):
     cur - The DB API 2.0-compliant database cursor.
 
     """
-    db_key = _client_rowid(client, cur)
+    db_key = _client_rowid(client, cur, keys)
     if db_key is None:
         # Note - client status is pre-inserted into client_status table.
         for key in ['country', 'ppb_country']:
-            cur.execute('INSERT INTO country VALUES(?)', [client[key]])
+            _import_value('country', client[key], cur, keys)
         for key in ['state', 'ppb_state']:
-            cur.execute('INSERT INTO state VALUES(?)', [client[key]])
-        cur.execute('INSERT INTO person VALUES(?)', [client['contact_name']])
-        cur.execute('INSERT INTO org VALUES(?)', [client['name']])
-        cur.execute('INSERT INTO client VALUES(NULL, '
-                    ':country, :name, :ppb_country, :state, :ppb_state, '
-                    ':state_or_local_gov)',
-                    client)
+            _import_value('state', client[key], cur, keys)
+        _import_value('person', client['contact_name'], cur, keys)
+        _import_value('org', client['name'], cur, keys)
+        cur.execute('INSERT INTO client VALUES(NULL, ?, ?, ?, ?, ?, ?)',
+                    _dimension_key('client', client))
         db_key = cur.lastrowid
+        if keys is not None:
+            keys.add('client', client, db_key)
     cur.execute('INSERT INTO filing_client VALUES(?, ?, ?, ?, ?, ?)',
                 [_filing_db_key(filing),
                  db_key,
@@ -539,7 +3599,7 @@ def _import_client(client, filing, cur):
                  client['description']])
 
 
-def _registrant_rowid(reg, cur):
+def _registrant_rowid(reg, cur, keys=None):
     """Find a registrant in the database.
 
     Returns the row ID of the matching registrant, or None if there is
@@ -549,11 +3609,13 @@ def _registrant_rowid(reg, cur):
 
     cur - The DB API 2.0-compliant database cursor.
 
+    keys - A DimensionCache, or None.
+
     """
-    return _rowid('registrant', reg, cur)
+    return _rowid('registrant', reg, cur, keys)
 
 
-def _import_registrant(reg, filing, cur):
+def _import_registrant(reg, filing, cur, keys=None):
     """Import a registrant into the database.
 
     Returns nothing.
@@ -568,19 +3630,19 @@ def _import_registrant(reg, filing, cur):
 
     cur - The DB API 2.0-compliant database cursor.
 
+    keys - A DimensionCache, or None (see import_filings).
+
     """
-    db_key = _registrant_rowid(reg, cur)
+    db_key = _registrant_rowid(reg, cur, keys)
     if db_key is None:
-        cur.execute('INSERT INTO country VALUES(?)',
-                    [reg['country']])
-        cur.execute('INSERT INTO country VALUES(?)',
-                    [reg['ppb_country']])
-        cur.execute('INSERT INTO org VALUES(?)',
-                    [reg['name']])
-        cur.execute('INSERT INTO registrant VALUES(NULL, '
-                    ':country, :senate_id, :name, :ppb_country)',
-                    reg)
+        _import_value('country', reg['country'], cur, keys)
+        _import_value('country', reg['ppb_country'], cur, keys)
+        _import_value('org', reg['name'], cur, keys)
+        cur.execute('INSERT INTO registrant VALUES(NULL, ?, ?, ?, ?)',
+                    _dimension_key('registrant', reg))
         db_key = cur.lastrowid
+        if keys is not None:
+            keys.add('registrant', reg, db_key)
     cur.execute('INSERT INTO filing_registrant VALUES(?, ?, ?, ?)',
                 [_filing_db_key(filing),
                  db_key,
@@ -588,7 +3650,7 @@ def _import_registrant(reg, filing, cur):
                  reg['description']])
 
 
-def _lobbyist_rowid(lobbyist, cur):
+def _lobbyist_rowid(lobbyist, cur, keys=None):
     """Find a lobbyist in the database.
 
     Returns the row ID of the matching lobbyist, or None if there is
@@ -598,11 +3660,13 @@ def _lobbyist_rowid(lobbyist, cur):
 
     cur - The DB API 2.0-compliant database cursor.
 
+    keys - A DimensionCache, or None.
+
     """
-    return _rowid('lobbyist', lobbyist, cur)
+    return _rowid('lobbyist', lobbyist, cur, keys)
 
 
-def _import_lobbyist(lobbyist, filing, cur):
+def _import_lobbyist(lobbyist, filing, cur, keys=None):
     """Import a lobbyist into the database.
 
     Returns nothing.
@@ -617,21 +3681,24 @@ def _import_lobbyist(lobbyist, filing, cur):
 
     cur - The DB API 2.0-compliant database cursor.
 
+    keys - A DimensionCache, or None (see import_filings).
+
     """
-    db_key = _lobbyist_rowid(lobbyist, cur)
+    db_key = _lobbyist_rowid(lobbyist, cur, keys)
     if db_key is None:
         # Note - lobbyist status and indicator are pre-inserted into the
         # lobbyist_status and lobbyist_indicator tables.
-        cur.execute('INSERT INTO person VALUES(?)', [lobbyist['name']])
-        cur.execute('INSERT INTO lobbyist VALUES(NULL, '
-                    ':name, :indicator, :official_position)',
-                    lobbyist)
+        _import_value('person', lobbyist['name'], cur, keys)
+        cur.execute('INSERT INTO lobbyist VALUES(NULL, ?, ?, ?)',
+                    _dimension_key('lobbyist', lobbyist))
         db_key = cur.lastrowid
+        if keys is not None:
+            keys.add('lobbyist', lobbyist, db_key)
     cur.execute('INSERT INTO filing_lobbyists VALUES(?, ?, ?)',
                 [_filing_db_key(filing), db_key, lobbyist['status']])
 
 
-def _import_govt_entity(entity, filing, cur):
+def _import_govt_entity(entity, filing, cur, keys=None):
     """Import a government entity into the database.
 
     Returns nothing.
@@ -646,14 +3713,16 @@ def _import_govt_entity(entity, filing, cur):
 
     cur - The DB API 2.0-compliant database cursor.
 
+    keys - A DimensionCache, or None (see import_filings).
+
     """
     db_key = entity['name']
-    cur.execute('INSERT INTO govt_entity VALUES(:name)', entity)
+    _import_value('govt_entity', db_key, cur, keys)
     cur.execute('INSERT INTO filing_govt_entities VALUES(?, ?)',
                 [_filing_db_key(filing), db_key])
 
 
-def _import_issue(issue, filing, cur):
+def _import_issue(issue, filing, cur, keys=None):
     """Import an issue into the database.
 
     Returns nothing.
@@ -668,16 +3737,18 @@ def _import_issue(issue, filing, cur):
 
     cur - The DB API 2.0-compliant database cursor.
 
+    keys - A DimensionCache, or None (see import_filings).
+
     """
-    cur.execute('INSERT INTO issue_code VALUES(?)', [issue['code']])
-    cur.execute('INSERT INTO issue VALUES(NULL, :code, :specific_issue)',
-                issue)
+    _import_value('issue_code', issue['code'], cur, keys)
+    cur.execute('INSERT INTO issue VALUES(NULL, ?, ?)',
+                [issue['code'], issue['specific_issue']])
     db_key = cur.lastrowid
     cur.execute('INSERT INTO filing_issues VALUES(?, ?)',
                 [_filing_db_key(filing), db_key])
 
 
-def _affiliated_org_rowid(org, cur):
+def _affiliated_org_rowid(org, cur, keys=None):
     """Find an affiliated org the database.
 
     Returns the row ID of the matching org, or None if there is no
@@ -687,11 +3758,13 @@ def _affiliated_org_rowid(org, cur):
 
     cur - The DB API 2.0-compliant database cursor.
 
+    keys - A DimensionCache, or None.
+
     """
-    return _rowid('affiliated_org', org, cur)
+    return _rowid('affiliated_org', org, cur, keys)
 
 
-def _import_affiliated_org(org, filing, cur):
+def _import_affiliated_org(org, filing, cur, keys=None):
     """Import an affiliated org into the database.
 
     Returns nothing.
@@ -706,23 +3779,26 @@ def _import_affiliated_org(org, filing, cur):
 
     cur - The DB API 2.0-compliant database cursor.
 
+    keys - A DimensionCache, or None (see import_filings).
+
     """
-    db_key = _affiliated_org_rowid(org, cur)
+    db_key = _affiliated_org_rowid(org, cur, keys)
     if db_key is None:
         for key in ['country', 'ppb_country']:
-            cur.execute('INSERT INTO country VALUES(?)', [org[key]])
-        cur.execute('INSERT INTO org VALUES(?)', [org['name']])
-        cur.execute('INSERT INTO affiliated_org VALUES(NULL, '
-                    ':name, :country, :ppb_country)',
-                    org)
+            _import_value('country', org[key], cur, keys)
+        _import_value('org', org['name'], cur, keys)
+        cur.execute('INSERT INTO affiliated_org VALUES(NULL, ?, ?, ?)',
+                    _dimension_key('affiliated_org', org))
         db_key = cur.lastrowid
+        if keys is not None:
+            keys.add('affiliated_org', org, db_key)
     url = filing['affiliated_orgs_url']
-    cur.execute('INSERT INTO url VALUES(?)', [url])
+    _import_value('url', url, cur, keys)
     cur.execute('INSERT INTO filing_affiliated_orgs VALUES(?, ?, ?)',
                 [_filing_db_key(filing), db_key, url])
 
 
-def _foreign_entity_rowid(entity, cur):
+def _foreign_entity_rowid(entity, cur, keys=None):
     """Find a foreign entity in the database.
 
     Returns the row ID of the matching entity, or None if there is no
@@ -732,11 +3808,13 @@ def _foreign_entity_rowid(entity, cur):
 
     cur - The DB API 2.0-compliant database cursor.
 
+    keys - A DimensionCache, or None.
+
     """
-    return _rowid('foreign_entity', entity, cur)
+    return _rowid('foreign_entity', entity, cur, keys)
 
 
-def _import_foreign_entity(entity, filing, cur):
+def _import_foreign_entity(entity, filing, cur, keys=None):
     """Import a foreign entity into the database.
 
     Returns nothing.
@@ -751,16 +3829,19 @@ def _import_foreign_entity(entity, filing, cur):
 
     cur - The DB API 2.0-compliant database cursor.
 
+    keys - A DimensionCache, or None (see import_filings).
+
     """
-    db_key = _foreign_entity_rowid(entity, cur)
+    db_key = _foreign_entity_rowid(entity, cur, keys)
     if db_key is None:
         for key in ['country', 'ppb_country']:
-            cur.execute('INSERT INTO country VALUES(?)', [entity[key]])
-        cur.execute('INSERT INTO org VALUES(?)', [entity['name']])
-        cur.execute('INSERT INTO foreign_entity VALUES(NULL, '
-                    ':name, :country, :ppb_country)',
-                    entity)
+            _import_value('country', entity[key], cur, keys)
+        _import_value('org', entity['name'], cur, keys)
+        cur.execute('INSERT INTO foreign_entity VALUES(NULL, ?, ?, ?)',
+                    _dimension_key('foreign_entity', entity))
         db_key = cur.lastrowid
+        if keys is not None:
+            keys.add('foreign_entity', entity, db_key)
     cur.execute('INSERT INTO filing_foreign_entities VALUES(?, ?, ?, ?, ?)',
                 [_filing_db_key(filing),
                  db_key,
@@ -784,54 +3865,189 @@ def _import_filing(filing, cur):
     # The affiliated orgs URL is a special case. It's associated with
     # each affiliated org in the record, so it's handled by the
     # affiliated org importer, and we skip it here.
-    cur.execute('INSERT INTO filing VALUES('
-                ':id, :type, :year, :period, :filing_date, :amount)',
-                filing)
-
+    cur.execute('INSERT INTO filing VALUES(?, ?, ?, ?, ?, ?)',
+                [filing['id'],
+                 filing['type'],
+                 filing['year'],
+                 filing['period'],
+                 filing['filing_date'],
+                 filing['amount']])
 
-_list_importers = {'lobbyist': _import_lobbyist,
-                   'govt_entity': _import_govt_entity,
-                   'issue': _import_issue,
-                   'org': _import_affiliated_org,
-                   'foreign_entity': _import_foreign_entity}
 
-
-def _import_list(entities, filing, cur):
+def _import_list(entities, id, importer, filing, cur, keys=None):
     """Import a list of parsed entities into the database.
 
     Returns nothing.
 
     Side-effects: inserts rows into the database.
     
-    entitites - The list of parsed entities.
+    entitites - The list of parsed entities. Each entity is either
+    wrapped in a single-key dictionary whose key is id (as in the
+    dictionaries yielded by parse_filings by default), or unwrapped
+    (as in flat dictionaries and Filing records).
+
+    id - The key of each entity in the list, e.g., 'lobbyist'.
+
+    importer - The function that imports a single entity.
 
     filing - The parsed filing dictionary with which the list is
     associated.
 
     cur - The DB API 2.0-compliant database cursor.
 
+    keys - A DimensionCache, or None (see import_filings).
+
     """
-    def entity_id(entities):
-        # What kind of list is this? lobbyists? issues? etc.
-        return entities[0].keys()[0]
-    id = entity_id(entities)
-    importer = _list_importers[id]
-    for entity in entities:
-        importer(entity[id], filing, cur)
+    if not entities:
+        return
+    # All entities in a list have the same shape, so look at the
+    # first one rather than probing every entity for the wrapper key.
+    first = entities[0]
+    if isinstance(first, dict) and id in first:
+        for entity in entities:
+            importer(entity[id], filing, cur, keys)
+    else:
+        for entity in entities:
+            importer(entity, filing, cur, keys)
+
+
+def _import_lobbyists(lobbyists, filing, cur, keys=None):
+    _import_list(lobbyists, 'lobbyist', _import_lobbyist, filing, cur, keys)
+
+
+def _import_govt_entities(entities, filing, cur, keys=None):
+    _import_list(entities, 'govt_entity', _import_govt_entity, filing, cur,
+                 keys)
+
+
+def _import_issues(issues, filing, cur, keys=None):
+    _import_list(issues, 'issue', _import_issue, filing, cur, keys)
+
+
+def _import_affiliated_orgs(orgs, filing, cur, keys=None):
+    _import_list(orgs, 'org', _import_affiliated_org, filing, cur, keys)
+
+
+def _import_foreign_entities(entities, filing, cur, keys=None):
+    _import_list(entities, 'foreign_entity', _import_foreign_entity,
+                 filing, cur, keys)
 
 
 # Doesn't include an importer for 'filing'; that one is special.
 
 _entity_importers = [('registrant', _import_registrant),
                      ('client', _import_client),
-                     ('lobbyists', _import_list),
-                     ('govt_entities', _import_list),
-                     ('issues', _import_list),
-                     ('affiliated_orgs', _import_list),
-                     ('foreign_entities', _import_list)]
-
-
-def import_filings(cur, parsed_filings):
+                     ('lobbyists', _import_lobbyists),
+                     ('govt_entities', _import_govt_entities),
+                     ('issues', _import_issues),
+                     ('affiliated_orgs', _import_affiliated_orgs),
+                     ('foreign_entities', _import_foreign_entities)]
+
+
+# Batched imports. The importers execute one INSERT statement per row;
+# a _BatchCursor stands in for the database cursor, collects those
+# rows per statement, and executes each statement once per batch with
+# executemany. Rows inserted with a NULL id, which the importers read
+# back from lastrowid, are given their ids in advance, the way SQLite
+# would assign them to an AUTOINCREMENT column. Any other statement,
+# e.g., a SELECT, flushes the batch first, so it sees every row
+# inserted before it.
+#
+# The buffered parameters of each statement are kept in one flat list,
+# and are only grouped into rows again as executemany consumes them.
+# Buffering a list or tuple per row would keep hundreds of thousands
+# of new containers alive between flushes, and the garbage collector
+# would repeatedly traverse them all (and every other live container,
+# e.g., parsed filings), which costs more than executemany saves.
+
+_autoincrement_insert = re.compile(r'INSERT INTO (\w+) VALUES\(NULL, ')
+
+
+class _BatchCursor(object):
+    """A cursor that buffers INSERT statements until it's flushed."""
+    def __init__(self, cur):
+        self._cur = cur
+        self._rows = dict()
+        self._stmts = list()
+        self._autoincrement = dict()
+        self._next_ids = dict()
+        self.lastrowid = None
+
+    def _next_id(self, table):
+        try:
+            id = self._next_ids[table]
+        except KeyError:
+            cur = self._cur
+            cur.execute('SELECT MAX(id) FROM %s' % table)
+            id = cur.fetchone()[0] or 0
+            cur.execute('SELECT seq FROM sqlite_sequence WHERE name=?',
+                        [table])
+            row = cur.fetchone()
+            if row is not None:
+                id = max(id, row[0])
+            id += 1
+        self._next_ids[table] = id + 1
+        return id
+
+    def _buffer(self, stmt):
+        rows = self._rows[stmt] = list()
+        self._stmts.append(stmt)
+        return rows
+
+    def _row_iter(self, stmt, rows):
+        # Regroup the flat parameter list into one tuple per row.
+        args = [iter(rows)] * stmt.count('?')
+        return itertools.izip(*args)
+
+    def execute(self, stmt, params=()):
+        # This is called for every row, so the common case, an INSERT
+        # that's been buffered before, is kept short.
+        rows = self._rows.get(stmt)
+        if rows is not None:
+            rows.extend(params)
+            return self
+        try:
+            table, auto_stmt = self._autoincrement[stmt]
+        except KeyError:
+            m = _autoincrement_insert.match(stmt)
+            if m:
+                table = m.group(1)
+                auto_stmt = stmt.replace('VALUES(NULL, ', 'VALUES(?, ', 1)
+                self._autoincrement[stmt] = table, auto_stmt
+            elif stmt.startswith('INSERT INTO '):
+                self._buffer(stmt).extend(params)
+                return self
+            else:
+                self.flush()
+                self._cur.execute(stmt, params)
+                return self
+        self.lastrowid = self._next_id(table)
+        rows = self._rows.get(auto_stmt) or self._buffer(auto_stmt)
+        rows.append(self.lastrowid)
+        rows.extend(params)
+        return self
+
+    def fetchone(self):
+        return self._cur.fetchone()
+
+    def fetchall(self):
+        return self._cur.fetchall()
+
+    def __iter__(self):
+        return iter(self._cur)
+
+    def flush(self):
+        """Execute the buffered statements, in the order in which each
+        was first buffered."""
+        for stmt in self._stmts:
+            rows = self._rows[stmt]
+            if rows:
+                self._cur.executemany(stmt, self._row_iter(stmt, rows))
+                del rows[:]
+
+
+def import_filings(cur, parsed_filings, include=None, exclude=None,
+                   keys=None, batch_size=None):
     """Import parsed filings into the database.
 
     The database is assumed to have a particular schema; the create_db
@@ -839,17 +4055,71 @@ def import_filings(cur, parsed_filings):
 
     cur - The DB API 2.0-compliant database cursor.
 
-    parsed_filings - A sequence of parsed filings.
+    parsed_filings - A sequence of parsed filings, either dictionaries
+    or Filing records (see parse_filings).
+
+    include - If None (the default), every section of each filing is
+    imported. Otherwise, a list of the sections to import: 'filing'
+    (the row in the filing table) and/or the keys of sub-elements,
+    e.g., 'issues'. Importing only some sections of filings that are
+    already in the database rebuilds just those sections' tables;
+    e.g., include=['issues'] imports only issues, which goes well
+    with parse_filings(doc, include=['issues']).
+
+    exclude - If not None, a list of sections not to import. It's
+    applied after include.
+
+    keys - The DimensionCache with which to look up the rows of
+    clients, registrants, lobbyists, affiliated orgs and foreign
+    entities that are already in the database. If None (the default),
+    a new one is used for this call; pass the same DimensionCache to
+    consecutive calls that import into the same database to avoid
+    reading the tables again. If False, each entity is looked up with
+    a SELECT statement instead.
+
+    batch_size - If None (the default), each row is inserted as soon as
+    its filing is imported, so an error, e.g., inserting a filing
+    that's already in the database, is raised while importing the
+    filing that causes it. Otherwise, rows are buffered and inserted
+    with executemany, one statement per table, after every batch_size
+    filings and after the last one, which is faster. Each batch is
+    inserted before the next filing is read from parsed_filings.
+    Errors are raised when the batch is inserted, and don't identify
+    the filing that caused them. Looking up an entity with a SELECT
+    statement inserts the current batch first, so batches are only
+    effective with an unbounded DimensionCache (the default keys).
 
     Returns the cursor.
 
     """
+    if keys is None:
+        keys = DimensionCache()
+    elif keys is False:
+        keys = None
+    sections = _projection(include, exclude)
+    if sections is None:
+        import_filing = True
+        importers = _entity_importers
+    else:
+        import_filing = 'filing' in sections
+        importers = [x for x in _entity_importers if x[0] in sections]
+    if batch_size is None:
+        batch = cur
+    else:
+        batch = _BatchCursor(cur)
+    count = 0
     for record in parsed_filings:
         filing = record['filing']
-        _import_filing(filing, cur)
-        for entity_name, entity_importer in _entity_importers:
+        if import_filing:
+            _import_filing(filing, batch)
+        for entity_name, entity_importer in importers:
             if entity_name in record:
-                entity_importer(record[entity_name], filing, cur)
+                entity_importer(record[entity_name], filing, batch, keys)
+        count += 1
+        if batch is not cur and count % batch_size == 0:
+            batch.flush()
+    if batch is not cur:
+        batch.flush()
     return cur
 
 
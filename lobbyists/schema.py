@@ -0,0 +1,281 @@
+#!/usr/bin/env python
+#
+# schema.py - Generate attribute decoders from the RELAX NG schema.
+# Copyright (C) 2008 by Drew Hess <dhess@bothan.net>
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+"""Generate attribute decoders from the RELAX NG schema.
+
+The parser's attribute tables (lobbyists._filing_attrs, etc.) say how
+each attribute of each element in a Senate document is parsed. The
+elements and attributes themselves are described by the RELAX NG
+schema in doc/lobbyists.rng. This module checks the tables against
+the schema, and generates the _decoders module from the two: one
+specialized decoder function per element (and per kind of parsed
+result), with the attribute conversions inlined. The parser uses the
+generated module in place of the decoders it would otherwise compile
+at import time.
+
+The module is regenerated when the package is built. To regenerate it
+by hand, run:
+
+python -m lobbyists.schema doc/lobbyists.rng lobbyists/_decoders.py
+
+"""
+
+from . import lobbyists
+import __builtin__
+import hashlib
+import os
+import sys
+
+_rng = '{http://relaxng.org/ns/structure/1.0}'
+
+
+def default_schema():
+    """The filename of the schema in the source tree."""
+    return os.path.join(os.path.dirname(os.path.abspath(__file__)),
+                        os.pardir, 'doc', 'lobbyists.rng')
+
+
+def read_schema(filename):
+    """Read the elements and attributes described by a RELAX NG schema.
+
+    filename - The schema's filename.
+
+    Returns a list of tuples of 3 items, one per element, in the order
+    in which they're defined: the element's name, a list of the names
+    of its attributes and a list of the names of its child elements.
+
+    """
+    tree = lobbyists.ElementTree.parse(filename)
+    elements = list()
+    for defn in tree.getiterator(_rng + 'element'):
+        attrs = list()
+        children = list()
+        _read_pattern(defn, attrs, children)
+        elements.append((defn.get('name'), attrs, children))
+    return elements
+
+
+def _read_pattern(pattern, attrs, children):
+    """Collect the attributes and child elements of an element
+    definition, descending into optional, oneOrMore, etc. patterns but
+    not into child element definitions."""
+    for node in pattern:
+        if node.tag == _rng + 'attribute':
+            attrs.append(node.get('name'))
+        elif node.tag == _rng + 'element':
+            children.append(node.get('name'))
+        else:
+            _read_pattern(node, attrs, children)
+
+
+def _elements(schema):
+    """Map each element in a schema to its attributes and children."""
+    return dict([(name, (attrs, children))
+                 for name, attrs, children in schema])
+
+
+def element_tables(schema):
+    """Pair the elements of a schema with the parser's attribute
+    tables.
+
+    Returns a list of (element name, table id) pairs, where table id
+    is a key of lobbyists._attr_tables, in schema order. Elements
+    that the parser doesn't know about are left out (see check).
+
+    """
+    elements = _elements(schema)
+    result = [('Filing', 'filing')]
+    for child in elements['Filing'][1]:
+        if child not in lobbyists._sax_subelts:
+            continue
+        key, item_id, table = lobbyists._sax_subelts[child]
+        if item_id is None:
+            result.append((child, key))
+        else:
+            result.extend([(item, item_id)
+                           for item in elements[child][1]])
+    return result
+
+
+def check(schema):
+    """Check the parser's attribute tables against a schema.
+
+    Returns a list of problems (strings), which is empty if the
+    parser parses every element and attribute in the schema, and
+    nothing else.
+
+    """
+    problems = list()
+    elements = _elements(schema)
+    if 'Filing' not in elements:
+        return ['the schema has no Filing element']
+    subelts = elements['Filing'][1]
+    for name in subelts:
+        if name not in lobbyists._sax_subelts:
+            problems.append('Filing sub-element %s is not parsed' % name)
+    for name in sorted(lobbyists._sax_subelts):
+        if name not in subelts:
+            problems.append('parsed Filing sub-element %s is not in the '
+                            'schema' % name)
+    for name, id in element_tables(schema):
+        attrs = elements[name][0]
+        table = [x[0] for x in lobbyists._attr_tables[id]]
+        for attr in attrs:
+            if attr not in table:
+                problems.append('%s attribute %s is not parsed' %
+                                (name, attr))
+        for attr in table:
+            if attr not in attrs:
+                problems.append('parsed %s attribute %s is not in the '
+                                'schema' % (name, attr))
+    return problems
+
+
+def _parser_name(i, parse):
+    """The name by which generated code calls an attribute parser."""
+    name = parse.__name__
+    if getattr(lobbyists, name, None) is not parse and \
+            getattr(__builtin__, name, None) is not parse:
+        raise ValueError('attribute parser %r has no global name' % parse)
+    return name
+
+
+def _record_name(id):
+    if id == 'filing':
+        return lobbyists.Filing.__name__
+    return lobbyists._record_classes[id].__name__
+
+
+_header = '''\
+# _decoders.py - Attribute decoders generated from lobbyists.rng.
+#
+# This file was generated by lobbyists.schema from the RELAX NG schema
+# in doc/lobbyists.rng and the attribute tables in lobbyists.py. Don't
+# edit it; regenerate it by building the package, or by running
+#
+# python -m lobbyists.schema doc/lobbyists.rng lobbyists/_decoders.py
+
+"""Attribute decoders generated from the RELAX NG schema."""
+
+'''
+
+
+def generate(filename):
+    """Generate the source code of the _decoders module.
+
+    filename - The filename of the schema.
+
+    Returns the source code (a string). Raises ValueError if the
+    attribute tables don't match the schema (see check).
+
+    """
+    schema = read_schema(filename)
+    problems = check(schema)
+    if problems:
+        raise ValueError('the attribute tables do not match %s: %s' %
+                         (filename, '; '.join(problems)))
+    f = open(filename, 'rb')
+    try:
+        schema_digest = hashlib.sha256(f.read()).hexdigest()
+    finally:
+        f.close()
+    tables = element_tables(schema)
+    functions = list()
+    names = set(['_intern_table as intern', '_nan as nan'])
+    decoders = dict(dict=list(), record=list(), column=list())
+    for name, id in tables:
+        attrs = lobbyists._attr_tables[id]
+        for i, (attr, key, parse) in enumerate(attrs):
+            parse = getattr(parse, 'parse', parse)
+            if parse not in (lobbyists._identity, lobbyists._optional):
+                parser = _parser_name(i, parse)
+                if getattr(__builtin__, parser, None) is not parse:
+                    names.add(parser)
+        record = _record_name(id)
+        names.add(record)
+        fname = 'decode_%s' % name
+        functions.append(lobbyists._decoder_source(fname, attrs,
+                                                   parser_name=_parser_name))
+        decoders['dict'].append((id, fname))
+        functions.append(lobbyists._decoder_source(fname + '_record', attrs,
+                                                   record, False,
+                                                   _parser_name))
+        decoders['record'].append((id, fname + '_record'))
+        functions.append(lobbyists._decoder_source(fname + '_columns',
+                                                   attrs, None, True,
+                                                   _parser_name))
+        decoders['column'].append((id, fname + '_columns'))
+    lines = [_header]
+    lines.append('from .lobbyists import (%s)\n' %
+                 ',\n                        '.join(sorted(names,
+                                                        key=str.lower)))
+    lines.append('new = object.__new__\n')
+    lines.append('SCHEMA_SHA256 = %r' % schema_digest)
+    lines.append('TABLES_DIGEST = %r\n' % lobbyists._tables_digest())
+    for source in functions:
+        lines.append('\n' + source)
+    for kind in ['dict', 'record', 'column']:
+        lines.append('\n%s_DECODERS = {\n    %s}' %
+                     (kind.upper(),
+                      ',\n    '.join(['%r: %s' % x for x in decoders[kind]])))
+    return '\n'.join(lines) + '\n'
+
+
+def write_decoders(filename, output):
+    """Generate the _decoders module from a schema and write it.
+
+    filename - The filename of the schema.
+
+    output - The filename of the generated module.
+
+    """
+    source = generate(filename)
+    f = open(output, 'wb')
+    try:
+        f.write(source)
+    finally:
+        f.close()
+
+
+def main(argv=None):
+    """Check the attribute tables against the schema, and optionally
+    generate the _decoders module.
+
+    Note that argv[0] is the program name.
+
+    """
+    if argv is None:
+        argv = sys.argv
+    args = argv[1:]
+    if len(args) > 2:
+        print >> sys.stderr, 'usage: %s [schema.rng [_decoders.py]]' % \
+            argv[0]
+        return 2
+    schema = args and args[0] or default_schema()
+    problems = check(read_schema(schema))
+    for problem in problems:
+        print >> sys.stderr, '%s: %s' % (schema, problem)
+    if problems:
+        return 1
+    if len(args) == 2:
+        write_decoders(schema, args[1])
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
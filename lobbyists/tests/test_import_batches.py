@@ -0,0 +1,89 @@
+# -*- coding: utf-8 -*-
+#
+# test_import_batches.py - Test batched imports.
+# Copyright (C) 2008 by Drew Hess <dhess@bothan.net>
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+"""Tests for importing filings in batches."""
+
+import unittest
+import lobbyists
+import sqlite3
+import util
+from test_parse_records import dump_db
+
+
+def import_filings(filings, batch_size, keys=None, con=None):
+    if con is None:
+        con = lobbyists.create_db(sqlite3.connect(':memory:'))
+    lobbyists.import_filings(con.cursor(), filings, keys=keys,
+                             batch_size=batch_size)
+    return con
+
+
+class TestImportBatches(unittest.TestCase):
+    def test_same_db(self):
+        """Batched imports match row-by-row imports"""
+        for doc in util.test_docs():
+            filings = list(lobbyists.parse_filings(doc))
+            expected = dump_db(import_filings(filings, None))
+            for batch_size in [1, 2, 1000]:
+                self.failUnlessEqual(dump_db(import_filings(filings,
+                                                            batch_size)),
+                                     expected)
+
+    def test_lookups(self):
+        """Batched imports match row-by-row imports with SELECT lookups"""
+        doc = util.testpath('clients_dup.xml')
+        filings = list(lobbyists.parse_filings(doc))
+        expected = dump_db(import_filings(filings, None, False))
+        for keys in [False, lobbyists.DimensionCache(1)]:
+            self.failUnlessEqual(dump_db(import_filings(filings, 1000,
+                                                        keys)),
+                                 expected)
+
+    def test_existing_rows(self):
+        """Batched imports number new rows after the existing ones"""
+        filings = list(lobbyists.parse_filings(util.testpath('issues.xml')))
+        half = len(filings) // 2
+        expected = import_filings(filings[:half], None)
+        import_filings(filings[half:], None, con=expected)
+        con = import_filings(filings[:half], None)
+        import_filings(filings[half:], 1000, con=con)
+        self.failUnlessEqual(dump_db(con), dump_db(expected))
+
+    def test_errors(self):
+        """Batched imports raise errors when the batch is inserted"""
+        filings = list(lobbyists.parse_filings(util.testpath('filings.xml')))
+        con = import_filings(filings, 1000)
+        self.failUnlessRaises(sqlite3.IntegrityError, import_filings,
+                              filings, 1000, con=con)
+
+
+    def test_default(self):
+        """Imports insert rows one filing at a time by default"""
+        filings = list(lobbyists.parse_filings(util.testpath('filings.xml')))
+        con = import_filings(filings, None)
+        consumed = list()
+        def consume():
+            for filing in filings:
+                consumed.append(filing)
+                yield filing
+        self.failUnlessRaises(sqlite3.IntegrityError, lobbyists.import_filings,
+                              con.cursor(), consume())
+        self.failUnlessEqual(consumed, filings[:1])
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,199 @@
+# -*- coding: utf-8 -*-
+#
+# test_import_keys.py - Test the dimension key cache.
+# Copyright (C) 2008 by Drew Hess <dhess@bothan.net>
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+"""Tests for importing filings with a DimensionCache."""
+
+import unittest
+import lobbyists
+import sqlite3
+import util
+from test_parse_records import dump_db
+
+
+def import_doc(doc, keys=None, con=None):
+    if con is None:
+        con = lobbyists.create_db(sqlite3.connect(':memory:'))
+    lobbyists.import_filings(con.cursor(), lobbyists.parse_filings(doc),
+                             keys=keys)
+    return con
+
+
+class TestImportKeys(unittest.TestCase):
+    def test_same_db(self):
+        """Importing with a DimensionCache matches importing with SELECTs"""
+        for doc in util.test_docs():
+            self.failUnlessEqual(dump_db(import_doc(doc)),
+                                 dump_db(import_doc(doc, False)))
+
+    def test_stats(self):
+        """A DimensionCache counts its hits and misses"""
+        keys = lobbyists.DimensionCache()
+        import_doc(util.testpath('clients_dup.xml'), keys)
+        self.failUnlessEqual(keys.misses['client'], 1)
+        self.failUnless(keys.hits['client'] > 0)
+        self.failUnlessEqual(keys.hits['lobbyist'], 0)
+        self.failUnlessEqual(keys.misses['lobbyist'], 0)
+        self.failUnless(0.0 < keys.hit_rate('client') < 1.0)
+        self.failUnlessEqual(keys.hit_rate('lobbyist'), 0.0)
+
+    def test_warm(self):
+        """A DimensionCache finds rows already in the database"""
+        con = import_doc(util.testpath('clients.xml'))
+        cur = con.cursor()
+        cur.execute('SELECT COUNT(*) FROM client')
+        count = cur.fetchone()[0]
+        cur.execute('DELETE FROM filing_client')
+        cur.execute('DELETE FROM filing')
+        keys = lobbyists.DimensionCache()
+        import_doc(util.testpath('clients.xml'), keys, con)
+        cur.execute('SELECT COUNT(*) FROM client')
+        self.failUnlessEqual(cur.fetchone()[0], count)
+        self.failUnless(keys.hits['client'] > 0)
+
+    def test_shared(self):
+        """A DimensionCache can be shared among imports"""
+        filings = list(lobbyists.parse_filings(util.testpath('clients.xml')))
+        con = lobbyists.create_db(sqlite3.connect(':memory:'))
+        keys = lobbyists.DimensionCache()
+        half = len(filings) // 2
+        lobbyists.import_filings(con.cursor(), filings[:half], keys=keys)
+        lobbyists.import_filings(con.cursor(), filings[half:], keys=keys)
+        self.failUnlessEqual(dump_db(con),
+                             dump_db(import_doc(util.testpath('clients.xml'),
+                                                False)))
+
+    def test_bounded(self):
+        """A bounded DimensionCache matches importing with SELECTs"""
+        for doc in util.test_docs():
+            for max_size in [0, 1, 2, {'lobbyist': 1}]:
+                self.failUnlessEqual(dump_db(import_doc(doc, False)),
+                                     dump_db(import_doc(
+                            doc, lobbyists.DimensionCache(max_size))))
+
+    def test_evictions(self):
+        """A bounded DimensionCache evicts its least recently used rows"""
+        doc = util.testpath('clients.xml')
+        keys = lobbyists.DimensionCache(2)
+        import_doc(doc, keys)
+        self.failUnlessEqual(keys.size('client'), 2)
+        self.failUnless(keys.evictions['client'] > 0)
+        self.failUnlessEqual(keys.evictions['lobbyist'], 0)
+        unbounded = lobbyists.DimensionCache()
+        import_doc(doc, unbounded)
+        self.failUnless(unbounded.size('client') > 2)
+        self.failUnlessEqual(unbounded.evictions['client'], 0)
+        self.failUnless(keys.misses['client'] >= unbounded.misses['client'])
+        self.failUnlessEqual(keys.hits['client'] + keys.misses['client'],
+                             unbounded.hits['client'] +
+                             unbounded.misses['client'])
+
+    def test_repeat_lookup(self):
+        """A bounded DimensionCache keeps the row it just looked up"""
+        doc = util.testpath('clients.xml')
+        con = import_doc(doc)
+        cur = con.cursor()
+        clients = [x['client'] for x in lobbyists.parse_filings(doc)
+                   if 'client' in x]
+        for max_size in [1, 2]:
+            keys = lobbyists.DimensionCache(max_size)
+            for client in clients:
+                db_key = keys.rowid('client', client, cur)
+                self.failIfEqual(db_key, None)
+                hits = keys.hits['client']
+                self.failUnlessEqual(keys.rowid('client', client, cur),
+                                     db_key)
+                self.failUnlessEqual(keys.hits['client'], hits + 1)
+            self.failUnless(keys.size('client') <= max_size)
+            self.failUnless(keys.evictions['client'] > 0)
+
+    def test_repeat_lookup_values(self):
+        """A bounded DimensionCache keeps the value it just added"""
+        doc = util.testpath('clients.xml')
+        con = import_doc(doc)
+        cur = con.cursor()
+        names = [x['client']['name'] for x in lobbyists.parse_filings(doc)
+                 if 'client' in x]
+        for max_size in [1, 2]:
+            keys = lobbyists.DimensionCache({'org': max_size})
+            for name in names:
+                keys.new_value('org', name, cur)
+                self.failIf(keys.new_value('org', name, cur))
+            self.failUnless(keys.size('org') <= max_size)
+            self.failUnless(keys.evictions['org'] > 0)
+
+    def test_table_limits(self):
+        """A DimensionCache can be bounded per table"""
+        doc = util.testpath('clients.xml')
+        keys = lobbyists.DimensionCache({'client': 1})
+        import_doc(doc, keys)
+        unbounded = lobbyists.DimensionCache()
+        import_doc(doc, unbounded)
+        self.failUnlessEqual(keys.size('client'), 1)
+        self.failUnlessEqual(keys.size('registrant'),
+                             unbounded.size('registrant'))
+        self.failUnlessEqual(keys.size(),
+                             sum([keys.size(x) for x in
+                                  ['client', 'registrant', 'country',
+                                   'state', 'person', 'org']]))
+
+    def test_bounded_warm(self):
+        """A bounded DimensionCache finds rows already in the database"""
+        con = import_doc(util.testpath('clients_dup.xml'))
+        cur = con.cursor()
+        cur.execute('DELETE FROM filing_client')
+        cur.execute('DELETE FROM filing')
+        keys = lobbyists.DimensionCache(1)
+        import_doc(util.testpath('clients_dup.xml'), keys, con)
+        cur.execute('SELECT COUNT(*) FROM client')
+        self.failUnlessEqual(cur.fetchone()[0], 1)
+        self.failUnlessEqual(keys.misses['client'], 1)
+        self.failUnless(keys.hits['client'] > 0)
+
+    def test_lookup_values(self):
+        """A DimensionCache skips inserting known lookup values"""
+        doc = util.testpath('clients.xml')
+        keys = lobbyists.DimensionCache()
+        con = import_doc(doc, keys)
+        cur = con.cursor()
+        cur.execute('SELECT COUNT(*) FROM country')
+        self.failUnlessEqual(keys.misses['country'], cur.fetchone()[0])
+        self.failUnless(keys.hits['country'] > 0)
+        self.failUnlessEqual(keys.size('country'), keys.misses['country'])
+
+    def test_warm_lookup_values(self):
+        """A DimensionCache finds lookup values already in the database"""
+        con = import_doc(util.testpath('issues.xml'))
+        cur = con.cursor()
+        cur.execute('DELETE FROM filing_issues')
+        cur.execute('DELETE FROM filing')
+        keys = lobbyists.DimensionCache()
+        import_doc(util.testpath('issues.xml'), keys, con)
+        self.failUnlessEqual(keys.misses['issue_code'], 0)
+        self.failUnless(keys.hits['issue_code'] > 0)
+
+    def test_bounded_lookup_values(self):
+        """A bounded DimensionCache evicts lookup values"""
+        doc = util.testpath('clients.xml')
+        keys = lobbyists.DimensionCache({'org': 1})
+        self.failUnlessEqual(dump_db(import_doc(doc, keys)),
+                             dump_db(import_doc(doc, False)))
+        self.failUnlessEqual(keys.size('org'), 1)
+        self.failUnless(keys.evictions['org'] > 0)
+
+if __name__ == '__main__':
+    unittest.main()
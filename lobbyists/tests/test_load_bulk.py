@@ -0,0 +1,129 @@
+# -*- coding: utf-8 -*-
+#
+# test_load_bulk.py - Test bulk loads.
+# Copyright (C) 2008 by Drew Hess <dhess@bothan.net>
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+"""Tests for bulk-loading documents into a database."""
+
+import unittest
+import lobbyists
+import lobbyists.util
+import sqlite3
+import os
+import re
+import shutil
+import tempfile
+import util
+from test_parse_records import dump_db
+
+
+def schema(con):
+    cur = con.cursor()
+    cur.execute("SELECT type, name, sql FROM sqlite_master ORDER BY name")
+    return cur.fetchall()
+
+
+def settings(con):
+    return [con.execute('PRAGMA %s' % x).fetchone()[0]
+            for x in ['journal_mode', 'synchronous', 'cache_size']]
+
+
+class TestLoadBulk(unittest.TestCase):
+    def setUp(self):
+        self.tmpdir = tempfile.mkdtemp()
+        self.docs = [util.testpath(x) for x in ['issues.xml',
+                                                'lobbyists.xml',
+                                                'registrants.xml',
+                                                'affiliated_orgs.xml',
+                                                'foreign_entities.xml']]
+
+    def tearDown(self):
+        shutil.rmtree(self.tmpdir)
+
+    def load(self, name, docs, **options):
+        return lobbyists.util.load_db(docs, os.path.join(self.tmpdir, name),
+                                      **options)
+
+    def test_same_db(self):
+        """A bulk load matches a normal load"""
+        expected = self.load('normal.db', self.docs)
+        con = self.load('bulk.db', self.docs, bulk=True)
+        self.failUnlessEqual(dump_db(con), dump_db(expected))
+        self.failUnlessEqual(schema(con), schema(expected))
+        self.failUnlessEqual(settings(con), settings(expected))
+
+    def test_existing_db(self):
+        """A bulk load into an existing database reuses its rows"""
+        expected = self.load('normal.db', self.docs)
+        self.load('bulk.db', self.docs[:2]).close()
+        con = self.load('bulk.db', self.docs[2:], bulk=True)
+        self.failUnlessEqual(dump_db(con), dump_db(expected))
+        self.failUnlessEqual(schema(con), schema(expected))
+
+    def test_errors(self):
+        """A failed bulk load restores the database's indexes"""
+        f = open(self.docs[1])
+        try:
+            xml = f.read()
+        finally:
+            f.close()
+        bad = os.path.join(self.tmpdir, 'bad.xml')
+        f = open(bad, 'w')
+        try:
+            f.write(re.sub('Period="[^"]*"', 'Period="X"', xml, 1))
+        finally:
+            f.close()
+        expected = self.load('normal.db', self.docs[:1])
+        dbname = os.path.join(self.tmpdir, 'bulk.db')
+        self.failUnlessRaises(KeyError, lobbyists.util.load_db,
+                              [self.docs[0], bad], dbname, bulk=True)
+        con = sqlite3.connect(dbname)
+        self.failUnlessEqual(schema(con), schema(expected))
+        self.failUnlessEqual(dump_db(con)['filing'], [])
+
+    def test_restore_errors(self):
+        """A failed bulk load raises its own error if restoring fails"""
+        f = open(self.docs[1])
+        try:
+            xml = f.read()
+        finally:
+            f.close()
+        bad = os.path.join(self.tmpdir, 'bad.xml')
+        f = open(bad, 'w')
+        try:
+            f.write(re.sub('Period="[^"]*"', 'Period="X"', xml, 1))
+        finally:
+            f.close()
+        dbname = os.path.join(self.tmpdir, 'bulk.db')
+        def sink(item):
+            # Take the name of an index the load has dropped, so that
+            # it can't be created again.
+            con = sqlite3.connect(dbname)
+            con.execute('CREATE INDEX lobbyist_index ON filing(id)')
+            con.commit()
+            con.close()
+            raise ValueError(item[1])
+        self.failUnlessRaises(ValueError, lobbyists.util.load_db, [bad],
+                              dbname, bulk=True, quarantine=sink)
+
+    def test_key_cache_size(self):
+        """A bulk load needs an unbounded key cache"""
+        self.failUnlessRaises(ValueError, self.load, 'bulk.db', self.docs,
+                              bulk=True, key_cache_size=100)
+
+
+if __name__ == '__main__':
+    unittest.main()
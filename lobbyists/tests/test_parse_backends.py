@@ -0,0 +1,63 @@
+# -*- coding: utf-8 -*-
+#
+# test_parse_backends.py - Tests for lobbyists.parse_filings backends.
+# Copyright (C) 2008 by Drew Hess <dhess@bothan.net>
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+"""Tests for lobbyists.parse_filings backends."""
+
+import unittest
+import lobbyists
+import util
+
+
+class TestParseBackends(unittest.TestCase):
+    def assertSameFilings(self, backend):
+        for doc in util.test_docs():
+            expected = list(lobbyists.parse_filings(doc, 'iterparse'))
+            filings = list(lobbyists.parse_filings(doc, backend))
+            self.failUnlessEqual(filings, expected, doc)
+
+    def test_sax(self):
+        """SAX backend matches iterparse backend"""
+        self.assertSameFilings('sax')
+
+    def test_pulldom(self):
+        """pulldom backend matches iterparse backend"""
+        self.assertSameFilings('pulldom')
+
+    def test_all_backends(self):
+        """All available backends match iterparse backend"""
+        for backend in lobbyists.parser_backends():
+            self.assertSameFilings(backend)
+
+    def test_default_backend(self):
+        """Default backend is the first available backend"""
+        backends = lobbyists.parser_backends()
+        self.failUnless('iterparse' in backends)
+        self.failUnless('sax' in backends)
+        self.failUnless('pulldom' in backends)
+        doc = util.testpath('filings.xml')
+        self.failUnlessEqual(list(lobbyists.parse_filings(doc)),
+                             list(lobbyists.parse_filings(doc, backends[0])))
+
+    def test_unknown_backend(self):
+        """Unknown backend"""
+        self.failUnlessRaises(KeyError, lobbyists.parse_filings,
+                              util.testpath('filings.xml'), 'nonesuch')
+
+
+if __name__ == '__main__':
+    unittest.main()
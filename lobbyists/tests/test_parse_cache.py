@@ -0,0 +1,185 @@
+# -*- coding: utf-8 -*-
+#
+# test_parse_cache.py - Tests for the parsed-filing cache.
+# Copyright (C) 2008 by Drew Hess <dhess@bothan.net>
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+"""Tests for the parsed-filing cache."""
+
+import unittest
+import lobbyists
+import lobbyists.util
+import sqlite3
+import os
+import shutil
+import tempfile
+import util
+from test_parse_records import dump_db
+
+
+def read(filename):
+    f = open(filename, 'rb')
+    try:
+        return f.read()
+    finally:
+        f.close()
+
+
+class TestParseCache(unittest.TestCase):
+    def setUp(self):
+        self.tmpdir = tempfile.mkdtemp()
+        self.cachedir = os.path.join(self.tmpdir, 'cache')
+
+    def tearDown(self):
+        shutil.rmtree(self.tmpdir)
+
+    def copy(self, doc, name):
+        """Copy doc into the temporary directory."""
+        filename = os.path.join(self.tmpdir, name)
+        shutil.copyfile(doc, filename)
+        return filename
+
+    def test_replay(self):
+        """A cached document replays the same filings"""
+        doc = util.testpath('lobbyists.xml')
+        cache = lobbyists.FilingCache(self.cachedir)
+        expected = list(lobbyists.parse_filings(doc))
+        self.failUnlessEqual(list(cache.filings(doc)), expected)
+        self.failUnlessEqual((cache.hits, cache.misses), (0, 1))
+        self.failUnlessEqual(list(cache.filings(doc)), expected)
+        self.failUnlessEqual((cache.hits, cache.misses), (1, 1))
+        self.failUnless(cache.size() > 0)
+
+    def test_small_batches(self):
+        """Replay works across several batches"""
+        doc = util.testpath('lobbyists.xml')
+        cache = lobbyists.FilingCache(self.cachedir, batch_size=3)
+        expected = list(lobbyists.parse_filings(doc))
+        self.failUnlessEqual(list(cache.filings(doc)), expected)
+        self.failUnlessEqual(list(cache.filings(doc)), expected)
+        self.failUnlessEqual(cache.hits, 1)
+
+    def test_content_key(self):
+        """Documents are identified by their contents"""
+        cache = lobbyists.FilingCache(self.cachedir)
+        list(cache.filings(util.testpath('filings.xml')))
+        doc = self.copy(util.testpath('filings.xml'), 'copy.xml')
+        expected = list(lobbyists.parse_filings(doc))
+        self.failUnlessEqual(list(cache.filings(doc)), expected)
+        self.failUnlessEqual((cache.hits, cache.misses), (1, 1))
+        f = open(doc, 'ab')
+        try:
+            f.write('\n')
+        finally:
+            f.close()
+        self.failUnlessEqual(list(cache.filings(doc)), expected)
+        self.failUnlessEqual((cache.hits, cache.misses), (1, 2))
+
+    def test_options_key(self):
+        """Parsing options that change the result are part of the key"""
+        doc = util.testpath('lobbyists.xml')
+        cache = lobbyists.FilingCache(self.cachedir)
+        for options in [dict(), dict(flat=True), dict(where={'year': 2008}),
+                        dict(include=['lobbyists']),
+                        dict(exclude=['lobbyists'])]:
+            expected = list(lobbyists.parse_filings(doc, **options))
+            self.failUnlessEqual(list(cache.filings(doc, **options)),
+                                 expected)
+            self.failUnlessEqual(list(cache.filings(doc, **options)),
+                                 expected)
+        self.failUnlessEqual((cache.hits, cache.misses), (5, 5))
+        list(cache.filings(doc, backend='sax'))
+        self.failUnlessEqual(cache.hits, 6)
+
+    def test_uncacheable(self):
+        """Streams and parsed records aren't cached"""
+        doc = util.testpath('lobbyists.xml')
+        cache = lobbyists.FilingCache(self.cachedir)
+        f = open(doc, 'rb')
+        try:
+            self.failUnlessEqual(list(cache.filings(f)),
+                                 list(lobbyists.parse_filings(doc)))
+        finally:
+            f.close()
+        records = list(cache.filings(doc, records=True))
+        self.failUnlessEqual(len(records), 8)
+        self.failUnlessEqual((cache.hits, cache.misses, cache.size()),
+                             (0, 0, 0))
+
+    def test_eviction(self):
+        """The least recently used entries are evicted"""
+        docs = [util.testpath(x) for x in ['lobbyists.xml', 'issues.xml',
+                                           'clients.xml']]
+        cache = lobbyists.FilingCache(self.cachedir)
+        sizes = list()
+        for doc in docs:
+            before = cache.size()
+            list(cache.filings(doc))
+            sizes.append(cache.size() - before)
+        cache.clear()
+        self.failUnlessEqual(cache.size(), 0)
+        cache.max_size = sizes[1] + sizes[2]
+        for doc in docs:
+            list(cache.filings(doc))
+        self.failUnlessEqual(cache.size(), sizes[1] + sizes[2])
+        list(cache.filings(docs[2]))
+        self.failUnlessEqual((cache.hits, cache.misses), (1, 6))
+        list(cache.filings(docs[0]))
+        self.failUnlessEqual((cache.hits, cache.misses), (1, 7))
+
+    def test_partial_read(self):
+        """A partly-read document isn't cached"""
+        doc = util.testpath('lobbyists.xml')
+        cache = lobbyists.FilingCache(self.cachedir)
+        filings = cache.filings(doc)
+        filings.next()
+        filings.close()
+        self.failUnlessEqual(os.listdir(self.cachedir), [])
+
+    def test_quarantine(self):
+        """A document with quarantined filings isn't cached"""
+        xml = read(util.testpath('lobbyists.xml'))
+        doc = os.path.join(self.tmpdir, 'bad.xml')
+        f = open(doc, 'wb')
+        try:
+            f.write(xml.replace('Period="UNDETERMINED"', 'Period="X"', 1))
+        finally:
+            f.close()
+        cache = lobbyists.FilingCache(self.cachedir)
+        for i in range(2):
+            quarantined = list()
+            filings = list(cache.filings(doc,
+                                         quarantine=quarantined.append))
+            self.failUnlessEqual(len(filings), 7)
+            self.failUnlessEqual(len(quarantined), 1)
+        self.failUnlessEqual((cache.hits, cache.misses), (0, 2))
+
+    def test_load_db(self):
+        """load_db loads the same records from the cache"""
+        docs = [util.testpath(x) for x in ['lobbyists.xml', 'issues.xml']]
+        expected = dump_db(lobbyists.util.load_db(docs, ':memory:'))
+        cache = lobbyists.FilingCache(self.cachedir)
+        for i in range(2):
+            dbname = os.path.join(self.tmpdir, 'cached%d.db' % i)
+            con = lobbyists.util.load_db(docs, dbname, cache=cache)
+            try:
+                self.failUnlessEqual(dump_db(con), expected)
+            finally:
+                con.close()
+        self.failUnlessEqual((cache.hits, cache.misses), (2, 2))
+
+
+if __name__ == '__main__':
+    unittest.main()
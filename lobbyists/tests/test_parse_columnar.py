@@ -0,0 +1,103 @@
+# -*- coding: utf-8 -*-
+#
+# test_parse_columnar.py - Tests for parsing filings into columns.
+# Copyright (C) 2008 by Drew Hess <dhess@bothan.net>
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+"""Tests for parsing filings into columns."""
+
+import unittest
+import lobbyists
+import util
+
+
+def value(x):
+    """Columns store missing amounts as NaN."""
+    if isinstance(x, float) and x != x:
+        return None
+    return x
+
+
+def rows(batches):
+    """Reassemble flat parsed filings from batches of columns."""
+    for batch in batches:
+        fields = dict()
+        for name in batch:
+            if '.' in name:
+                id, key = name.split('.')
+                fields.setdefault(id, list()).append(key)
+        for i in range(len(batch['filing.id'])):
+            filing = dict()
+            for id, keys in fields.iteritems():
+                if id in ('filing', 'registrant', 'client'):
+                    if id != 'filing' and not batch[id][i]:
+                        continue
+                    filing[id] = dict([(key, value(batch[id + '.' + key][i]))
+                                       for key in keys])
+                else:
+                    start, end = batch[id][i], batch[id][i + 1]
+                    if start == end:
+                        continue
+                    filing[id] = [dict([(key,
+                                         value(batch[id + '.' + key][j]))
+                                        for key in keys])
+                                  for j in range(start, end)]
+            yield filing
+
+
+def drop_empty(filing):
+    """Remove empty lists from a parsed filing."""
+    return dict([(k, v) for k, v in filing.iteritems() if v != []])
+
+
+class TestParseColumnar(unittest.TestCase):
+    def test_columnar(self):
+        """Columns match flat parsed filings"""
+        for backend in lobbyists.parser_backends():
+            for doc in util.test_docs():
+                expected = [drop_empty(x) for x in
+                            lobbyists.parse_filings(doc, backend, flat=True)]
+                batches = list(lobbyists.parse_filings_columnar(doc, 3,
+                                                                backend))
+                self.failUnlessEqual(list(rows(batches)), expected, doc)
+
+    def test_batch_size(self):
+        """Batch sizes"""
+        doc = util.testpath('lobbyists.xml')
+        count = len(list(lobbyists.parse_filings(doc)))
+        batches = list(lobbyists.parse_filings_columnar(doc, 3))
+        sizes = [len(x['filing.id']) for x in batches]
+        self.failUnlessEqual(sum(sizes), count)
+        self.failUnless(max(sizes) <= 3)
+        for batch in batches:
+            self.failUnlessEqual(len(batch['lobbyists']),
+                                 len(batch['filing.id']) + 1)
+
+    def test_string_columns(self):
+        """Dictionary-encoded string columns"""
+        doc = util.testpath('client_contact_name.xml')
+        batch = list(lobbyists.parse_filings_columnar(doc))[0]
+        countries = batch['client.country']
+        self.failUnless(isinstance(countries, lobbyists.StringColumn))
+        self.failUnlessEqual(len(set(countries.values)),
+                             len(countries.values))
+        self.failUnless(len(countries.values) < len(countries))
+        self.failUnlessEqual(list(countries),
+                             [x['client']['country'] for x in
+                              lobbyists.parse_filings(doc)])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,151 @@
+# -*- coding: utf-8 -*-
+#
+# test_parse_compressed.py - Tests for parsing compressed documents.
+# Copyright (C) 2008 by Drew Hess <dhess@bothan.net>
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+"""Tests for parsing compressed documents and zip archives."""
+
+import unittest
+import lobbyists
+import lobbyists.util
+import sqlite3
+import os
+import gzip
+import bz2
+import shutil
+import tempfile
+import zipfile
+import util
+from test_parse_records import dump_db
+
+
+def docs():
+    """A few test documents."""
+    return [util.testpath(x) for x in ['lobbyists.xml', 'issues.xml',
+                                       'clients.xml', 'registrants.xml']]
+
+
+def read(filename):
+    f = open(filename, 'rb')
+    try:
+        return f.read()
+    finally:
+        f.close()
+
+
+class TestParseCompressed(unittest.TestCase):
+    def setUp(self):
+        self.tmpdir = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.tmpdir)
+
+    def compressed(self, doc, ext, opener):
+        """Compress doc into the temporary directory."""
+        filename = os.path.join(self.tmpdir, os.path.basename(doc) + ext)
+        f = opener(filename, 'wb')
+        try:
+            f.write(read(doc))
+        finally:
+            f.close()
+        return filename
+
+    def archive(self, docs):
+        """Zip docs into the temporary directory."""
+        filename = os.path.join(self.tmpdir, 'docs.zip')
+        z = zipfile.ZipFile(filename, 'w', zipfile.ZIP_DEFLATED)
+        try:
+            for doc in docs:
+                z.writestr(os.path.basename(doc), read(doc))
+            z.writestr('README.txt', 'Not a document.')
+        finally:
+            z.close()
+        return filename
+
+    def test_gzip(self):
+        """Parse gzip-compressed documents"""
+        for doc in docs():
+            expected = list(lobbyists.parse_filings(doc))
+            gz = self.compressed(doc, '.gz', gzip.GzipFile)
+            for backend in lobbyists.parser_backends():
+                self.failUnlessEqual(list(lobbyists.parse_filings(gz,
+                                                                  backend)),
+                                     expected, (doc, backend))
+
+    def test_bzip2(self):
+        """Parse bzip2-compressed documents"""
+        for doc in docs():
+            expected = list(lobbyists.parse_filings(doc))
+            bz = self.compressed(doc, '.bz2', bz2.BZ2File)
+            for backend in lobbyists.parser_backends():
+                self.failUnlessEqual(list(lobbyists.parse_filings(bz,
+                                                                  backend)),
+                                     expected, (doc, backend))
+
+    def test_xz(self):
+        """Parse xz-compressed documents"""
+        if lobbyists.lzma is None:
+            return
+        doc = util.testpath('lobbyists.xml')
+        xz = self.compressed(doc, '.xz', lobbyists.lzma.LZMAFile)
+        self.failUnlessEqual(list(lobbyists.parse_filings(xz)),
+                             list(lobbyists.parse_filings(doc)))
+
+    def test_zip(self):
+        """Parse zip archives"""
+        expected = list()
+        for doc in docs():
+            expected.extend(lobbyists.parse_filings(doc))
+        z = self.archive(docs())
+        for backend in lobbyists.parser_backends():
+            self.failUnlessEqual(list(lobbyists.parse_filings(z, backend)),
+                                 expected, backend)
+        self.failUnlessEqual(list(lobbyists.parse_filings_parallel(z, 2)),
+                             expected)
+
+    def test_compressed_parallel(self):
+        """Compressed documents fall back to serial parsing"""
+        doc = util.testpath('lobbyists.xml')
+        gz = self.compressed(doc, '.gz', gzip.GzipFile)
+        self.failUnlessEqual(list(lobbyists.parse_filings_parallel(gz, 2)),
+                             list(lobbyists.parse_filings(doc)))
+
+    def test_partial_read(self):
+        """Stop parsing a compressed document early"""
+        doc = util.testpath('lobbyists.xml')
+        gz = self.compressed(doc, '.gz', gzip.GzipFile)
+        filings = lobbyists.parse_filings(gz)
+        self.failUnlessEqual(filings.next(),
+                             lobbyists.parse_filings(doc).next())
+        filings.close()
+
+    def test_load_db(self):
+        """Load a zip archive"""
+        doc = util.testpath('lobbyists.xml')
+        z = self.archive([doc])
+        db1 = os.path.join(self.tmpdir, '1.db')
+        db2 = os.path.join(self.tmpdir, '2.db')
+        lobbyists.util.load_db([doc], db1).close()
+        lobbyists.util.load_db([z], db2, workers=2).close()
+        con1 = sqlite3.connect(db1)
+        con2 = sqlite3.connect(db2)
+        self.failUnlessEqual(dump_db(con1), dump_db(con2))
+        con1.close()
+        con2.close()
+
+
+if __name__ == '__main__':
+    unittest.main()
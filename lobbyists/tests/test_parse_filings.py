@@ -406,6 +406,36 @@ class TestParseFilings(unittest.TestCase):
 
         self.failUnlessEqual(len(filings), 0)
 
+    def test_file_object(self):
+        """Parse filings from a file object"""
+        f = open(util.testpath('ids.xml'), 'rb')
+        filings = list(lobbyists.parse_filings(f))
+        self.failIf(f.closed)
+        f.close()
+
+        self.failUnlessEqual(len(filings), 2)
+        self.failUnlessEqual(filings[0]['filing']['id'],
+                             'D48A20C9-211C-43B1-BBD1-001B075854BA')
+        self.failUnlessEqual(filings[1]['filing']['id'],
+                             '5F787E27-BBF1-45A5-8392-FFF93CCA2746')
+
+    def test_unicode_values(self):
+        """Parsed string values are unicode"""
+        filings = list(lobbyists.parse_filings(util.testpath('ids.xml')))
+        for x in filings:
+            self.failUnless(isinstance(x['filing']['id'], unicode))
+
+    def test_interned_values(self):
+        """Repeated attribute values are shared"""
+        doc = util.testpath('client_contact_name.xml')
+        for backend in lobbyists.parser_backends():
+            countries = [x['client']['country'] for x in
+                         lobbyists.parse_filings(doc, backend)
+                         if x['client']['country'] == 'USA']
+            self.failUnless(len(countries) > 1)
+            for country in countries[1:]:
+                self.failUnless(country is countries[0], backend)
+
 
 if __name__ == '__main__':
     unittest.main()
@@ -0,0 +1,69 @@
+# -*- coding: utf-8 -*-
+#
+# test_parse_flat.py - Tests for parsing filings with flat lists.
+# Copyright (C) 2008 by Drew Hess <dhess@bothan.net>
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+"""Tests for parsing filings with flat lists."""
+
+import unittest
+import lobbyists
+import sqlite3
+import util
+from test_parse_records import dump_db
+
+
+def unwrap(filing):
+    """Remove the single-key wrappers from a parsed filing's lists."""
+    result = dict()
+    for key, value in filing.iteritems():
+        if isinstance(value, list):
+            value = [x.values()[0] for x in value]
+        result[key] = value
+    return result
+
+
+class TestParseFlat(unittest.TestCase):
+    def test_flat(self):
+        """Flat lists match unwrapped lists"""
+        for backend in lobbyists.parser_backends():
+            for doc in util.test_docs():
+                expected = [unwrap(x) for x in
+                            lobbyists.parse_filings(doc, backend)]
+                flat = list(lobbyists.parse_filings(doc, backend, flat=True))
+                self.failUnlessEqual(flat, expected, doc)
+
+    def test_flat_parallel(self):
+        """Flat lists in parallel"""
+        doc = util.testpath('lobbyists.xml')
+        expected = list(lobbyists.parse_filings(doc, flat=True))
+        filings = list(lobbyists.parse_filings_parallel(doc, 2, flat=True,
+                                                        chunk_size=512))
+        self.failUnlessEqual(filings, expected)
+
+    def test_import_flat(self):
+        """Import flat lists"""
+        for doc in util.test_docs():
+            con1 = lobbyists.create_db(sqlite3.connect(':memory:'))
+            con2 = lobbyists.create_db(sqlite3.connect(':memory:'))
+            lobbyists.import_filings(con1.cursor(),
+                                     lobbyists.parse_filings(doc))
+            lobbyists.import_filings(con2.cursor(),
+                                     lobbyists.parse_filings(doc, flat=True))
+            self.failUnlessEqual(dump_db(con1), dump_db(con2), doc)
+
+
+if __name__ == '__main__':
+    unittest.main()
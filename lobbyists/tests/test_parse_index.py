@@ -0,0 +1,143 @@
+# -*- coding: utf-8 -*-
+#
+# test_parse_index.py - Tests for the byte-offset filing index.
+# Copyright (C) 2008 by Drew Hess <dhess@bothan.net>
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+"""Tests for the byte-offset filing index and get_filing."""
+
+import unittest
+import lobbyists
+import os
+import gzip
+import shutil
+import tempfile
+import util
+
+
+def read(filename):
+    f = open(filename, 'rb')
+    try:
+        return f.read()
+    finally:
+        f.close()
+
+
+def write(filename, data):
+    f = open(filename, 'wb')
+    try:
+        f.write(data)
+    finally:
+        f.close()
+
+
+class TestParseIndex(unittest.TestCase):
+    def setUp(self):
+        self.tmpdir = tempfile.mkdtemp()
+        self.doc = self.copy('lobbyists.xml')
+
+    def tearDown(self):
+        shutil.rmtree(self.tmpdir)
+
+    def copy(self, name):
+        """Copy a test document into the temporary directory."""
+        filename = os.path.join(self.tmpdir, name)
+        shutil.copyfile(util.testpath(name), filename)
+        return filename
+
+    def check_index(self, doc, xml, codec='utf-8'):
+        filings = list(lobbyists.parse_filings(doc))
+        index = lobbyists.filing_index(doc)
+        self.failUnlessEqual(sorted(index),
+                             sorted([x['filing']['id'] for x in filings]))
+        for filing in filings:
+            start, end, year, type = index[filing['filing']['id']]
+            elt = xml[start:end].decode(codec)
+            self.failUnless(elt.startswith(u'<Filing ID="%s"' %
+                                           filing['filing']['id']))
+            self.failUnless(elt.endswith(u'</Filing>'))
+            self.failUnlessEqual(year, filing['filing']['year'])
+            self.failUnlessEqual(type, filing['filing']['type'])
+
+    def test_index(self):
+        """The index records each Filing element's offsets, year and type"""
+        self.check_index(self.doc, read(self.doc))
+        self.failUnless(os.path.exists(self.doc + '.index'))
+
+    def test_get_filing(self):
+        """get_filing parses just the given filing"""
+        filings = list(lobbyists.parse_filings(self.doc))
+        for backend in lobbyists.parser_backends():
+            for filing in filings:
+                self.failUnlessEqual(
+                    lobbyists.get_filing(self.doc, filing['filing']['id'],
+                                         backend),
+                    filing)
+        records = list(lobbyists.parse_filings(self.doc, records=True))
+        for record in records:
+            self.failUnlessEqual(
+                lobbyists.get_filing(self.doc, record['filing']['id'],
+                                     records=True),
+                record)
+
+    def test_unknown_filing(self):
+        """get_filing raises KeyError for an unknown filing ID"""
+        self.failUnlessRaises(KeyError, lobbyists.get_filing, self.doc,
+                              'no such filing')
+
+    def test_rebuild(self):
+        """The index is rebuilt when the document changes"""
+        lobbyists.filing_index(self.doc)
+        write(self.doc, read(util.testpath('issues.xml')))
+        # Make sure the document's modification time changes.
+        st = os.stat(self.doc)
+        os.utime(self.doc, (st.st_atime, st.st_mtime + 10))
+        self.check_index(self.doc, read(self.doc))
+        filings = list(lobbyists.parse_filings(self.doc))
+        self.failUnlessEqual(
+            lobbyists.get_filing(self.doc, filings[-1]['filing']['id']),
+            filings[-1])
+
+    def test_touch(self):
+        """Touching the document keeps its index"""
+        index = lobbyists.filing_index(self.doc)
+        st = os.stat(self.doc)
+        os.utime(self.doc, (st.st_atime, st.st_mtime + 10))
+        self.failUnlessEqual(lobbyists.filing_index(self.doc), index)
+
+    def test_utf16(self):
+        """UTF-16 documents are indexed in bytes"""
+        doc = os.path.join(self.tmpdir, 'utf16.xml')
+        xml = read(self.doc).decode('utf-8').encode('utf-16')
+        write(doc, xml)
+        self.check_index(doc, xml, 'utf-16-le')
+        for filing in lobbyists.parse_filings(self.doc):
+            self.failUnlessEqual(
+                lobbyists.get_filing(doc, filing['filing']['id']), filing)
+
+    def test_compressed(self):
+        """Compressed documents can't be indexed"""
+        doc = os.path.join(self.tmpdir, 'lobbyists.xml.gz')
+        f = gzip.open(doc, 'wb')
+        try:
+            f.write(read(self.doc))
+        finally:
+            f.close()
+        self.failUnlessRaises(ValueError, lobbyists.filing_index, doc)
+        self.failUnlessRaises(ValueError, lobbyists.get_filing, doc, 'x')
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,120 @@
+# -*- coding: utf-8 -*-
+#
+# test_parse_lazy.py - Tests for lazy filings.
+# Copyright (C) 2008 by Drew Hess <dhess@bothan.net>
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+"""Tests for parsing filings lazily."""
+
+import unittest
+import lobbyists
+import sqlite3
+import cStringIO
+import util
+from test_parse_records import dump_db
+
+
+def lazy_backends():
+    return [x for x in lobbyists.parser_backends() if x != 'sax']
+
+
+class TestParseLazy(unittest.TestCase):
+    def test_same_filings(self):
+        """Lazy filings parse to the same filings"""
+        for doc in util.test_docs():
+            for backend in lazy_backends():
+                for flat in [False, True]:
+                    filings = list(lobbyists.parse_filings(doc, backend,
+                                                           flat=flat,
+                                                           lazy=True))
+                    self.failUnless(all([isinstance(x, lobbyists.LazyFiling)
+                                         for x in filings]))
+                    self.failUnlessEqual(
+                        filings,
+                        list(lobbyists.parse_filings(doc, flat=flat)))
+
+    def test_options(self):
+        """Lazy parsing can be filtered and projected"""
+        doc = util.testpath('lobbyists.xml')
+        for options in [dict(where={'year': 2008}),
+                        dict(include=['lobbyists']),
+                        dict(exclude=['lobbyists'])]:
+            self.failUnlessEqual(
+                list(lobbyists.parse_filings(doc, lazy=True, **options)),
+                list(lobbyists.parse_filings(doc, **options)))
+
+    def test_access(self):
+        """Sub-elements are parsed on first access and kept"""
+        doc = util.testpath('lobbyists.xml')
+        eager = list(lobbyists.parse_filings(doc))
+        lazy = list(lobbyists.parse_filings(doc, lazy=True))
+        for e, l in zip(eager, lazy):
+            self.failUnlessEqual(sorted(l.keys()), sorted(e.keys()))
+            self.failUnlessEqual(len(l), len(e))
+            self.failUnlessEqual(l['filing'], e['filing'])
+            self.failUnlessEqual('lobbyists' in l, 'lobbyists' in e)
+            self.failIf('issues' in l)
+            self.failUnlessRaises(KeyError, l.__getitem__, 'issues')
+            self.failUnlessEqual(l.get('issues'), None)
+            if 'lobbyists' in e:
+                lobbyists_ = l['lobbyists']
+                self.failUnlessEqual(lobbyists_, e['lobbyists'])
+                self.failUnless(l['lobbyists'] is lobbyists_)
+            self.failUnlessEqual(l.asdict(), e)
+
+    def test_errors(self):
+        """Errors in sub-elements are raised when they're accessed"""
+        xml = open(util.testpath('lobbyists.xml')).read()
+        xml = xml.replace('LobbyisteIndicator="2"', 'LobbyisteIndicator="9"',
+                          1)
+        for backend in lazy_backends():
+            filings = list(lobbyists.parse_filings(cStringIO.StringIO(xml),
+                                                   backend, lazy=True))
+            self.failUnlessEqual(len(filings), 8)
+            errors = 0
+            for filing in filings:
+                self.failUnless(filing['filing']['id'])
+                try:
+                    filing.get('lobbyists')
+                except KeyError:
+                    errors += 1
+            self.failUnlessEqual(errors, 1)
+
+    def test_import(self):
+        """Lazy filings import like dictionaries"""
+        docs = [util.testpath(x) for x in ['lobbyists.xml', 'issues.xml',
+                                           'clients.xml']]
+        for doc in docs:
+            con = sqlite3.connect(':memory:')
+            lobbyists.create_db(con)
+            lobbyists.import_filings(con.cursor(),
+                                     lobbyists.parse_filings(doc, lazy=True))
+            expected = sqlite3.connect(':memory:')
+            lobbyists.create_db(expected)
+            lobbyists.import_filings(expected.cursor(),
+                                     lobbyists.parse_filings(doc))
+            self.failUnlessEqual(dump_db(con), dump_db(expected))
+
+    def test_unsupported(self):
+        """Lazy parsing needs an element backend and dictionaries"""
+        doc = util.testpath('lobbyists.xml')
+        self.failUnlessRaises(ValueError, lobbyists.parse_filings, doc,
+                              'sax', lazy=True)
+        self.failUnlessRaises(ValueError, lobbyists.parse_filings, doc,
+                              records=True, lazy=True)
+
+
+if __name__ == '__main__':
+    unittest.main()
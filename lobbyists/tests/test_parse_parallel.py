@@ -0,0 +1,58 @@
+# -*- coding: utf-8 -*-
+#
+# test_parse_parallel.py - Tests for lobbyists.parse_filings_parallel.
+# Copyright (C) 2008 by Drew Hess <dhess@bothan.net>
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+"""Tests for lobbyists.parse_filings_parallel."""
+
+import unittest
+import lobbyists
+import util
+
+
+docs = ['affiliated_orgs.xml', 'clients.xml', 'filings.xml',
+        'foreign_entities.xml', 'govt_entities.xml', 'issues.xml',
+        'lobbyists.xml', 'registrants.xml']
+
+
+class TestParseParallel(unittest.TestCase):
+    def test_parallel(self):
+        """Parallel parse matches serial parse"""
+        for doc in [util.testpath(x) for x in docs]:
+            expected = list(lobbyists.parse_filings(doc))
+            filings = list(lobbyists.parse_filings_parallel(doc, 2,
+                                                            chunk_size=512))
+            self.failUnlessEqual(filings, expected, doc)
+
+    def test_utf16(self):
+        """Parallel parse of a UTF-16 document"""
+        expected = list(lobbyists.parse_filings(util.testpath('lobbyists.xml')))
+        doc = util.testpath('lobbyists_utf16.xml')
+        filings = list(lobbyists.parse_filings_parallel(doc, 2,
+                                                        chunk_size=512))
+        self.failUnlessEqual(filings, expected)
+
+    def test_file_object(self):
+        """Parallel parse falls back to serial parse for file objects"""
+        f = open(util.testpath('filings.xml'), 'rb')
+        filings = list(lobbyists.parse_filings_parallel(f, 2))
+        f.close()
+        expected = list(lobbyists.parse_filings(util.testpath('filings.xml')))
+        self.failUnlessEqual(filings, expected)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,143 @@
+# -*- coding: utf-8 -*-
+#
+# test_parse_projection.py - Tests for parsing selected filing sections.
+# Copyright (C) 2008 by Drew Hess <dhess@bothan.net>
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+"""Tests for parsing and importing selected filing sections."""
+
+import unittest
+import lobbyists
+import sqlite3
+import util
+from test_parse_records import dump_db
+
+
+sections = ['registrant', 'client', 'lobbyists', 'govt_entities',
+            'issues', 'foreign_entities', 'affiliated_orgs']
+
+
+def project(filing, keys):
+    """Remove all but the given sections from a parsed filing."""
+    return dict([(k, v) for k, v in filing.iteritems()
+                 if k == 'filing' or k in keys])
+
+
+class TestParseProjection(unittest.TestCase):
+    def test_include(self):
+        """Included sections"""
+        for doc in util.test_docs():
+            filings = list(lobbyists.parse_filings(doc))
+            for section in sections:
+                expected = [project(x, [section]) for x in filings]
+                for backend in lobbyists.parser_backends():
+                    result = list(lobbyists.parse_filings(
+                            doc, backend, include=[section]))
+                    self.failUnlessEqual(result, expected,
+                                         (doc, backend, section))
+
+    def test_exclude(self):
+        """Excluded sections"""
+        keep = ['client', 'issues', 'affiliated_orgs']
+        exclude = [x for x in sections if x not in keep]
+        for doc in util.test_docs():
+            expected = [project(x, keep) for x in
+                        lobbyists.parse_filings(doc)]
+            for backend in lobbyists.parser_backends():
+                result = list(lobbyists.parse_filings(doc, backend,
+                                                      exclude=exclude))
+                self.failUnlessEqual(result, expected, (doc, backend))
+                result = list(lobbyists.parse_filings(
+                        doc, backend, include=keep + ['lobbyists'],
+                        exclude=['lobbyists']))
+                self.failUnlessEqual(result, expected, (doc, backend))
+
+    def test_include_where(self):
+        """Included sections with a registrant filter"""
+        doc = util.testpath('registrants.xml')
+        filings = list(lobbyists.parse_filings(doc))
+        senate_id = filings[0]['registrant']['senate_id']
+        expected = [project(x, ['client']) for x in filings
+                    if 'registrant' in x and
+                    x['registrant']['senate_id'] == senate_id]
+        for backend in lobbyists.parser_backends():
+            result = list(lobbyists.parse_filings(
+                    doc, backend, where={'registrant': senate_id},
+                    include=['client']))
+            self.failUnlessEqual(result, expected, backend)
+
+    def test_include_records(self):
+        """Included sections in records, columns and in parallel"""
+        doc = util.testpath('lobbyists.xml')
+        expected = list(lobbyists.parse_filings(doc, include=['issues']))
+        records = list(lobbyists.parse_filings(doc, records=True,
+                                               include=['issues']))
+        self.failUnlessEqual([x.asdict() for x in records], expected)
+        parallel = list(lobbyists.parse_filings_parallel(
+                doc, 2, include=['issues'], chunk_size=512))
+        self.failUnlessEqual(parallel, expected)
+        batch = list(lobbyists.parse_filings_columnar(
+                doc, include=['issues']))[0]
+        self.failUnlessEqual(len(batch['lobbyists.name']), 0)
+        self.failUnlessEqual(len(batch['issues.code']),
+                             sum([len(x.get('issues', [])) for x in
+                                  expected]))
+
+    def test_sequence_types(self):
+        """Sections given as tuples and sets"""
+        keep = ['client', 'issues']
+        doc = util.testpath('lobbyists.xml')
+        expected = [project(x, keep) for x in lobbyists.parse_filings(doc)]
+        for backend in lobbyists.parser_backends():
+            for include, exclude in [(tuple(keep), None),
+                                     (set(keep), ()),
+                                     (tuple(keep + ['lobbyists']),
+                                      set(['lobbyists'])),
+                                     (None, tuple(x for x in sections
+                                                  if x not in keep))]:
+                result = list(lobbyists.parse_filings(
+                        doc, backend, include=include, exclude=exclude))
+                self.failUnlessEqual(result, expected,
+                                     (backend, include, exclude))
+
+    def test_bad_section(self):
+        """Unknown sections"""
+        doc = util.testpath('lobbyists.xml')
+        self.failUnlessRaises(KeyError, lobbyists.parse_filings, doc,
+                              include=['bogus'])
+        self.failUnlessRaises(KeyError, lobbyists.parse_filings, doc,
+                              exclude=['bogus'])
+        self.failUnlessRaises(KeyError, lobbyists.parse_filings, doc,
+                              include=('bogus',))
+
+    def test_import_sections(self):
+        """Import sections separately"""
+        for doc in util.test_docs():
+            con1 = lobbyists.create_db(sqlite3.connect(':memory:'))
+            con2 = lobbyists.create_db(sqlite3.connect(':memory:'))
+            lobbyists.import_filings(con1.cursor(),
+                                     lobbyists.parse_filings(doc))
+            cur = con2.cursor()
+            lobbyists.import_filings(cur, lobbyists.parse_filings(doc),
+                                     exclude=['issues'])
+            lobbyists.import_filings(cur,
+                                     lobbyists.parse_filings(
+                                         doc, include=['issues']),
+                                     include=['issues'])
+            self.failUnlessEqual(dump_db(con1), dump_db(con2), doc)
+
+
+if __name__ == '__main__':
+    unittest.main()
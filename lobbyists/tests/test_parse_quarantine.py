@@ -0,0 +1,203 @@
+# -*- coding: utf-8 -*-
+#
+# test_parse_quarantine.py - Tests for quarantining unparseable filings.
+# Copyright (C) 2008 by Drew Hess <dhess@bothan.net>
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+"""Tests for quarantining filings that fail to parse."""
+
+import unittest
+import lobbyists
+import lobbyists.benchmark
+import lobbyists.util
+import sqlite3
+import os
+import shutil
+import tempfile
+import time
+import util
+
+BAD_PERIOD = '02DDA99B-725A-4DBA-8397-34892A6918D7'
+BAD_SUBELT = '0FC23296-F948-43FD-98D4-0912F6579E6A'
+
+
+def read(filename):
+    f = open(filename, 'rb')
+    try:
+        return f.read()
+    finally:
+        f.close()
+
+
+class TestParseQuarantine(unittest.TestCase):
+    def setUp(self):
+        self.tmpdir = tempfile.mkdtemp()
+        self.good = util.testpath('lobbyists.xml')
+        xml = read(self.good)
+        xml = xml.replace('Period="1st Quarter (Jan 1 - Mar 31)"',
+                          'Period="Bogus"', 1)
+        xml = xml.replace('Period="UNDETERMINED">',
+                          'Period="UNDETERMINED">\n    <Bogus />', 1)
+        self.xml = xml
+        self.bad = os.path.join(self.tmpdir, 'bad.xml')
+        f = open(self.bad, 'wb')
+        try:
+            f.write(xml)
+        finally:
+            f.close()
+
+    def tearDown(self):
+        shutil.rmtree(self.tmpdir)
+
+    def expected(self):
+        """The filings in the good document that aren't broken in the
+        bad one."""
+        return [x for x in lobbyists.parse_filings(self.good)
+                if x['filing']['id'] not in (BAD_PERIOD, BAD_SUBELT)]
+
+    def check_quarantined(self, quarantined):
+        self.failUnlessEqual([x[0] for x in quarantined],
+                             [BAD_PERIOD, BAD_SUBELT])
+        for id, offset, e in quarantined:
+            self.failUnlessEqual(offset, self.xml.find('<Filing ID="%s"' % id))
+            self.failUnless(isinstance(e, Exception))
+
+    def test_quarantine(self):
+        """Quarantine skips only the filings that fail to parse"""
+        for backend in lobbyists.parser_backends():
+            quarantined = list()
+            filings = list(lobbyists.parse_filings(
+                    self.bad, backend, quarantine=quarantined.append))
+            self.failUnlessEqual(filings, self.expected())
+            self.check_quarantined(quarantined)
+
+    def test_quarantine_records(self):
+        """Quarantine skips filings when parsing records"""
+        for backend in lobbyists.parser_backends():
+            quarantined = list()
+            filings = list(lobbyists.parse_filings(
+                    self.bad, backend, records=True,
+                    quarantine=quarantined.append))
+            self.failUnlessEqual(len(filings), len(self.expected()))
+            self.check_quarantined(quarantined)
+
+    def test_quarantine_where(self):
+        """Quarantine works with filtering and projection"""
+        for backend in lobbyists.parser_backends():
+            quarantined = list()
+            filings = list(lobbyists.parse_filings(
+                    self.bad, backend, where={'year': 2008},
+                    include=['lobbyists'], quarantine=quarantined.append))
+            self.failUnlessEqual(
+                filings, [x for x in self.expected()
+                          if x['filing']['year'] == 2008])
+            self.failUnlessEqual([x[0] for x in quarantined], [BAD_PERIOD])
+
+    def test_quarantine_where_period(self):
+        """Quarantine catches attributes that fail to parse in filters"""
+        results = list()
+        for backend in lobbyists.parser_backends():
+            quarantined = list()
+            filings = list(lobbyists.parse_filings(
+                    self.bad, backend, where={'period': 'undetermined'},
+                    quarantine=quarantined.append))
+            self.failUnlessEqual(
+                filings, [x for x in self.expected()
+                          if x['filing']['period'] == 'undetermined'])
+            self.check_quarantined(quarantined)
+            results.append((filings,
+                            [(x[0], x[1], type(x[2])) for x in quarantined]))
+        for result in results[1:]:
+            self.failUnlessEqual(result, results[0])
+
+    def best_time(self, filename, **kwargs):
+        best = None
+        for i in xrange(3):
+            start = time.time()
+            list(lobbyists.parse_filings(filename, **kwargs))
+            elapsed = time.time() - start
+            if best is None or elapsed < best:
+                best = elapsed
+        return best
+
+    def test_quarantine_many(self):
+        """Quarantining many filings finds offsets in linear time"""
+        copies = 400
+        bad = lobbyists.benchmark.synthesize_doc(
+            self.bad, copies, os.path.join(self.tmpdir, 'bad-many.xml'))
+        good = lobbyists.benchmark.synthesize_doc(
+            self.good, copies, os.path.join(self.tmpdir, 'good-many.xml'))
+        xml = read(bad)
+        quarantined = list()
+        list(lobbyists.parse_filings(bad, quarantine=quarantined.append))
+        self.failUnlessEqual(len(quarantined), 2 * copies)
+        for id, offset, e in quarantined:
+            self.failUnlessEqual(offset, xml.find('<Filing ID="%s"' % id))
+
+        # Searching the whole document for each quarantined filing
+        # makes this about ten times slower than the clean parse.
+        bad_time = self.best_time(bad, quarantine=list().append)
+        good_time = self.best_time(good)
+        self.failUnless(bad_time < 3 * good_time,
+                        '%.3fs to quarantine, %.3fs clean' %
+                        (bad_time, good_time))
+
+    def test_no_quarantine(self):
+        """Without a quarantine sink, parsing errors are raised"""
+        for backend in lobbyists.parser_backends():
+            self.failUnlessRaises(Exception, list,
+                                  lobbyists.parse_filings(self.bad, backend))
+
+    def test_stream_offset(self):
+        """Quarantined filings in a stream have no offset"""
+        quarantined = list()
+        f = open(self.bad, 'rb')
+        try:
+            filings = list(lobbyists.parse_filings(
+                    f, quarantine=quarantined.append))
+        finally:
+            f.close()
+        self.failUnlessEqual(filings, self.expected())
+        self.failUnlessEqual([x[:2] for x in quarantined],
+                             [(BAD_PERIOD, None), (BAD_SUBELT, None)])
+
+    def test_parallel(self):
+        """Parallel parsing reports quarantined filings"""
+        quarantined = list()
+        filings = list(lobbyists.parse_filings_parallel(
+                self.bad, 2, quarantine=quarantined.append, chunk_size=1))
+        self.failUnlessEqual(filings, self.expected())
+        self.check_quarantined(quarantined)
+
+    def test_load_db(self):
+        """load_db skips and reports quarantined filings"""
+        quarantined = list()
+        dbname = os.path.join(self.tmpdir, 'bad.db')
+        con = lobbyists.util.load_db([self.bad], dbname,
+                                     quarantine=quarantined.append)
+        try:
+            cur = con.cursor()
+            cur.execute('SELECT id FROM filing')
+            self.failUnlessEqual(sorted(x[0] for x in cur),
+                                 sorted(x['filing']['id']
+                                        for x in self.expected()))
+        finally:
+            con.close()
+        self.failUnlessEqual([x[:2] for x in quarantined],
+                             [(self.bad, BAD_PERIOD), (self.bad, BAD_SUBELT)])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,87 @@
+# -*- coding: utf-8 -*-
+#
+# test_parse_records.py - Tests for parsing filings into records.
+# Copyright (C) 2008 by Drew Hess <dhess@bothan.net>
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+"""Tests for parsing filings into records."""
+
+import unittest
+import lobbyists
+import sqlite3
+import util
+
+
+def dump_db(con):
+    """Return the contents of every table in a database."""
+    cur = con.cursor()
+    cur.execute("SELECT name FROM sqlite_master WHERE type='table' "
+                "ORDER BY name")
+    tables = [row[0] for row in cur.fetchall()]
+    result = dict()
+    for table in tables:
+        cur.execute('SELECT * FROM %s' % table)
+        result[table] = sorted(cur.fetchall())
+    return result
+
+
+class TestParseRecords(unittest.TestCase):
+    def test_records(self):
+        """Records match dictionaries"""
+        for backend in lobbyists.parser_backends():
+            for doc in util.test_docs():
+                expected = list(lobbyists.parse_filings(doc, backend))
+                records = list(lobbyists.parse_filings(doc, backend, True))
+                self.failUnlessEqual([x.asdict() for x in records],
+                                     expected, doc)
+
+    def test_record_fields(self):
+        """Record fields"""
+        doc = util.testpath('lobbyists.xml')
+        x = list(lobbyists.parse_filings(doc, records=True))[0]
+        self.failUnless(isinstance(x, lobbyists.Filing))
+        self.failUnless(x['filing'] is x)
+        self.failUnlessEqual(x['id'], x.id)
+        self.failUnless('filing' in x)
+        self.failUnless('lobbyists' in x)
+        self.failIf('client' in x)
+        self.failUnlessRaises(KeyError, lambda: x['client'])
+        self.failUnlessRaises(KeyError, lambda: x['asdict'])
+        self.failUnlessEqual(x.get('client'), None)
+        self.failUnlessEqual(x.get('asdict', 1), 1)
+        self.failUnlessEqual(x.get('id'), x.id)
+        self.failUnless(x.get('filing') is x)
+        lobbyist = x.lobbyists[0]
+        self.failUnless(isinstance(lobbyist, lobbyists.Lobbyist))
+        self.failUnlessEqual(lobbyist['name'], lobbyist.name)
+        self.failUnlessEqual(sorted(lobbyist.keys()),
+                             ['indicator', 'name', 'official_position',
+                              'status'])
+
+    def test_import_records(self):
+        """Import records"""
+        for doc in util.test_docs():
+            con1 = lobbyists.create_db(sqlite3.connect(':memory:'))
+            con2 = lobbyists.create_db(sqlite3.connect(':memory:'))
+            lobbyists.import_filings(con1.cursor(),
+                                     lobbyists.parse_filings(doc))
+            lobbyists.import_filings(con2.cursor(),
+                                     lobbyists.parse_filings(doc,
+                                                             records=True))
+            self.failUnlessEqual(dump_db(con1), dump_db(con2), doc)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,183 @@
+# -*- coding: utf-8 -*-
+#
+# test_parse_resume.py - Tests for resuming interrupted parses and loads.
+# Copyright (C) 2008 by Drew Hess <dhess@bothan.net>
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+"""Tests for resuming interrupted parses and loads."""
+
+import unittest
+import lobbyists
+import lobbyists.util
+import sqlite3
+import os
+import gzip
+import shutil
+import tempfile
+import util
+from test_parse_records import dump_db
+
+
+def read(filename):
+    f = open(filename, 'rb')
+    try:
+        return f.read()
+    finally:
+        f.close()
+
+
+def write(filename, data):
+    f = open(filename, 'wb')
+    try:
+        f.write(data)
+    finally:
+        f.close()
+
+
+class TestParseResume(unittest.TestCase):
+    def setUp(self):
+        self.tmpdir = tempfile.mkdtemp()
+        self.doc = util.testpath('lobbyists.xml')
+        self.xml = read(self.doc)
+        self.filings = list(lobbyists.parse_filings(self.doc))
+        self.ids = [x['filing']['id'] for x in self.filings]
+
+    def tearDown(self):
+        shutil.rmtree(self.tmpdir)
+
+    def offset(self, filing_id):
+        return self.xml.find('<Filing ID="%s"' % filing_id)
+
+    def test_resume_id(self):
+        """Parsing resumes after a filing ID"""
+        for backend in lobbyists.parser_backends():
+            for i, filing_id in enumerate(self.ids):
+                self.failUnlessEqual(
+                    list(lobbyists.parse_filings(self.doc, backend,
+                                                 resume_from=filing_id)),
+                    self.filings[i + 1:])
+
+    def test_resume_offset(self):
+        """Parsing resumes at a Filing element's byte offset"""
+        for backend in lobbyists.parser_backends():
+            for i, filing_id in enumerate(self.ids):
+                self.failUnlessEqual(
+                    list(lobbyists.parse_filings(
+                            self.doc, backend,
+                            resume_from=self.offset(filing_id))),
+                    self.filings[i:])
+
+    def test_resume_options(self):
+        """Resumed parses can be filtered and projected"""
+        filings = list(lobbyists.parse_filings(self.doc, records=True,
+                                               where={'year': 2008},
+                                               include=['lobbyists'],
+                                               resume_from=self.ids[0]))
+        expected = list(lobbyists.parse_filings(self.doc, records=True,
+                                                where={'year': 2008},
+                                                include=['lobbyists']))
+        self.failUnlessEqual(filings, expected)
+
+    def test_bad_checkpoint(self):
+        """Unknown filing IDs and offsets raise ValueError"""
+        self.failUnlessRaises(ValueError, lobbyists.parse_filings,
+                              self.doc, resume_from='no such filing')
+        offset = self.offset(self.ids[1])
+        self.failUnlessRaises(ValueError, lobbyists.parse_filings,
+                              self.doc, resume_from=offset + 1)
+        self.failUnlessRaises(ValueError, lobbyists.parse_filings,
+                              self.doc, resume_from=0)
+
+    def test_resume_compressed(self):
+        """Compressed documents resume after a filing ID"""
+        doc = os.path.join(self.tmpdir, 'lobbyists.xml.gz')
+        f = gzip.open(doc, 'wb')
+        try:
+            f.write(self.xml)
+        finally:
+            f.close()
+        self.failUnlessEqual(
+            list(lobbyists.parse_filings(doc, resume_from=self.ids[3])),
+            self.filings[4:])
+        self.failUnlessRaises(ValueError, list,
+                              lobbyists.parse_filings(doc, resume_from='x'))
+        self.failUnlessRaises(ValueError, lobbyists.parse_filings, doc,
+                              resume_from=self.offset(self.ids[3]))
+
+    def test_resume_parallel(self):
+        """Parallel parses resume after a filing ID"""
+        for i in [0, 3, len(self.ids) - 1]:
+            self.failUnlessEqual(
+                list(lobbyists.parse_filings_parallel(
+                        self.doc, 2, resume_from=self.ids[i], chunk_size=1)),
+                self.filings[i + 1:])
+
+    def test_resume_quarantine(self):
+        """Quarantined filings in a resumed parse have document offsets"""
+        doc = os.path.join(self.tmpdir, 'bad.xml')
+        xml = self.xml.replace('Period="UNDETERMINED"', 'Period="X"')
+        write(doc, xml)
+        quarantined = list()
+        list(lobbyists.parse_filings(doc, resume_from=self.ids[2],
+                                     quarantine=quarantined.append))
+        self.failUnless(quarantined)
+        for filing_id, offset, e in quarantined:
+            self.failUnlessEqual(offset,
+                                 xml.find('<Filing ID="%s"' % filing_id))
+
+    def test_load_resume(self):
+        """An interrupted load resumes from its checkpoint"""
+        good = [util.testpath('issues.xml'), self.doc]
+        expected = dump_db(lobbyists.util.load_db(good, ':memory:'))
+        bad = os.path.join(self.tmpdir, 'bad.xml')
+        write(bad, self.xml.replace('Period="UNDETERMINED"', 'Period="X"',
+                                    1))
+        docs = [util.testpath('issues.xml'), bad]
+        dbname = os.path.join(self.tmpdir, 'load.db')
+        checkpoint = os.path.join(self.tmpdir, 'checkpoint')
+        self.failUnlessRaises(KeyError, lobbyists.util.load_db, docs, dbname,
+                              checkpoint=checkpoint, checkpoint_interval=2)
+        self.failUnless(os.path.exists(checkpoint))
+        write(bad, self.xml)
+        con = lobbyists.util.load_db(docs, dbname, checkpoint=checkpoint,
+                                     checkpoint_interval=2)
+        try:
+            self.failUnlessEqual(dump_db(con), expected)
+        finally:
+            con.close()
+        self.failIf(os.path.exists(checkpoint))
+
+    def test_load_stale_checkpoint(self):
+        """Filings loaded after the last checkpoint aren't loaded twice"""
+        dbname = os.path.join(self.tmpdir, 'load.db')
+        checkpoint = os.path.join(self.tmpdir, 'checkpoint')
+        lobbyists.util.load_db([self.doc], dbname).close()
+        f = open(checkpoint, 'wb')
+        try:
+            f.write('%s\n%s\n' % (self.doc, self.ids[2]))
+        finally:
+            f.close()
+        con = lobbyists.util.load_db([self.doc], dbname,
+                                     checkpoint=checkpoint)
+        try:
+            self.failUnlessEqual(
+                dump_db(con),
+                dump_db(lobbyists.util.load_db([self.doc], ':memory:')))
+        finally:
+            con.close()
+
+
+if __name__ == '__main__':
+    unittest.main()
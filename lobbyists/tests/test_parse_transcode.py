@@ -0,0 +1,99 @@
+# -*- coding: utf-8 -*-
+#
+# test_parse_transcode.py - Tests for transcoding UTF-16 documents.
+# Copyright (C) 2008 by Drew Hess <dhess@bothan.net>
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+"""Tests for transcoding UTF-16 documents to UTF-8 while parsing."""
+
+import unittest
+import lobbyists
+import os
+import gzip
+import shutil
+import tempfile
+import util
+
+
+class TestParseTranscode(unittest.TestCase):
+    def setUp(self):
+        self.tmpdir = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.tmpdir)
+
+    def declared_utf16(self, opener=open, ext=''):
+        """Write a copy of lobbyists.xml in UTF-16 with an XML
+        declaration."""
+        f = open(util.testpath('lobbyists.xml'), 'rb')
+        try:
+            text = f.read().decode('utf-8')
+        finally:
+            f.close()
+        text = u'<?xml version="1.0" encoding="UTF-16"?>\n' + text
+        filename = os.path.join(self.tmpdir, 'declared.xml' + ext)
+        f = opener(filename, 'wb')
+        try:
+            f.write(text.encode('utf-16'))
+        finally:
+            f.close()
+        return filename
+
+    def test_utf16(self):
+        """Transcode a UTF-16 document"""
+        doc = util.testpath('lobbyists_utf16.xml')
+        utf8 = util.testpath('lobbyists.xml')
+        expected = list(lobbyists.parse_filings(utf8))
+        for backend in lobbyists.parser_backends():
+            filings = list(lobbyists.parse_filings(doc, backend,
+                                                   transcode=True))
+            self.failUnlessEqual(filings, expected, backend)
+
+    def test_declaration(self):
+        """Transcode a UTF-16 document with an XML declaration"""
+        doc = self.declared_utf16()
+        expected = list(lobbyists.parse_filings(doc))
+        for backend in lobbyists.parser_backends():
+            filings = list(lobbyists.parse_filings(doc, backend,
+                                                   transcode=True))
+            self.failUnlessEqual(filings, expected, backend)
+
+    def test_compressed(self):
+        """Transcode a compressed UTF-16 document"""
+        doc = self.declared_utf16(gzip.GzipFile, '.gz')
+        expected = list(lobbyists.parse_filings(doc))
+        self.failUnlessEqual(list(lobbyists.parse_filings(doc,
+                                                          transcode=True)),
+                             expected)
+
+    def test_parallel(self):
+        """Transcode a UTF-16 document in parallel"""
+        doc = self.declared_utf16()
+        expected = list(lobbyists.parse_filings(doc))
+        filings = list(lobbyists.parse_filings_parallel(doc, 2,
+                                                        transcode=True,
+                                                        chunk_size=512))
+        self.failUnlessEqual(filings, expected)
+
+    def test_utf8(self):
+        """UTF-8 documents are unaffected"""
+        for doc in util.test_docs()[:10]:
+            expected = list(lobbyists.parse_filings(doc))
+            self.failUnlessEqual(list(lobbyists.parse_filings(
+                        doc, transcode=True)), expected, doc)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,126 @@
+# -*- coding: utf-8 -*-
+#
+# test_parse_where.py - Tests for filtering filings while parsing.
+# Copyright (C) 2008 by Drew Hess <dhess@bothan.net>
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+"""Tests for filtering filings while parsing."""
+
+import unittest
+import lobbyists
+import util
+
+
+def matches(filing, where):
+    """Check a parsed filing against a where dictionary by hand."""
+    for key, value in where.iteritems():
+        if not isinstance(value, (list, tuple, set, frozenset)):
+            value = [value]
+        if key == 'registrant':
+            if 'registrant' not in filing:
+                return False
+            actual = filing['registrant']['senate_id']
+        else:
+            actual = filing['filing'][key]
+        if actual not in value:
+            return False
+    return True
+
+
+def filters(filings):
+    """Some interesting where dictionaries for a list of filings."""
+    result = list()
+    for filing in filings[:2]:
+        attrs = filing['filing']
+        result.append({'year': attrs['year']})
+        result.append({'type': [attrs['type'], 'NO SUCH TYPE'],
+                       'period': attrs['period']})
+        if 'registrant' in filing:
+            senate_id = filing['registrant']['senate_id']
+            result.append({'registrant': senate_id})
+            result.append({'registrant': set([senate_id]),
+                           'year': attrs['year']})
+    return result
+
+
+class TestParseWhere(unittest.TestCase):
+    def test_where(self):
+        """Filtered filings"""
+        for doc in util.test_docs():
+            filings = list(lobbyists.parse_filings(doc))
+            for where in filters(filings):
+                expected = [x for x in filings if matches(x, where)]
+                for backend in lobbyists.parser_backends():
+                    result = list(lobbyists.parse_filings(doc, backend,
+                                                          where=where))
+                    self.failUnlessEqual(result, expected,
+                                         (doc, backend, where))
+
+    def test_where_registrant(self):
+        """Filtered filings by registrant"""
+        doc = util.testpath('registrants.xml')
+        filings = list(lobbyists.parse_filings(doc))
+        senate_id = filings[0]['registrant']['senate_id']
+        for backend in lobbyists.parser_backends():
+            result = list(lobbyists.parse_filings(
+                    doc, backend, where={'registrant': senate_id}))
+            self.failUnless(result)
+            self.failUnless(len(result) < len(filings))
+            for filing in result:
+                self.failUnlessEqual(filing['registrant']['senate_id'],
+                                     senate_id)
+
+    def test_where_nothing(self):
+        """Filters that match nothing"""
+        doc = util.testpath('lobbyists.xml')
+        for backend in lobbyists.parser_backends():
+            self.failUnlessEqual(list(lobbyists.parse_filings(
+                        doc, backend, where={'year': 1066})), [])
+            self.failUnlessEqual(list(lobbyists.parse_filings(
+                        doc, backend, where={'registrant': 1})), [])
+
+    def test_where_records(self):
+        """Filtered records and columns"""
+        doc = util.testpath('lobbyists.xml')
+        where = {'year': 2008}
+        expected = list(lobbyists.parse_filings(doc, where=where))
+        records = list(lobbyists.parse_filings(doc, records=True,
+                                               where=where))
+        self.failUnlessEqual([x.asdict() for x in records], expected)
+        for backend in lobbyists.parser_backends():
+            batches = list(lobbyists.parse_filings_columnar(doc, 2, backend,
+                                                            where=where))
+            self.failUnlessEqual([x for batch in batches
+                                  for x in batch['filing.id']],
+                                 [x['filing']['id'] for x in expected])
+
+    def test_where_parallel(self):
+        """Filtered filings in parallel"""
+        doc = util.testpath('lobbyists.xml')
+        where = {'year': 2008}
+        expected = list(lobbyists.parse_filings(doc, where=where))
+        filings = list(lobbyists.parse_filings_parallel(doc, 2, where=where,
+                                                        chunk_size=512))
+        self.failUnlessEqual(filings, expected)
+
+    def test_bad_key(self):
+        """Unknown where key"""
+        doc = util.testpath('lobbyists.xml')
+        self.failUnlessRaises(KeyError, lobbyists.parse_filings, doc,
+                              where={'color': 'blue'})
+
+
+if __name__ == '__main__':
+    unittest.main()
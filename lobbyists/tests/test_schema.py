@@ -0,0 +1,137 @@
+# -*- coding: utf-8 -*-
+#
+# test_schema.py - Tests for decoders generated from the RELAX NG schema.
+# Copyright (C) 2008 by Drew Hess <dhess@bothan.net>
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+"""Tests for decoders generated from the RELAX NG schema."""
+
+import unittest
+import lobbyists
+import lobbyists.schema
+import os
+import shutil
+import tempfile
+import xml.etree.ElementTree as ElementTree
+import util
+
+# The parsed filing key of each sub-element, and of its list items.
+
+subelts = {'Registrant': ('registrant', None),
+           'Client': ('client', None),
+           'Lobbyists': ('lobbyists', 'lobbyist'),
+           'GovernmentEntities': ('govt_entities', 'govt_entity'),
+           'Issues': ('issues', 'issue'),
+           'ForeignEntities': ('foreign_entities', 'foreign_entity'),
+           'AffiliatedOrgs': ('affiliated_orgs', 'org')}
+
+
+def generated_module():
+    """Generate the decoder module from the schema and load it."""
+    source = lobbyists.schema.generate(lobbyists.schema.default_schema())
+    env = {'__name__': 'lobbyists._test_decoders', '__package__': 'lobbyists'}
+    exec compile(source, '_decoders.py', 'exec') in env
+    return env
+
+
+class TestSchema(unittest.TestCase):
+    def test_schema_elements(self):
+        """The schema describes the Senate documents' elements"""
+        schema = lobbyists.schema.read_schema(
+            lobbyists.schema.default_schema())
+        elements = dict([(x[0], x[1:]) for x in schema])
+        self.failUnlessEqual(elements['PublicFilings'], ([], ['Filing']))
+        self.failUnlessEqual(sorted(elements['Filing'][1]), sorted(subelts))
+        self.failUnlessEqual(elements['Lobbyists'], ([], ['Lobbyist']))
+        self.failUnless('AffiliatedOrgPPBCcountry' in elements['Org'][0])
+
+    def test_tables_match_schema(self):
+        """The attribute tables parse exactly the schema's attributes"""
+        schema = lobbyists.schema.read_schema(
+            lobbyists.schema.default_schema())
+        self.failUnlessEqual(lobbyists.schema.check(schema), [])
+
+    def test_check(self):
+        """Differences between the schema and the tables are reported"""
+        rng = open(lobbyists.schema.default_schema()).read()
+        rng = rng.replace('"AffiliatedOrgPPBCcountry"',
+                          '"AffiliatedOrgPPBCountry"')
+        rng = rng.replace('"Issues"', '"Topics"')
+        tmpdir = tempfile.mkdtemp()
+        try:
+            filename = os.path.join(tmpdir, 'bad.rng')
+            f = open(filename, 'wb')
+            try:
+                f.write(rng)
+            finally:
+                f.close()
+            problems = lobbyists.schema.check(
+                lobbyists.schema.read_schema(filename))
+            self.failUnlessEqual(sorted(problems),
+                                 ['Filing sub-element Topics is not parsed',
+                                  'Org attribute AffiliatedOrgPPBCountry '
+                                  'is not parsed',
+                                  'parsed Filing sub-element Issues is not '
+                                  'in the schema',
+                                  'parsed Org attribute '
+                                  'AffiliatedOrgPPBCcountry is not in the '
+                                  'schema'])
+            self.failUnlessRaises(ValueError, lobbyists.schema.generate,
+                                  filename)
+        finally:
+            shutil.rmtree(tmpdir)
+
+    def test_generated_decoders(self):
+        """Generated decoders parse elements like parse_filings"""
+        env = generated_module()
+        decoders = env['DICT_DECODERS']
+        records = env['RECORD_DECODERS']
+        for doc in util.test_docs():
+            filings = list(lobbyists.parse_filings(doc))
+            elts = ElementTree.parse(doc).getroot().findall('Filing')
+            self.failUnlessEqual(len(elts), len(filings))
+            for elt, filing in zip(elts, filings):
+                self.failUnlessEqual(decoders['filing'](elt),
+                                     filing['filing'])
+                record = records['filing'](elt)
+                self.failUnless(isinstance(record, lobbyists.Filing))
+                for key, value in filing['filing'].items():
+                    self.failUnlessEqual(record[key], value)
+                for subelt in elt:
+                    key, item = subelts[subelt.tag]
+                    if item is None:
+                        self.failUnlessEqual(decoders[key](subelt),
+                                             filing[key])
+                    else:
+                        self.failUnlessEqual(
+                            [{item: decoders[item](x)} for x in subelt],
+                            filing[key])
+
+    def test_write_decoders(self):
+        """The generated module can be written and is valid Python"""
+        tmpdir = tempfile.mkdtemp()
+        try:
+            output = os.path.join(tmpdir, '_decoders.py')
+            self.failUnlessEqual(
+                lobbyists.schema.main(['schema',
+                                       lobbyists.schema.default_schema(),
+                                       output]), 0)
+            compile(open(output).read(), output, 'exec')
+        finally:
+            shutil.rmtree(tmpdir)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -17,6 +17,7 @@
 
 """Unit test utilities for lobbyists.py."""
 
+import os
 import os.path
 
 
@@ -29,6 +30,13 @@ def testpath(basename):
         return os.path.join(os.path.dirname(__file__), 'data', basename)
 
 
+def test_docs():
+    """Return a sorted list of the filenames of all test documents."""
+    datadir = os.path.join(os.path.dirname(__file__), 'data')
+    return [os.path.join(datadir, x) for x in sorted(os.listdir(datadir))
+            if x.endswith('.xml')]
+
+
 def flatten(lst):
     result = list()
     for x in lst:
@@ -21,9 +21,127 @@
 from . import lobbyists
 import sqlite3
 import os.path
+import sys
+import fractions
 
 
-def load_db(docs, dbname, clobber=False, commit_per_doc=False):
+def _read_checkpoint(filename):
+    """Read a load checkpoint.
+
+    Returns a pair of the document and the ID of the last filing
+    loaded from it (None if the whole document was loaded), or None if
+    the checkpoint file doesn't exist.
+
+    """
+    try:
+        f = open(filename, 'rb')
+    except IOError:
+        return None
+    try:
+        doc, filing_id = f.read().decode('utf-8').split('\n')[:2]
+    finally:
+        f.close()
+    return doc, filing_id or None
+
+
+def _write_checkpoint(filename, doc, filing_id):
+    """Atomically replace a load checkpoint (see _read_checkpoint)."""
+    tmpname = filename + '.tmp'
+    f = open(tmpname, 'wb')
+    try:
+        f.write((u'%s\n%s\n' % (doc, filing_id or u'')).encode('utf-8'))
+    finally:
+        f.close()
+    os.rename(tmpname, filename)
+
+
+def _checkpointed(filings, con, checkpoint, doc, interval):
+    """Commit and checkpoint a load every interval filings.
+
+    The generator is resumed only after import_filings has imported
+    the filing it last yielded, so that filing is committed along
+    with all the filings before it. import_filings inserts a batch
+    before it resumes the generator, so its batch size must divide
+    interval.
+
+    """
+    count = 0
+    for filing in filings:
+        yield filing
+        count += 1
+        if count % interval == 0:
+            con.commit()
+            _write_checkpoint(checkpoint, doc, filing['filing']['id'])
+
+
+def _unloaded(filings, con):
+    """Skip the leading filings that are already in the database.
+
+    A load that's interrupted after committing but before writing its
+    checkpoint resumes from the previous checkpoint, so the first few
+    filings may already have been loaded.
+
+    """
+    cur = con.cursor()
+    filings = iter(filings)
+    for filing in filings:
+        cur.execute('SELECT 1 FROM filing WHERE id=?',
+                    [filing['filing']['id']])
+        if cur.fetchone() is None:
+            yield filing
+            break
+    for filing in filings:
+        yield filing
+
+
+# The settings of a bulk load: no rollback journal on disk, no waiting
+# for writes to reach the disk, and a 256 MB page cache.
+
+_bulk_pragmas = [('journal_mode', 'MEMORY'),
+                 ('synchronous', 'OFF'),
+                 ('cache_size', -256 * 1024)]
+
+
+def _begin_bulk(con):
+    """Prepare a database for a bulk load.
+
+    Relaxes the database's durability settings (see _bulk_pragmas) and
+    drops the unique indexes on the tables whose rows are looked up
+    during import. The importer looks them up in a DimensionCache
+    instead.
+
+    Returns the previous settings and the dropped indexes, to be
+    passed to _end_bulk.
+
+    """
+    pragmas = list()
+    for name, value in _bulk_pragmas:
+        pragmas.append((name, con.execute('PRAGMA %s' % name).fetchone()[0]))
+        con.execute('PRAGMA %s=%s' % (name, value))
+    names = ['%s_index' % x for x in sorted(lobbyists._dimension_keys)]
+    cur = con.execute("SELECT name, sql FROM sqlite_master "
+                      "WHERE type='index' AND name IN (%s)" %
+                      ', '.join(['?'] * len(names)), names)
+    indexes = cur.fetchall()
+    for name, sql in indexes:
+        con.execute('DROP INDEX %s' % name)
+    return pragmas, indexes
+
+
+def _end_bulk(con, state):
+    """Recreate the indexes dropped by _begin_bulk and restore the
+    database's settings."""
+    pragmas, indexes = state
+    for name, sql in indexes:
+        con.execute(sql)
+    con.commit()
+    for name, value in pragmas:
+        con.execute('PRAGMA %s=%s' % (name, value))
+
+
+def load_db(docs, dbname, clobber=False, commit_per_doc=False, workers=None,
+            quarantine=None, cache=None, checkpoint=None,
+            checkpoint_interval=10000, key_cache_size=None, bulk=False):
     """Load filing records from lobbyist documents into an sqlite3 database.
 
     Parses and imports filing records from one or more Senate
@@ -31,7 +149,9 @@ def load_db(docs, dbname, clobber=False, commit_per_doc=False):
     parsed and imported one at a time.
 
     docs - A sequence of URLs or filenames identifying the LD-1/LD-2
-    XML documents load load.
+    XML documents load load. Documents may be compressed with gzip,
+    bzip2 or xz, or packaged in zip archives (see
+    lobbyists.parse_filings).
 
     dbname - The filename of the sqlite3 database to load. If the
     database doesn't exist, load_db creates it.
@@ -46,22 +166,137 @@ def load_db(docs, dbname, clobber=False, commit_per_doc=False):
     documents are committed to the database in case of parsing or
     importing errors in subsequent documents, but is slower.
 
+    workers - If not None, each document is parsed in parallel by
+    this many worker processes (see lobbyists.parse_filings_parallel).
+    The documents in a zip archive are parsed one per worker.
+
+    quarantine - If not None, filings that fail to parse are skipped
+    rather than aborting the load, and quarantine is called with a
+    tuple of the document, the filing's ID, its byte offset in the
+    document (or None) and the exception for each skipped filing.
+
+    cache - If not None, a lobbyists.FilingCache. Documents that are
+    already in the cache are replayed from it instead of being parsed,
+    and the others are added to it as they're parsed.
+
+    checkpoint - If not None, the filename of a checkpoint file. Every
+    checkpoint_interval filings, and after each document, the load is
+    committed and the last filing loaded is recorded in the checkpoint
+    file. If the file exists when load_db is called, the load resumes
+    where it left off: the documents before the checkpointed one are
+    skipped, and the checkpointed document is parsed from the filing
+    after the checkpointed one (see the resume_from option of
+    lobbyists.parse_filings), so docs should be the same list as in
+    the interrupted load. The checkpoint file is removed once all the
+    documents are loaded. It's ignored and removed if clobber is True.
+
+    key_cache_size - If not None, the maximum number of rows per table
+    in the cache used to look up the clients, registrants, lobbyists,
+    affiliated orgs and foreign entities that are already in the
+    database (see lobbyists.DimensionCache). By default the cache
+    holds every row of those tables.
+
+    bulk - If True, the database is loaded as fast as possible at the
+    expense of its safety, which suits rebuilding a database from
+    scratch: the database's rollback journal is kept in memory,
+    sqlite3 doesn't wait for writes to reach the disk, and the unique
+    indexes of the client, registrant, lobbyist, affiliated_org and
+    foreign_entity tables are dropped during the load, and created
+    again (and the database's settings restored) once it's done or
+    has failed. If the operating system crashes or the process is
+    killed during a bulk load, the database may be corrupt or lack
+    those indexes, and should be loaded again with clobber. Rows are
+    looked up in the key cache alone, so key_cache_size must be None.
+
     This function has the side-effect of creating and/or modifying the
     database.
 
     Returns the database's sqlite3.Connection object.
 
     """
+    if bulk and key_cache_size is not None:
+        raise ValueError('a bulk load needs an unbounded key cache')
     create_db = clobber or not os.path.exists(dbname)
     con = sqlite3.connect(dbname)
     if create_db:
         lobbyists.create_db(con)
-    for doc in docs:
-        lobbyists.import_filings(con.cursor(), lobbyists.parse_filings(doc))
-        if commit_per_doc:
-            con.commit()
+    docs = list(docs)
+    resume = None
+    if checkpoint is not None:
+        if clobber:
+            if os.path.exists(checkpoint):
+                os.remove(checkpoint)
+        else:
+            resume = _read_checkpoint(checkpoint)
+    if resume is not None:
+        if resume[0] not in docs:
+            raise ValueError('checkpointed document %s is not being '
+                             'loaded' % resume[0])
+        i = docs.index(resume[0])
+        if resume[1] is None:
+            docs = docs[i + 1:]
+        else:
+            docs = docs[i:]
+    # Share one dimension key cache among the documents, so the
+    # tables are only read into it once.
+    keys = lobbyists.DimensionCache(key_cache_size)
+    # Insert rows in batches, which import_filings doesn't by default.
+    batch_size = 1000
+    if checkpoint is not None:
+        batch_size = fractions.gcd(batch_size, checkpoint_interval)
+    if bulk:
+        bulk_state = _begin_bulk(con)
+    try:
+        for doc in docs:
+            if quarantine is None:
+                sink = None
+            else:
+                def sink(item, doc=doc):
+                    quarantine((doc,) + item)
+            if workers is None:
+                parse, options = lobbyists.parse_filings, dict()
+            else:
+                parse, options = lobbyists.parse_filings_parallel, \
+                    dict(workers=workers)
+            resumed = resume is not None and resume[0] == doc and \
+                resume[1] is not None
+            if resumed:
+                options['resume_from'] = resume[1]
+            if cache is None:
+                filings = parse(doc, quarantine=sink, **options)
+            else:
+                filings = cache.filings(doc, parse, quarantine=sink,
+                                        **options)
+            if resumed:
+                filings = _unloaded(filings, con)
+            if checkpoint is not None:
+                filings = _checkpointed(filings, con, checkpoint, doc,
+                                        checkpoint_interval)
+            lobbyists.import_filings(con.cursor(), filings, keys=keys,
+                                     batch_size=batch_size)
+            if commit_per_doc or checkpoint is not None:
+                con.commit()
+            if checkpoint is not None:
+                _write_checkpoint(checkpoint, doc, None)
+    except:
+        t, v, tb = sys.exc_info()
+        # Release the database's locks, so that the load can be
+        # resumed from its checkpoint.
+        con.rollback()
+        if bulk:
+            # Report the load's error even if restoring the database
+            # fails, too.
+            try:
+                _end_bulk(con, bulk_state)
+            except Exception:
+                pass
+        raise t, v, tb
     if not commit_per_doc:
         con.commit()
+    if bulk:
+        _end_bulk(con, bulk_state)
+    if checkpoint is not None and os.path.exists(checkpoint):
+        os.remove(checkpoint)
     return con
 
 
@@ -82,7 +317,9 @@ Parse one or more Senate LD-1/LD-2 XML documents and load them into an
 sqlite3 database.
 
 Each document may be identified either by a URL or a file, so long as
-it's a valid Senate LD-1/LD-2 XML document.
+it's a valid Senate LD-1/LD-2 XML document. Files may be compressed
+(.gz, .bz2 or .xz) or zip archives of documents (.zip), as published
+by the Senate.
 
 If db doesn't exist, %prog will create it prior to loading the first
 document."""
@@ -97,10 +334,65 @@ document."""
                       help='commit changes to the database after importing ' \
                           'each document (default is to commit only after ' \
                           'all documents are imported)')
+    parser.add_option('-w', '--workers', type='int', dest='workers',
+                      help='parse each document with WORKERS worker ' \
+                          'processes')
+    parser.add_option('-q', '--quarantine', dest='quarantine',
+                      metavar='FILE',
+                      help='skip filings that fail to parse and append ' \
+                          'the document, filing ID, byte offset and error ' \
+                          'of each to FILE, one per line')
+    parser.add_option('-k', '--cache', dest='cache', metavar='DIR',
+                      help='replay previously parsed documents from the ' \
+                          'parsed-filing cache in DIR, and add the others ' \
+                          'to it')
+    parser.add_option('--cache-size', type='int', dest='cache_size',
+                      default=1024, metavar='MB',
+                      help='limit the parsed-filing cache to MB megabytes ' \
+                          '(default %default)')
+    parser.add_option('-p', '--checkpoint', dest='checkpoint',
+                      metavar='FILE',
+                      help='record the progress of the load in FILE, and ' \
+                          'resume the load from FILE if it exists')
+    parser.add_option('--checkpoint-interval', type='int',
+                      dest='checkpoint_interval', default=10000,
+                      metavar='N',
+                      help='commit and checkpoint the load every N ' \
+                          'filings (default %default)')
+    parser.add_option('--key-cache-size', type='int', dest='key_cache_size',
+                      metavar='N',
+                      help='keep at most N rows per table in the cache of ' \
+                          'clients, registrants, lobbyists, affiliated ' \
+                          'orgs, foreign entities and lookup values ' \
+                          '(default unlimited)')
+    parser.add_option('-B', '--bulk', action='store_true', dest='bulk',
+                      help='load as fast as possible, without crash ' \
+                          'safety and with the lookup indexes dropped ' \
+                          'until the end (for rebuilding a database ' \
+                          'with -C)')
     (options, args) = parser.parse_args(argv[1:])
     if len(args) < 2:
         parser.error('specify exactly one sqlite3 database and at least one ' \
                          'XML document')
-    con = load_db(args[1:], args[0], options.clobber, options.commit)
-    con.close()
+    if options.quarantine is None:
+        qfile = sink = None
+    else:
+        qfile = open(options.quarantine, 'a')
+        def sink(item):
+            doc, id, offset, e = item
+            print >> qfile, '\t'.join([doc, str(id), str(offset), repr(e)])
+    if options.cache is None:
+        cache = None
+    else:
+        cache = lobbyists.FilingCache(options.cache,
+                                      options.cache_size * 1024 * 1024)
+    try:
+        con = load_db(args[1:], args[0], options.clobber, options.commit,
+                      options.workers, sink, cache, options.checkpoint,
+                      options.checkpoint_interval,
+                      options.key_cache_size, options.bulk)
+        con.close()
+    finally:
+        if qfile is not None:
+            qfile.close()
     return 0
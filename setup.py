@@ -3,14 +3,32 @@ import ez_setup
 ez_setup.use_setuptools()
 
 from setuptools import setup, find_packages
+from setuptools.command.build_py import build_py
+import os.path
 
 version = __import__('lobbyists').VERSION
 
+
+class build_py_decoders(build_py):
+    """Regenerate lobbyists/_decoders.py from the RELAX NG schema, then
+    build as usual. The schema is only in the source tree, so a
+    package built from elsewhere keeps its existing _decoders.py, if
+    any."""
+    def run(self):
+        from lobbyists import schema
+        rng = os.path.join('doc', 'lobbyists.rng')
+        if os.path.exists(rng):
+            schema.write_decoders(rng, os.path.join('lobbyists',
+                                                    '_decoders.py'))
+        build_py.run(self)
+
+
 setup(
     name = 'lobbyists',
     version = version,
     packages = ['lobbyists'],
     test_suite = 'lobbyists',
+    cmdclass = {'build_py': build_py_decoders},
 
     package_data = { 'lobbyists' : ['lobbyists.sql'] },
     entry_points = {